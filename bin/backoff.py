@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+"""
+backoff is a supervisord event listener which stops programs crash looping.
+
+It listens to PROCESS_STATE events, and when a program keeps failing it's
+stopped and "held back" for a while before being started again through
+supervisor's XML-RPC interface. Each time a program is held back the delay
+doubles, up to a limit. See `superdev.backoff.RestartBackoff` for details.
+
+    [eventlistener:backoff]
+    command=bin/backoff.py --state-file logs/backoff.json
+    events=PROCESS_STATE
+    stderr_logfile=/dev/fd/1
+    stderr_logfile_maxbytes=0
+
+Messages about what it's doing are written to stderr. With "--state-file"
+the programs being held back are written to a file, so `make monitor` can
+show them.
+"""
+
+import os
+import xmlrpc.client
+from argparse import ArgumentParser
+from time import time
+
+from superdev.backoff import RestartBackoff
+from superdev.events import (
+    OK_READY,
+    READY,
+    STDERR,
+    STDIN,
+    STDOUT,
+    EventReader,
+    parse_header,
+)
+from superdev.shell import run_sync
+from superdev.supervisor import Supervisor
+
+
+class BackoffListener:  # pylint: disable=too-few-public-methods
+    """Respond to process state events by holding back crashing programs."""
+
+    STATE_EVENT = b"PROCESS_STATE_"
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        backoff,
+        supervisor,
+        state_file=None,
+        ignore=(),
+        stdin=STDIN,
+        stdout=STDOUT,
+        stderr=STDERR,
+    ):
+        self.backoff = backoff
+        self.supervisor = supervisor
+        self.state_file = state_file
+        self.ignore = set(ignore)
+
+        self.reader = EventReader(stdin)
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def main_loop(self):
+        """Run the main loop."""
+        os.write(self.stdout, READY)
+        self._save()
+
+        while True:
+            try:
+                self._handle_event()
+            except EOFError:
+                break
+
+            os.write(self.stdout, OK_READY)
+
+    def _handle_event(self):
+        # Start held back programs while we wait for the next event
+        timeout = self._next_timeout()
+        while timeout is not None and not self.reader.wait(timeout):
+            self._release()
+            timeout = self._next_timeout()
+
+        header, payload = self.reader.read_event()
+
+        if header[b"eventname"].startswith(self.STATE_EVENT):
+            state = header[b"eventname"][len(self.STATE_EVENT) :].decode("utf-8")
+            self._state_changed(state, parse_header(payload.split(b"\n", 1)[0]))
+
+    def _next_timeout(self):
+        next_release = self.backoff.next_release()
+        if next_release is None:
+            return None
+
+        return next_release - time()
+
+    def _state_changed(self, state, fields):
+        process = fields[b"processname"].decode("utf-8")
+        if process in self.ignore:
+            return
+
+        program = Supervisor.full_name(
+            {"name": process, "group": fields[b"groupname"].decode("utf-8")}
+        )
+        was_held = program in self.backoff.held
+
+        delay = self.backoff.state_changed(
+            program, state, expected=fields.get(b"expected") != b"0"
+        )
+
+        if delay:
+            hold = self.backoff.held[program]
+            self._report(
+                program,
+                f"Failed {hold['crashes']} times recently, holding it back for "
+                f"{delay:g}s",
+            )
+            # This will fail if it's FATAL, as it's already stopped
+            self._call("supervisor.stopProcess", program, False, quiet=True)
+            self._save()
+
+        elif was_held and program not in self.backoff.held:
+            self._report(program, "Started by someone else, no longer held back")
+            self._save()
+
+    def _release(self):
+        released = self.backoff.release()
+
+        for program in released:
+            self._report(program, "Starting again")
+            self._call("supervisor.startProcess", program, False)
+
+        if released:
+            self._save()
+
+    def _call(self, method, *params, quiet=False):
+        try:
+            return run_sync(self.supervisor.call(method, *params))
+
+        except xmlrpc.client.Fault as err:
+            if not quiet:
+                self._report(params[0], f"{method} failed: {err.faultString}")
+
+        except OSError as err:
+            self._report(params[0], f"Cannot reach supervisor: {err}")
+
+        return None
+
+    def _save(self):
+        if not self.state_file:
+            return
+
+        try:
+            self.backoff.save(self.state_file)
+        except OSError as err:
+            self._report("backoff", f"Cannot save state, giving up trying: {err}")
+            self.state_file = None
+
+    def _report(self, program, message):
+        os.write(self.stderr, f"backoff | [{program}] {message}\n".encode("utf-8"))
+
+
+if __name__ == "__main__":
+    PARSER = ArgumentParser(description="A supervisord crash loop backoff listener")
+    PARSER.add_argument(
+        "--state-file", help="Write the programs being held back to this file"
+    )
+    PARSER.add_argument(
+        "--ignore", action="append", default=[], help="Never hold back this program"
+    )
+    PARSER.add_argument(
+        "--supervisor-socket", default=Supervisor.SOCKET, help="Supervisor's socket"
+    )
+    PARSER.add_argument(
+        "--threshold",
+        type=int,
+        default=RestartBackoff.THRESHOLD,
+        help="Hold back programs which fail this many times (default %(default)s)",
+    )
+    PARSER.add_argument(
+        "--window",
+        type=float,
+        default=RestartBackoff.WINDOW,
+        help="... within this many seconds (default %(default)s)",
+    )
+    PARSER.add_argument(
+        "--max-delay",
+        type=float,
+        default=RestartBackoff.MAX_DELAY,
+        help="The longest to hold a program back for (default %(default)s)",
+    )
+    ARGS = PARSER.parse_args()
+
+    # Don't try to hold ourselves back
+    IGNORE = ARGS.ignore + [os.environ.get("SUPERVISOR_PROCESS_NAME", "backoff")]
+
+    BackoffListener(
+        RestartBackoff(
+            threshold=ARGS.threshold, window=ARGS.window, max_delay=ARGS.max_delay
+        ),
+        Supervisor(ARGS.supervisor_socket),
+        state_file=ARGS.state_file,
+        ignore=IGNORE,
+    ).main_loop()
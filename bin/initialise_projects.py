@@ -1,13 +1,147 @@
-"""Initialise all of the projects."""
+"""Initialise all of the projects, or just those a profile needs."""
 
 import os
+import sys
+from argparse import ArgumentParser
 
+from superdev.clone import CloneStrategy
+from superdev.profiles import StackProfile, SupervisorConfig
 from superdev.project import ProjectManager
+from superdev.startup import StartupPlan
+from superdev.supervisor import Supervisor
 
 PROJECT_DIR = "../"
 
+PARSER = ArgumentParser()
+PARSER.add_argument(
+    "--fetch-ttl",
+    type=int,
+    help="Don't fetch projects fetched within this many seconds (0 to always fetch)",
+)
+PARSER.add_argument(
+    "--offline",
+    action="store_true",
+    default=None,
+    help="Don't try to reach any remotes",
+)
+PARSER.add_argument(
+    "--online",
+    action="store_false",
+    dest="offline",
+    help="Always try to fetch, without checking the remotes can be reached "
+    "first (the check ignores ~/.ssh/config)",
+)
+PARSER.add_argument(
+    "--force",
+    action="store_true",
+    help="Rebuild tox environments even if their inputs haven't changed",
+)
+PARSER.add_argument(
+    "--clone-strategy",
+    choices=CloneStrategy.ALL,
+    default=CloneStrategy.FULL,
+    help="How to clone missing projects",
+)
+PARSER.add_argument(
+    "--cache-dir", help="Where to keep the shared object cache for cloning"
+)
+PARSER.add_argument(
+    "--warm-cache",
+    action="store_true",
+    help="Fill or update the shared object cache, then stop",
+)
+PARSER.add_argument(
+    "--profile",
+    default=StackProfile.ALL,
+    help="Only prepare the projects this profile in conf/profiles.conf needs",
+)
+PARSER.add_argument(
+    "--supervisord-config",
+    help="Write a supervisord config which only runs the profile's programs",
+)
+PARSER.add_argument(
+    "--watch",
+    action="store_true",
+    help="Keep going, rebuilding tox environments and restarting programs "
+    "when a project's inputs change",
+)
+PARSER.add_argument(
+    "--trace",
+    default="logs/initialise_projects.trace.json",
+    help="Where to write a trace of each stage (open with chrome://tracing)",
+)
+
+
+def load_profile(name):
+    """Read a profile, and work out the projects and programs it needs.
+
+    :param name: The name of the profile
+    :raise ValueError: If the profile or any of our config can't be read
+    :return: A tuple of our `SupervisorConfig`, and lists of the names of the
+        projects and programs needed
+    """
+    supervisor_config = SupervisorConfig("conf/supervisord.conf", "conf")
+    projects, programs = StackProfile.load("conf/profiles.conf", name).resolve(
+        requires={
+            project: data.get("requires", [])
+            for project, data in ProjectManager.project_data().items()
+        },
+        services=supervisor_config.services,
+        after=StartupPlan.load("conf/startup.conf").after,
+    )
+
+    return supervisor_config, projects, programs
+
+
 if __name__ == "__main__":
+    ARGS = PARSER.parse_args()
+
     if not os.path.isdir(PROJECT_DIR):
         os.mkdir(PROJECT_DIR)
 
-    ProjectManager(PROJECT_DIR).prepare_all()
+    try:
+        SUPERVISOR_CONFIG, PROJECTS, PROGRAMS = load_profile(ARGS.profile)
+    except ValueError as err:
+        sys.exit(f"Cannot use the profile: {err}")
+
+    MANAGER = ProjectManager(
+        PROJECT_DIR,
+        fetch_ttl=ARGS.fetch_ttl,
+        offline=ARGS.offline,
+        force=ARGS.force,
+        clone_strategy=ARGS.clone_strategy,
+        cache_dir=ARGS.cache_dir,
+        project_data={
+            name: data
+            for name, data in ProjectManager.project_data().items()
+            if name in PROJECTS
+        },
+    )
+
+    # Only the projects we check out, not groups like the backing services
+    print(f"Profile '{ARGS.profile}' needs: {', '.join(MANAGER.projects)}")
+
+    if ARGS.warm_cache:
+        sys.exit(0 if MANAGER.warm_cache() else 1)
+
+    if ARGS.supervisord_config:
+        SUPERVISOR_CONFIG.write(
+            ARGS.supervisord_config, PROGRAMS, start_programs="start-programs"
+        )
+
+    MANAGER.prepare_all()
+    MANAGER.timeline.write_trace(ARGS.trace)
+    print(f"Trace of each stage written to: {ARGS.trace}")
+
+    if ARGS.watch:
+        MANAGER.watch(
+            Supervisor(),
+            programs={
+                project: [
+                    program
+                    for program in SUPERVISOR_CONFIG.services.get(project, [])
+                    if program in PROGRAMS
+                ]
+                for project in PROJECTS
+            },
+        )
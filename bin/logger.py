@@ -62,57 +62,266 @@ but may be useful in containerised environments.
 By setting "stderr_logfile=/dev/fd/1" in the [eventlistener:logger] section,
 we redirect the aggregated output back to STDOUT (FD 1). You can also log the
 aggregated output to a single file.
+
+With "--store <directory>" every program's output is also kept in a
+`superdev.logstore.LogStore`, which can be searched with bin/query_logs.py.
+
+With "--rules <file>" noisy programs can be filtered, rate limited and have
+repeated lines collapsed before anything is displayed. See
+`superdev.logfilter` for the file format. The store still gets every line.
+
+With "--stats <file>" counters describing the listener's workload are
+rewritten to a JSON file every second. Use bin/logger_stats.py to show them.
 """
 
-import sys
+import os
+from argparse import ArgumentParser
+from time import monotonic, perf_counter, time
+
+from superdev.events import (
+    OK_READY,
+    READY,
+    STDERR,
+    STDIN,
+    STDOUT,
+    EventReader,
+    parse_header,
+)
+from superdev.logfilter import LogFilter
+from superdev.logstats import ListenerStats
+from superdev.logstore import LogStore
 
 
 class StderrRedirect:  # pylint: disable=too-few-public-methods
-    """Respond to log events by re-logging them all to STDOUT."""
+    """Respond to log events by re-logging them all to STDOUT.
+
+    Output is built up as bytes and written in batches. A batch is written
+    when no new event arrives within `latency` seconds of the oldest pending
+    output, or once it grows past `max_buffer` bytes.
+    """
+
+    # The pipes to supervisor, the optional helpers and the pending output
+    # pylint: disable=too-many-instance-attributes
 
     width = 0
 
+    # The longest we will hold on to output waiting for more to batch with
+    LATENCY = 0.05
+
+    # The most output we will hold before writing it regardless
+    MAX_BUFFER = 64 * 1024
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        stdin=STDIN,
+        stdout=STDOUT,
+        stderr=STDERR,
+        latency=LATENCY,
+        store=None,
+        log_filter=None,
+        stats=None,
+    ):
+        self.reader = EventReader(stdin)
+        self.stdout = stdout
+        self.stderr = stderr
+        self.latency = latency
+        self.store = store
+        self.log_filter = log_filter
+        self.stats = stats or ListenerStats()
+
+        self.output = bytearray()
+        self.output_since = None
+
     def main_loop(self):
         """Run the main loop."""
 
+        self._write(READY)
+
         while True:
-            self._write("READY\n")
-            header = self._parse_header(sys.stdin.readline())
-            payload = sys.stdin.read(int(header["len"]))
+            try:
+                self._handle_event()
+            except EOFError:
+                break
 
-            # Only handle PROCESS_LOG_* events and just ACK anything else.
-            if header["eventname"] == "PROCESS_LOG_STDOUT":
-                self._log_payload(payload)
+            # Acknowledge this event and ask for the next in one go
+            self._write(OK_READY)
 
-            elif header["eventname"] == "PROCESS_LOG_STDERR":
-                self._log_payload(payload, err=True)
+        self._report_filtered(force=True)
+        self._save_stats()
+        self._flush(force=True)
 
-            self._write("RESULT 2\nOK")
+    def _handle_event(self):
+        # Write what we have if the next event isn't coming soon enough
+        timeout = self._next_timeout()
+        while timeout is not None and not self._wait(timeout):
+            self._report_filtered()
+            self._flush()
+            if self._due(self.stats.next_save()):
+                self._save_stats()
 
-    @staticmethod
-    def _write(message):
-        sys.stdout.write(message)
-        sys.stdout.flush()
+            timeout = self._next_timeout()
+
+        start = perf_counter()
+        header, payload = self.reader.read_event()
+        read = perf_counter()
+        self.stats.seconds[self.stats.READING] += read - start
+
+        # Only handle PROCESS_LOG_* events and just ACK anything else.
+        if header[b"eventname"] == b"PROCESS_LOG_STDOUT":
+            self._log_payload(payload)
+
+        elif header[b"eventname"] == b"PROCESS_LOG_STDERR":
+            self._log_payload(payload, err=True)
+
+        self.stats.event(header[b"eventname"], perf_counter() - read)
+
+        if len(self.output) >= self.MAX_BUFFER:
+            self._flush()
+
+        # Busy listeners might never wait long enough to save above
+        if self._due(self.stats.next_save()):
+            self._save_stats()
+
+    def _wait(self, timeout):
+        start = perf_counter()
+        ready = self.reader.wait(timeout)
+        self.stats.seconds[self.stats.READING] += perf_counter() - start
+
+        return ready
 
     @staticmethod
-    def _parse_header(data):
-        return dict([x.split(":") for x in data.split()])
+    def _due(deadline):
+        return deadline is not None and deadline <= monotonic()
+
+    def _write(self, message):
+        self._write_all(self.stdout, message)
+
+    def _next_timeout(self):
+        timeouts = []
+
+        if self.output:
+            timeouts.append(self.output_since + self.latency - monotonic())
+
+        if self.store:
+            next_flush = self.store.next_flush()
+            if next_flush is not None:
+                timeouts.append(next_flush - time())
+
+        if self.log_filter:
+            next_report = self.log_filter.next_report()
+            if next_report is not None:
+                timeouts.append(next_report - monotonic())
+
+        next_save = self.stats.next_save()
+        if next_save is not None:
+            timeouts.append(next_save - monotonic())
+
+        return min(timeouts) if timeouts else None
+
+    def _report_filtered(self, force=False):
+        if not self.log_filter:
+            return
+
+        for process, err, markers in self.log_filter.reports(force=force):
+            self._format(process, markers, err)
+
+    def _flush(self, force=False):
+        if self.output:
+            self._write_all(self.stderr, self.output)
+            self.output = bytearray()
+
+        self.output_since = None
+
+        if self.store:
+            self._use_store(self.store.flush, force=force)
+
+    def _use_store(self, method, *args, **kwargs):
+        try:
+            method(*args, **kwargs)
+
+        except OSError as err:
+            # Never let the store stop us passing on logs
+            self.output += f"logger | Log store disabled: {err}\n".encode("utf-8")
+            self.output_since = self.output_since or monotonic()
+            self.store = None
+
+    def _save_stats(self):
+        if not self.stats.filename:
+            return
+
+        try:
+            self.stats.save()
+
+        except OSError as err:
+            self.output += f"logger | Stats disabled: {err}\n".encode("utf-8")
+            self.output_since = self.output_since or monotonic()
+            self.stats.filename = None
+
+    def _write_all(self, fd, data):
+        start = perf_counter()
+
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+
+        self.stats.seconds[self.stats.WRITING] += perf_counter() - start
 
     def _log_payload(self, payload, err=False):
-        headerdata, data = payload.split("\n", 1)
-        header = self._parse_header(headerdata)
+        headerdata, data = payload.split(b"\n", 1)
+        header = parse_header(headerdata)
+        process = header[b"processname"]
+
+        lines = data.splitlines()
+        self.stats.output(process, len(data), len(lines))
 
-        name = header["processname"] + (":ERR" if err else "")
+        if self.store:
+            self._use_store(
+                self.store.append, process.decode("utf-8", "replace"), lines, err=err
+            )
+
+        if self.log_filter:
+            lines = self.log_filter.apply(process, lines, err=err)
+
+        self._format(process, lines, err)
+
+    def _format(self, process, lines, err=False):
+        name = process + (b":ERR" if err else b"")
 
         self.width = max(len(name), self.width)
 
-        prefix = name.ljust(self.width) + " | "
+        prefix = name.ljust(self.width) + b" | "
 
-        for line in data.splitlines():
-            sys.stderr.write(prefix + line + "\n")
+        if self.output_since is None:
+            self.output_since = monotonic()
 
-        sys.stderr.flush()
+        if lines:
+            self.output += prefix + (b"\n" + prefix).join(lines) + b"\n"
 
 
 if __name__ == "__main__":
-    StderrRedirect().main_loop()
+    PARSER = ArgumentParser(description="A supervisord log event listener")
+    PARSER.add_argument(
+        "--store", help="Also keep logs per process in a LogStore in this directory"
+    )
+    PARSER.add_argument(
+        "--rules", help="Filter output using the rules in this file (see logfilter)"
+    )
+    PARSER.add_argument(
+        "--stats", help="Rewrite counters about the listener to this file every second"
+    )
+    ARGS = PARSER.parse_args()
+
+    LOG_FILTER = None
+    if ARGS.rules:
+        try:
+            LOG_FILTER = LogFilter.load(ARGS.rules)
+        except ValueError as ERR:
+            # Carry on unfiltered rather than losing all output
+            os.write(STDERR, f"logger | Log rules not used: {ERR}\n".encode("utf-8"))
+
+    StderrRedirect(
+        store=LogStore(ARGS.store) if ARGS.store else None,
+        log_filter=LOG_FILTER,
+        stats=ListenerStats(ARGS.stats),
+    ).main_loop()
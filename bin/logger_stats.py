@@ -0,0 +1,89 @@
+"""Show the counters kept by bin/logger.py about its workload.
+
+The noisiest programs are listed first. If the listener is busy most of the
+time, it's the bottleneck and supervisor will start buffering events.
+"""
+
+import sys
+from argparse import ArgumentParser
+from time import time
+
+from superdev.logstats import ListenerStats
+
+# If the listener is busy more than this fraction of the time, it's struggling
+BUSY_WARNING = 0.8
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument(
+    "--stats", default="logs/logger.stats.json", help="The stats file to read"
+)
+
+
+def _percent(part, whole):
+    return f"{100 * part / whole:.1f}%" if whole else "-"
+
+
+def format_stats(stats, now=None):
+    """Format saved stats for display.
+
+    :param stats: A dict from `ListenerStats.load()`
+    :param now: The current time (defaults to now)
+    :return: A list of lines
+    """
+    if now is None:
+        now = time()
+
+    seconds = stats["seconds"]
+    busy = seconds["processing"] + seconds["writing"]
+    total = busy + seconds["reading"]
+    age = now - stats["updated"]
+
+    lines = [
+        f"Logger pid {stats['pid']}, up {now - stats['started']:.0f}s, "
+        f"updated {age:.1f}s ago" + (" (is it running?)" if age > 10 else ""),
+        f"Busy {_percent(busy, total)} of the time "
+        f"(processing {_percent(seconds['processing'], total)}, "
+        f"writing {_percent(seconds['writing'], total)}), "
+        f"waiting for events {_percent(seconds['reading'], total)}",
+        f"Slowest event: {stats['max_event_seconds'] * 1000:.2f}ms",
+        f"Lines per second: {stats['lines_per_second']}",
+    ]
+
+    if total and busy / total > BUSY_WARNING:
+        lines.append("WARNING: The logger is struggling to keep up")
+
+    lines.append("")
+    for event_type, count in sorted(stats["event_types"].items()):
+        lines.append(f"{event_type:<30} {count:>10}")
+
+    lines.append("")
+    lines.append(f"{'program':<30} {'events':>10} {'bytes':>12} {'lines':>10} lines/s")
+
+    processes = sorted(
+        stats["processes"].items(),
+        key=lambda item: (item[1]["lines_per_second"], item[1]["bytes"]),
+        reverse=True,
+    )
+    for process, counts in processes:
+        lines.append(
+            f"{process:<30} {counts['events']:>10} {counts['bytes']:>12} "
+            f"{counts['lines']:>10} {counts['lines_per_second']:>7}"
+        )
+
+    return lines
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+
+    try:
+        stats = ListenerStats.load(args.stats)
+    except (OSError, ValueError) as err:
+        sys.exit(f"Cannot read the logger stats ({err}). Is the logger running?")
+
+    print("\n".join(format_stats(stats)))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
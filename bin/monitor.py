@@ -0,0 +1,70 @@
+"""Continuously display the state of the development services."""
+
+import os
+from argparse import ArgumentParser
+
+from superdev.monitor import DockerContainers, Monitor, PortProbe
+from superdev.resources import ProcessTable, ResourceSampler
+from superdev.shell import run_sync
+from superdev.supervisor import Supervisor
+
+PARSER = ArgumentParser(description=__doc__)
+PARSER.add_argument(
+    "--interval",
+    type=float,
+    default=Monitor.INTERVAL,
+    help="Seconds between refreshes (default %(default)s)",
+)
+PARSER.add_argument(
+    "--services", default="conf/nmap-services", help="The ports to check"
+)
+PARSER.add_argument(
+    "--supervisor-socket", default=Supervisor.SOCKET, help="Supervisor's socket"
+)
+PARSER.add_argument(
+    "--held-file",
+    default="logs/backoff.json",
+    help="Where bin/backoff.py records the programs it's holding back",
+)
+PARSER.add_argument(
+    "--docker-ttl",
+    type=float,
+    default=DockerContainers.TTL,
+    help="Seconds to reuse docker's answer for (default %(default)s)",
+)
+PARSER.add_argument(
+    "--no-resources",
+    action="store_true",
+    help="Don't show the CPU and memory each program is using",
+)
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+
+    supervisor = Supervisor(args.supervisor_socket)
+
+    resources = None
+    if not args.no_resources and os.path.isdir(ProcessTable.PROC_DIR):
+        resources = ResourceSampler(supervisor)
+
+    monitor = Monitor(
+        ports=PortProbe.load(args.services),
+        supervisor=supervisor,
+        docker=DockerContainers(ttl=args.docker_ttl),
+        interval=args.interval,
+        held_file=args.held_file,
+        resources=resources,
+    )
+
+    try:
+        run_sync(monitor.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
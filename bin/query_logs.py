@@ -0,0 +1,140 @@
+"""Search the logs kept by bin/logger.py in its log store.
+
+Examples:
+
+    # The last 50 lines from h-devdata
+    python bin/query_logs.py tail h-devdata -n 50
+
+    # Everything from all programs between two times today
+    python bin/query_logs.py between 17:00 17:20
+
+    # Everything from h-dev and h-devdata in the last 20 minutes
+    python bin/query_logs.py between 20m -p h-dev -p h-devdata
+"""
+
+import re
+import sys
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from datetime import datetime
+from time import localtime, strftime, time
+
+from superdev.logstore import LogStore
+
+RELATIVE = re.compile(r"^-?(\d+(?:\.\d+)?)([smhd])$")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+PARSER = ArgumentParser(
+    description=__doc__.split("\n", 1)[0],
+    epilog=__doc__.split("\n", 1)[1],
+    formatter_class=RawDescriptionHelpFormatter,
+)
+PARSER.add_argument("--store", default="logs/store", help="The log store directory")
+COMMANDS = PARSER.add_subparsers(dest="command")
+
+COMMANDS.add_parser("list", help="List the programs with stored logs")
+
+TAIL = COMMANDS.add_parser("tail", help="Show the last lines from a program")
+TAIL.add_argument("process", help="The name of the program")
+TAIL.add_argument("-n", "--lines", type=int, default=100, help="Lines to show")
+
+BETWEEN = COMMANDS.add_parser("between", help="Show everything between two times")
+BETWEEN.add_argument(
+    "start", help="Like '17:00', '2020-05-26 17:00', '20m' (ago) or a UNIX timestamp"
+)
+BETWEEN.add_argument("end", nargs="?", help="As for start (defaults to now)")
+BETWEEN.add_argument(
+    "-p", "--process", action="append", help="Only include these programs"
+)
+
+
+def parse_time(value, now=None):
+    """Parse a time given on the command line.
+
+    :param value: The time as a string
+    :param now: The current time as a timestamp (defaults to now)
+    :raise ValueError: If the time isn't understood
+    :return: A UNIX timestamp
+    """
+    if now is None:
+        now = time()
+
+    match = RELATIVE.match(value)
+    if match:
+        return now - float(match.group(1)) * UNITS[match.group(2)]
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parsed = _strptime(value, FORMATS)
+    if parsed:
+        return parsed.timestamp()
+
+    parsed = _strptime(value, TIME_FORMATS)
+    if parsed:
+        today = datetime.fromtimestamp(now)
+        return today.replace(
+            hour=parsed.hour, minute=parsed.minute, second=parsed.second, microsecond=0
+        ).timestamp()
+
+    raise ValueError(f"Cannot understand the time '{value}'")
+
+
+def _strptime(value, time_formats):
+    for time_format in time_formats:
+        try:
+            return datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+
+    return None
+
+
+def format_line(timestamp, process, err, text):
+    """Format a stored line for display.
+
+    :return: The line as bytes, with a trailing newline
+    """
+    stamp = strftime("%Y-%m-%d %H:%M:%S", localtime(timestamp))
+    millis = int(timestamp * 1000) % 1000
+    name = process + (":ERR" if err else "")
+
+    return f"{stamp}.{millis:03d} {name} | ".encode("utf-8") + text + b"\n"
+
+
+def _time_range(args):
+    return parse_time(args.start), parse_time(args.end) if args.end else time()
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+    store = LogStore(args.store)
+    output = sys.stdout.buffer
+
+    if args.command == "list":
+        for process in store.processes():
+            print(process)
+
+    elif args.command == "tail":
+        for timestamp, err, text in store.tail(args.process, args.lines):
+            output.write(format_line(timestamp, args.process, err, text))
+
+    elif args.command == "between":
+        try:
+            start, end = _time_range(args)
+        except ValueError as err:
+            PARSER.error(str(err))
+
+        for line in store.between(start, end, args.process):
+            output.write(format_line(*line))
+
+    else:
+        PARSER.print_help()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
@@ -0,0 +1,131 @@
+"""Replay the cookiecutter templates over every managed project at once.
+
+Every project `ProjectManager` knows about with a `.cookiecutter.json` is
+replayed. Each template is fetched once and shared by all the projects which
+use it, and the projects are rendered and synced in parallel.
+"""
+
+import json
+import os
+import shutil
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import mkdtemp
+
+from replay_cookie_cutter import CookieCutter, RenderCache
+
+from superdev.project import ProjectManager
+
+PROJECT_DIR = "../"
+CONFIG_FILE = ".cookiecutter.json"
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument(
+    "-n",
+    "--dry-run",
+    action="store_true",
+    help="Report what would change without writing anything",
+)
+PARSER.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Render the templates again even if they've been rendered before",
+)
+PARSER.add_argument(
+    "--workers",
+    type=int,
+    default=os.cpu_count(),
+    help="How many projects to replay at once",
+)
+
+
+def find_projects(projects):
+    """Find the projects which were made from a template.
+
+    :param projects: A list of `Project` objects
+    :return: A dict of template to a list of (project, config) tuples
+    """
+    by_template = {}
+
+    for project in projects:
+        try:  # pylint:disable=too-many-try-statements
+            with open(os.path.join(project.path, CONFIG_FILE)) as handle:
+                config = json.load(handle)
+        except FileNotFoundError:
+            continue
+
+        template = CookieCutter.get_template_from_config(config)
+        by_template.setdefault(template, []).append((project, config))
+
+    return by_template
+
+
+def _replay_all(by_template, templates_dir, args):
+    # Fetch each template once, and replay every project made from it
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = {}
+        for template, members in sorted(by_template.items()):
+            local_template = CookieCutter.fetch_template(template, templates_dir)
+            print(f"{template}: {', '.join(project.name for project, _ in members)}")
+
+            for project, config in members:
+                futures[project.name] = executor.submit(
+                    _sync,
+                    project.path,
+                    config,
+                    local_template,
+                    args.dry_run,
+                    not args.no_cache,
+                )
+
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _sync(project_dir, config, template, dry_run, use_cache):
+    # Rendering changes the working directory, so this is run in its own
+    # process rather than a thread
+    try:
+        return CookieCutter.sync(
+            project_dir,
+            config,
+            template,
+            dry_run=dry_run,
+            cache=RenderCache() if use_cache else None,
+        )
+    except Exception as err:  # pylint: disable=broad-except
+        return f"Failed: {err.__class__.__name__}: {err}"
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+
+    projects = ProjectManager(PROJECT_DIR).projects.values()
+    by_template = find_projects(project for project in projects if project.exists)
+    if not by_template:
+        sys.exit(f"No projects with a {CONFIG_FILE} in '{PROJECT_DIR}'")
+
+    templates_dir = mkdtemp()
+    try:
+        results = _replay_all(by_template, templates_dir, args)
+    finally:
+        shutil.rmtree(templates_dir)
+
+    if not args.no_cache:
+        RenderCache().evict()
+
+    all_good = True
+    for name, report in sorted(results.items()):
+        print(f"\n[{name}]")
+        if isinstance(report, str):
+            print(f"  {report}")
+            all_good = False
+        else:
+            print("\n".join(report.lines()))
+
+    sys.exit(0 if all_good else 1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
@@ -1,25 +1,225 @@
 """A script for re-applying a cookiecutter template over a project."""
 import fnmatch
+import hashlib
 import json
 import os
 import os.path
+import re
 import shutil
+import stat
+import subprocess
 from argparse import ArgumentParser
-from distutils.dir_util import mkpath
-from tempfile import mkdtemp
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory, mkdtemp
+from time import time
 
+from cookiecutter.config import BUILTIN_ABBREVIATIONS
 from cookiecutter.main import cookiecutter
+from cookiecutter.repository import expand_abbreviations, is_repo_url
 
 PARSER = ArgumentParser()
 PARSER.add_argument("-c", "--config", required=True)
 PARSER.add_argument("-o", "--output-directory")
+PARSER.add_argument(
+    "-n",
+    "--dry-run",
+    action="store_true",
+    help="Report what would change without writing anything",
+)
+PARSER.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Render the template again even if it's been rendered before",
+)
+
+
+class SyncReport:
+    """What happened to each file when copying one tree over another."""
+
+    CREATED = "created"
+    CHANGED = "changed"
+    SKIPPED = "skipped"
+    UNCHANGED = "unchanged"
+
+    ALL = (CREATED, CHANGED, SKIPPED, UNCHANGED)
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.files = {outcome: [] for outcome in self.ALL}
+        # Whether the template came from a `RenderCache`
+        self.cached = False
+
+    def add(self, outcome, rel_path):
+        """Record what happened to a file.
+
+        :param outcome: One of `ALL`
+        :param rel_path: The path of the file relative to the tree
+        """
+        self.files[outcome].append(rel_path)
+
+    def lines(self):
+        """Describe the outcome, listing the files which were written.
+
+        :return: A list of lines
+        """
+        lines = []
+
+        for outcome in (self.CREATED, self.CHANGED, self.SKIPPED):
+            for rel_path in sorted(self.files[outcome]):
+                lines.append(f"  {outcome:<10} {rel_path}")
+
+        lines.append(
+            f"{'Would have created' if self.dry_run else 'Created'} "
+            f"{len(self.files[self.CREATED])}, "
+            f"changed {len(self.files[self.CHANGED])}, "
+            f"skipped {len(self.files[self.SKIPPED])} and left "
+            f"{len(self.files[self.UNCHANGED])} unchanged files"
+            + (" (using a cached render)" if self.cached else "")
+        )
+
+        return lines
+
+
+class RenderCache:
+    """Rendered templates kept between runs, keyed by what they came from.
+
+    Each entry is a directory named after a hash of the template's revision
+    and the config it was rendered with, so the same render can be reused by
+    any project with the same template and config. Entries are touched when
+    used, and the least recently used are removed once there are too many
+    or they are too old.
+    """
+
+    DIRECTORY = os.path.join(
+        os.path.expanduser("~"), ".cache", "superdev", "cookiecutter"
+    )
+
+    # The most to keep in bytes, and the longest to keep anything in seconds
+    MAX_SIZE = 200 * 1024 * 1024
+    MAX_AGE = 30 * 24 * 60 * 60
+
+    # Renders in progress have this suffix
+    STAGING = ".tmp"
+
+    def __init__(self, directory=DIRECTORY, max_size=MAX_SIZE, max_age=MAX_AGE):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+
+    @classmethod
+    def key(cls, revision, config):
+        """Get the key for a render.
+
+        :param revision: The exact revision of the template
+        :param config: The config to render it with
+        :return: A string to use as a directory name
+        """
+        config_json = json.dumps(config, sort_keys=True)
+
+        return hashlib.sha256(f"{revision}\n{config_json}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get a cached render.
+
+        :param key: The key from `key()`
+        :return: The directory the template was rendered into, or None
+        """
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+
+        os.utime(path)
+        return path
+
+    def add(self, key, render):
+        """Render a template into the cache.
+
+        :param key: The key from `key()`
+        :param render: A function which renders into the directory it's given
+        :return: The directory the template was rendered into
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key)
+        staging = mkdtemp(dir=self.directory, prefix=f"{key}.", suffix=self.STAGING)
+
+        try:  # pylint:disable=too-many-try-statements
+            render(staging)
+            self._publish(staging, path)
+
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+
+        return path
+
+    def evict(self, now=None):
+        """Remove renders which are too old, or haven't been used recently.
+
+        :param now: The current time (defaults to now)
+        :return: A list of the directories removed
+        """
+        if now is None:
+            now = time()
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            entries.append((os.stat(path).st_mtime, self._size(path), path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = []
+
+        # Oldest first
+        for used, size, path in sorted(entries):
+            if now - used <= self.max_age and (
+                total <= self.max_size or path.endswith(self.STAGING)
+            ):
+                continue
+
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed.append(path)
+
+        return removed
+
+    @staticmethod
+    def _publish(staging, path):
+        try:
+            os.replace(staging, path)
+        except OSError:
+            # Someone else added the same render while we were working
+            if not os.path.isdir(path):
+                raise
+
+    @staticmethod
+    def _size(path):
+        size = 0
+        for parent_dir, _, filenames in os.walk(path):
+            for filename in filenames:
+                size += os.lstat(os.path.join(parent_dir, filename)).st_size
+
+        return size
 
 
 class CookieCutter:
     """A collection of cookie cutter related functions."""
 
+    # How many files to compare and copy at once
+    WORKERS = 8
+
+    # How much of a file to read at a time when hashing it
+    CHUNK_SIZE = 64 * 1024
+
     @classmethod
-    def replay(cls, project_dir, config, template=None):
+    def replay(  # pylint:disable=too-many-arguments
+        cls, project_dir, config, template=None, dry_run=False, cache=None
+    ):
         """Replay a project based on the config provided.
 
         The value in '_template' will be used to decide which template to
@@ -31,6 +231,10 @@ class CookieCutter:
 
         :param template: The template to apply
 
+        :param dry_run: Report what would change without writing anything
+
+        :param cache: A `RenderCache` to reuse renders from
+
         :return: The name of the project created
 
         :raise ValueError: If cookiecutter replaying would change the
@@ -38,13 +242,27 @@ class CookieCutter:
             the cookiecutter project template is different from the currently
             existing name of the project)
         """
+        report = cls.sync(project_dir, config, template, dry_run, cache)
+        print("\n".join(report.lines()))
+
+        return os.path.basename(os.path.abspath(project_dir))
+
+    @classmethod
+    def sync(  # pylint:disable=too-many-arguments
+        cls, project_dir, config, template=None, dry_run=False, cache=None
+    ):
+        """Replay a project without printing anything.
+
+        This takes the same arguments as `replay()`.
+
+        :return: A `SyncReport` of what changed
+        :raise ValueError: As for `replay()`
+        """
         project_dir = os.path.abspath(project_dir)
         disable_replay = config.get("options", {}).get("disable_replay")
 
-        temp_dir = mkdtemp()
-
-        try:  # pylint:disable=too-many-try-statements
-            project_name = cls.render_template(temp_dir, config, template)
+        with cls._rendered(config, template, cache) as (rendered_dir, cached):
+            project_name = cls._project_name(rendered_dir)
             current_name = os.path.basename(project_dir)
 
             if project_name != current_name:
@@ -53,59 +271,198 @@ class CookieCutter:
                     f"Created {project_name}, existing {current_name}"
                 )
 
-            cls._copy_tree(
-                os.path.join(temp_dir, project_name),
+            report = cls._copy_tree(
+                os.path.join(rendered_dir, project_name),
                 project_dir,
                 skip_patterns=disable_replay,
+                dry_run=dry_run,
             )
+            report.cached = cached
 
-            return project_name
+        return report
 
-        finally:
-            shutil.rmtree(temp_dir)
+    @classmethod
+    @contextmanager
+    def _rendered(cls, config, template, cache):
+        """Render the template, or find it already rendered in the cache.
+
+        :return: A context manager yielding the directory it's rendered in,
+            and whether it came from the cache
+        """
+        if template is None:
+            template = cls.get_template_from_config(config)
+
+        with TemporaryDirectory() as templates_dir:
+            revision = None
+            if cache:
+                # Render our own copy of a remote template, so the revision we
+                # cache the render under is exactly the one rendered
+                template = cls.fetch_template(template, templates_dir)
+                revision = cls.template_revision(template)
+
+            if revision is None:
+                with TemporaryDirectory() as temp_dir:
+                    cls.render_template(temp_dir, config, template)
+                    yield temp_dir, False
+                return
+
+            key = cache.key(revision, config)
+            rendered_dir = cache.get(key)
+
+            cached = rendered_dir is not None
+            if not cached:
+                rendered_dir = cache.add(
+                    key,
+                    lambda output_dir: cls.render_template(
+                        output_dir, config, template
+                    ),
+                )
+
+            yield rendered_dir, cached
+
+    @classmethod
+    def fetch_template(cls, template, directory):
+        """Get a local copy of a template, so it can be rendered many times.
+
+        :param template: The template as given to cookiecutter
+        :param directory: Where to put copies of remote templates
+        :return: The path of a local copy, or the template unchanged if it's
+            already local or can't be fetched
+        """
+        url = expand_abbreviations(template, BUILTIN_ABBREVIATIONS)
+        if not is_repo_url(url):
+            return template
+
+        path = os.path.join(directory, hashlib.sha1(url.encode("utf-8")).hexdigest())
+        if cls._git("clone", "--quiet", "--depth", "1", url, path) is None:
+            return template
+
+        return path
+
+    @classmethod
+    def template_revision(cls, template):
+        """Work out exactly which revision of a template will be rendered.
+
+        Only local templates have a revision: cookiecutter clones remote ones
+        itself, so they could change between us asking and it cloning. Use
+        `fetch_template()` to get a local copy first.
+
+        :param template: A local template, like one from `fetch_template()`
+        :return: A git commit hash, or None if it can't be worked out (like
+            a remote template or one with uncommitted changes)
+        """
+        if not os.path.isdir(template):
+            return None
+
+        if cls._git("status", "--porcelain", cwd=template) != "":
+            return None
+
+        return cls._git("rev-parse", "HEAD", cwd=template)
+
+    @staticmethod
+    def _git(*args, cwd=None):
+        try:
+            return subprocess.run(
+                ["git"] + list(args),
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                check=True,
+                universal_newlines=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
 
     @classmethod
-    def _matches_pattern(cls, filename, skip_patterns):
-        """Check if the filename matches any of the patterns in skip_patterns.
+    def _compile_patterns(cls, skip_patterns):
+        """Combine bash style globs like 'thing/*.txt' into one regex.
 
-        These patterns are bash style globs like 'thing/*.txt'
+        :return: A compiled regex, or None if there are no patterns
         """
-        for pattern in skip_patterns:
-            if fnmatch.fnmatch(filename, pattern):
-                print(f"Skipping: '{filename}' as it matched pattern '{pattern}'")
-                return True
+        if not skip_patterns:
+            return None
 
-        return False
+        return re.compile(
+            "|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in skip_patterns)
+        )
 
     @classmethod
-    def _copy_tree(cls, source_dir, target_dir, skip_patterns=None):
+    def _copy_tree(cls, source_dir, target_dir, skip_patterns=None, dry_run=False):
         """Copy a directory over another one.
 
         Optionally skipping files which match the specified glob style patterns
-        like 'thing/*.txt'
+        like 'thing/*.txt', unless they don't exist in the target yet. Files
+        which are already the same in the target aren't copied again, and the
+        rest are copied in parallel.
+
+        :return: A `SyncReport`
         """
-        if not skip_patterns:
-            skip_patterns = []
+        skip = cls._compile_patterns(skip_patterns)
+        report = SyncReport(dry_run)
 
+        rel_paths = []
         for parent_dir, _, filenames in os.walk(source_dir):
             for filename in filenames:
-                rel_path = os.path.relpath(
-                    os.path.join(parent_dir, filename), source_dir
+                rel_paths.append(
+                    os.path.relpath(os.path.join(parent_dir, filename), source_dir)
                 )
 
-                target = os.path.join(target_dir, rel_path)
-
-                if cls._matches_pattern(rel_path, skip_patterns):
-                    if os.path.exists(target):
-                        continue
+        def sync_file(rel_path):
+            source = os.path.join(source_dir, rel_path)
+            target = os.path.join(target_dir, rel_path)
 
-                    print("... target doesn't exist: Skipping the skip!")
+            outcome = cls._compare(source, target)
+            if outcome == SyncReport.UNCHANGED:
+                return outcome
 
-                source = os.path.join(source_dir, rel_path)
+            if outcome == SyncReport.CHANGED and skip and skip.match(rel_path):
+                return SyncReport.SKIPPED
 
-                mkpath(os.path.dirname(target))
+            if not dry_run:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
                 shutil.copy(source, target)
 
+            return outcome
+
+        with ThreadPoolExecutor(cls.WORKERS) as executor:
+            for rel_path, outcome in zip(rel_paths, executor.map(sync_file, rel_paths)):
+                report.add(outcome, rel_path)
+
+        return report
+
+    @classmethod
+    def _compare(cls, source, target):
+        """Check whether a file needs copying.
+
+        :return: `SyncReport.CREATED` if the target doesn't exist,
+            `SyncReport.UNCHANGED` if it has the same size, content and
+            permissions as the source, or `SyncReport.CHANGED` if not
+        """
+        try:
+            target_stat = os.stat(target)
+        except FileNotFoundError:
+            return SyncReport.CREATED
+
+        source_stat = os.stat(source)
+        if (
+            source_stat.st_size != target_stat.st_size
+            or stat.S_IMODE(source_stat.st_mode) != stat.S_IMODE(target_stat.st_mode)
+            or cls._hash(source) != cls._hash(target)
+        ):
+            return SyncReport.CHANGED
+
+        return SyncReport.UNCHANGED
+
+    @classmethod
+    def _hash(cls, filename):
+        digest = hashlib.sha1()
+
+        with open(filename, "rb") as handle:
+            for chunk in iter(lambda: handle.read(cls.CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+        return digest.digest()
+
     @classmethod
     def render_template(cls, project_dir, config, template=None):
         """Create a project based on the config provided.
@@ -131,6 +488,10 @@ class CookieCutter:
             output_dir=project_dir,
         )
 
+        return cls._project_name(project_dir)
+
+    @classmethod
+    def _project_name(cls, project_dir):
         items = os.listdir(project_dir)
         assert len(items) == 1, "There is a unique file in the output dir"
         return items[0]
@@ -152,11 +513,21 @@ def run():
     with open(args.config) as handle:
         config = json.load(handle)
 
+    cache = None if args.no_cache else RenderCache()
     project_name = CookieCutter.replay(
-        project_dir=args.output_directory or os.getcwd(), config=config
+        project_dir=args.output_directory or os.getcwd(),
+        config=config,
+        dry_run=args.dry_run,
+        cache=cache,
     )
+    if cache:
+        cache.evict()
 
     template = CookieCutter.get_template_from_config(config)
+    if args.dry_run:
+        print(f"Checked {project_name} against {template} (nothing written)")
+        return
+
     print(f"Recreated {project_name} from {template}")
     print("You should now check for updated files...")
 
@@ -0,0 +1,91 @@
+"""Regularly write the CPU and memory used by each program to a JSON file.
+
+This runs under supervisor alongside the programs it measures:
+
+    [program:resource-sampler]
+    command=bin/sample_resources.py --output logs/resources.json
+
+Each snapshot has the latest sample of every program and group, with the
+peak memory and average CPU over the last few samples. See
+`superdev.resources` for what's measured.
+"""
+
+import asyncio
+import sys
+import xmlrpc.client
+from argparse import ArgumentParser
+
+from superdev.resources import ResourceSampler
+from superdev.shell import run_sync
+from superdev.supervisor import Supervisor
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument(
+    "--output", default="logs/resources.json", help="Where to write the snapshot"
+)
+PARSER.add_argument(
+    "--interval",
+    type=float,
+    default=5.0,
+    help="Seconds between samples (default %(default)s)",
+)
+PARSER.add_argument(
+    "--window",
+    type=int,
+    default=ResourceSampler.WINDOW,
+    help="Samples to report peaks and averages over (default %(default)s)",
+)
+PARSER.add_argument(
+    "--no-pss",
+    action="store_true",
+    help="Don't read proportional memory, which is slower with many processes",
+)
+PARSER.add_argument(
+    "--supervisor-socket", default=Supervisor.SOCKET, help="Supervisor's socket"
+)
+
+
+async def sample_forever(sampler, filename, interval):
+    """Sample and write a snapshot every interval until cancelled.
+
+    :param sampler: A `ResourceSampler` object
+    :param filename: The file to write the snapshot to
+    :param interval: Seconds between samples
+    """
+    problem = None
+
+    while True:
+        try:
+            await _sample_and_write(sampler, filename)
+        except (OSError, xmlrpc.client.Fault) as err:
+            # Supervisor may not be up yet, so only mention each problem once
+            if str(err) != problem:
+                problem = str(err)
+                print(f"Cannot sample resources: {problem}", file=sys.stderr)
+        else:
+            problem = None
+
+        await asyncio.sleep(interval)
+
+
+async def _sample_and_write(sampler, filename):
+    await sampler.sample()
+    sampler.write(filename)
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+
+    sampler = ResourceSampler(
+        Supervisor(args.supervisor_socket), pss=not args.no_pss, window=args.window
+    )
+
+    try:
+        run_sync(sample_forever(sampler, args.output, args.interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
@@ -0,0 +1,63 @@
+"""Start supervised programs in order once the things they need are ready.
+
+This runs as a one-shot program under supervisor. See `superdev.startup` for
+the format of the startup file.
+"""
+
+import sys
+import xmlrpc.client
+from argparse import ArgumentParser
+
+from superdev.shell import run_sync
+from superdev.startup import Orchestrator, StartupPlan
+from superdev.supervisor import Supervisor
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument(
+    "startup_file", nargs="?", default="conf/startup.conf", help="The startup file"
+)
+PARSER.add_argument(
+    "--supervisor-socket", default=Supervisor.SOCKET, help="Supervisor's socket"
+)
+PARSER.add_argument(
+    "--only",
+    action="append",
+    help="Only start this program, and ignore the rest of the startup file",
+)
+PARSER.add_argument(
+    "--ready-file",
+    help="Record when each program became ready in this file, for profiling",
+)
+PARSER.add_argument(
+    "--timeout",
+    type=float,
+    default=900,
+    help="Give up if everything isn't ready in this many seconds",
+)
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+
+    try:  # pylint:disable=too-many-try-statements
+        plan = StartupPlan.load(args.startup_file)
+        if args.only:
+            plan = plan.only(args.only)
+    except ValueError as err:
+        sys.exit(f"Cannot read the startup file: {err}")
+
+    orchestrator = Orchestrator(
+        plan, Supervisor(args.supervisor_socket), ready_file=args.ready_file
+    )
+
+    try:
+        all_ready = run_sync(orchestrator.run(timeout=args.timeout))
+    except (OSError, ValueError, xmlrpc.client.Fault) as err:
+        sys.exit(f"Could not start everything: {err}")
+
+    sys.exit(0 if all_ready else 1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
@@ -0,0 +1,76 @@
+"""Show what decided how long the stack took to start.
+
+This reads the records kept by bin/startup_recorder.py, and shows a timeline
+for each program, the critical path through the dependencies in the startup
+file and how long was lost to programs failing to start. The latest run is
+compared with the one before it.
+"""
+
+import sys
+from argparse import ArgumentParser
+
+from superdev.profiler import StartupProfile, StartupRecord
+from superdev.startup import StartupPlan
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument(
+    "--runs", default="logs/startup", help="The directory of start up records"
+)
+PARSER.add_argument(
+    "--startup", default="conf/startup.conf", help="The startup file to read"
+)
+PARSER.add_argument(
+    "--run", help="The record to show (defaults to the latest in the directory)"
+)
+PARSER.add_argument(
+    "--compare", help="The record to compare with (defaults to the one before)"
+)
+PARSER.add_argument(
+    "--trace",
+    help="Write a trace file for chrome://tracing or https://ui.perfetto.dev",
+)
+
+
+def _load_profile(filename, after):
+    try:
+        return StartupProfile(StartupRecord.load(filename), after)
+    except (OSError, ValueError) as err:
+        sys.exit(f"Cannot read the start up record: {err}")
+
+
+def run():
+    """Main entry-point to run the script."""
+    args = PARSER.parse_args()
+
+    try:
+        after = StartupPlan.load(args.startup).after
+    except ValueError as err:
+        print(f"Not showing dependencies: {err}", file=sys.stderr)
+        after = {}
+
+    runs = StartupRecord.runs(args.runs)
+    filename = args.run or (runs[-1] if runs else None)
+    if filename is None:
+        sys.exit(f"No start up records in '{args.runs}'. Has `make dev` been run?")
+
+    previous = args.compare
+    if previous is None and filename in runs and runs.index(filename) > 0:
+        previous = runs[runs.index(filename) - 1]
+
+    profile = _load_profile(filename, after)
+    print(f"Start up record: {filename}\n")
+    print("\n".join(profile.format()))
+
+    if previous:
+        comparison = profile.compare(_load_profile(previous, after))
+        if comparison:
+            print(f"\nCompared with: {previous}\n")
+            print("\n".join(comparison))
+
+    if args.trace:
+        profile.timeline().write_trace(args.trace)
+        print(f"\nTrace written to: {args.trace}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    run()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+"""
+startup_recorder is a supervisord event listener which records start up.
+
+It records every PROCESS_STATE event, when each port in conf/nmap-services
+first opens and when bin/start_programs.py finds each program ready, for a
+while after supervisor starts. The result is a `superdev.profiler`
+`StartupRecord` in the runs directory, which bin/startup_profile.py reports
+on.
+
+    [eventlistener:startup-recorder]
+    command=bin/startup_recorder.py --ignore logger --ignore backoff
+    events=PROCESS_STATE
+    stderr_logfile=/dev/fd/1
+    stderr_logfile_maxbytes=0
+
+It only records for "--duration" seconds, so a long running stack doesn't
+keep writing to disk. Any problems are written to stderr.
+"""
+
+import asyncio
+import os
+from argparse import ArgumentParser
+from time import time
+
+from superdev.events import (
+    OK_READY,
+    READY,
+    STDERR,
+    STDIN,
+    STDOUT,
+    EventReader,
+    parse_header,
+)
+from superdev.monitor import PortProbe
+from superdev.profiler import StartupRecord
+from superdev.shell import run_sync
+
+
+class StartupRecorder:  # pylint: disable=too-few-public-methods
+    """Record process state changes, ports opening and programs being ready."""
+
+    # The options, the pipes to supervisor and the record we are making
+    # pylint: disable=too-many-instance-attributes
+
+    STATE_EVENT = b"PROCESS_STATE_"
+
+    # How often to check ports and save in seconds
+    CHECK_EVERY = 0.5
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        runs_dir,
+        ports,
+        ready_file=None,
+        duration=900,
+        ignore=(),
+        stdin=STDIN,
+        stdout=STDOUT,
+        stderr=STDERR,
+    ):
+        self.runs_dir = runs_dir
+        self.ports = ports
+        self.ready_file = ready_file
+        self.duration = duration
+        self.ignore = set(ignore)
+
+        self.record = StartupRecord(time())
+        self.recording = True
+        self._changed = True
+        self._next_check = self.record.started
+
+        self.reader = EventReader(stdin)
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def main_loop(self):
+        """Run the main loop."""
+        os.write(self.stdout, READY)
+
+        while True:
+            try:
+                self._handle_event()
+            except EOFError:
+                break
+
+            os.write(self.stdout, OK_READY)
+
+        if self.recording:
+            self._stop()
+
+    def _handle_event(self):
+        while self.recording and not self.reader.wait(self._next_check - time()):
+            self._check()
+
+        header, payload = self.reader.read_event()
+        if not self.recording or not header[b"eventname"].startswith(self.STATE_EVENT):
+            return
+
+        process = parse_header(payload.split(b"\n", 1)[0])[b"processname"]
+        process = process.decode("utf-8")
+        if process in self.ignore:
+            return
+
+        state = header[b"eventname"][len(self.STATE_EVENT) :].decode("utf-8")
+        self.record.state_changed(process, state)
+        self._changed = True
+
+    def _check(self):
+        self._next_check = time() + self.CHECK_EVERY
+
+        waiting = [probe for probe in self.ports if probe.name not in self.record.ports]
+        if waiting:
+            states = run_sync(_probe_all(waiting))
+            for probe, state in zip(waiting, states):
+                if state == PortProbe.OPEN:
+                    self.record.port_opened(probe.name, probe.port)
+                    self._changed = True
+
+        self._read_ready_file()
+
+        if self._changed:
+            self._save()
+
+        if time() - self.record.started > self.duration:
+            self._stop()
+
+    def _read_ready_file(self):
+        if not self.ready_file:
+            return
+
+        ready = StartupRecord.load_ready(self.ready_file)
+        for program, ready_at in ready.items():
+            # Only count programs found ready since we started
+            if ready_at >= self.record.started and program not in self.record.ready:
+                self.record.mark_ready(program, ready_at)
+                self._changed = True
+
+    def _save(self):
+        try:
+            self.record.save(self.runs_dir)
+        except OSError as err:
+            self._report(f"Cannot save the start up record, giving up: {err}")
+            self.recording = False
+        else:
+            self._changed = False
+
+    def _stop(self):
+        self._read_ready_file()
+        self._save()
+        self.recording = False
+
+    def _report(self, message):
+        os.write(self.stderr, f"startup_recorder | {message}\n".encode("utf-8"))
+
+
+async def _probe_all(probes):
+    # `run_sync` needs a coroutine, and the probes must be made in its loop
+    return await asyncio.gather(*(probe.probe(timeout=0.1) for probe in probes))
+
+
+if __name__ == "__main__":
+    PARSER = ArgumentParser(description="A supervisord start up recording listener")
+    PARSER.add_argument(
+        "--runs", default="logs/startup", help="The directory to keep records in"
+    )
+    PARSER.add_argument(
+        "--services", default="conf/nmap-services", help="The ports to watch"
+    )
+    PARSER.add_argument(
+        "--ready-file",
+        default="logs/startup_ready.json",
+        help="Where bin/start_programs.py records programs becoming ready",
+    )
+    PARSER.add_argument(
+        "--duration",
+        type=float,
+        default=900,
+        help="Stop recording this many seconds after starting",
+    )
+    PARSER.add_argument(
+        "--ignore", action="append", default=[], help="Don't record this program"
+    )
+    ARGS = PARSER.parse_args()
+
+    StartupRecorder(
+        ARGS.runs,
+        PortProbe.load(ARGS.services),
+        ready_file=ARGS.ready_file,
+        duration=ARGS.duration,
+        # Don't record ourselves
+        ignore=ARGS.ignore
+        + [os.environ.get("SUPERVISOR_PROCESS_NAME", "startup-recorder")],
+    ).main_loop()
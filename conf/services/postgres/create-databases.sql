@@ -0,0 +1,5 @@
+-- Run by postgres the first time the shared pool starts. Projects point at
+-- their database with `DATABASE_URL` in their services.conf
+CREATE DATABASE h;
+CREATE DATABASE lms;
+CREATE DATABASE via3;
@@ -0,0 +1,177 @@
+"""Hold back programs which keep crashing, rather than restarting them at once.
+
+Supervisor restarts a failing program straight away, and gives up with FATAL
+after a few tries. When a program is crashing because something it needs
+isn't up yet, that just burns CPU which the thing it's waiting on could use.
+
+`RestartBackoff` watches state changes, and once a program has crashed
+`threshold` times within `window` seconds it should be stopped and "held
+back" for a while before being started again. Each time a program is held
+back the delay doubles, up to `max_delay`. Once a program has been running
+for `stable_after` seconds it's forgiven, and the delay starts again from
+`base_delay`.
+"""
+
+import json
+import os
+from time import time
+
+
+class RestartBackoff:
+    """Track crashes per program and decide when to hold them back."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    # Crashing this many times...
+    THRESHOLD = 3
+    # ... within this many seconds gets a program held back
+    WINDOW = 60.0
+
+    # The first delay in seconds, which doubles each time after that
+    BASE_DELAY = 5.0
+    MAX_DELAY = 120.0
+
+    # Programs which run for this many seconds are forgiven
+    STABLE_AFTER = 60.0
+
+    # States which mean a program failed (EXITED only counts if unexpected)
+    FAILED_STATES = ("BACKOFF", "FATAL")
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        threshold=THRESHOLD,
+        window=WINDOW,
+        base_delay=BASE_DELAY,
+        max_delay=MAX_DELAY,
+        stable_after=STABLE_AFTER,
+    ):
+        self.threshold = threshold
+        self.window = window
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after
+
+        # Programs being held back, to a dict of when they are due to be
+        # started again, the delay and the number of crashes
+        self.held = {}
+
+        self._crashes = {}
+        self._level = {}
+        self._running_since = {}
+
+    def state_changed(self, program, state, expected=True, now=None):
+        """Record a program changing state.
+
+        :param program: The full name of the program, like "h:h-dev"
+        :param state: The state it's moved into, like "BACKOFF"
+        :param expected: For EXITED, whether the exit was expected
+        :param now: The time of the change (defaults to now)
+        :return: The number of seconds to hold the program back for, or None
+            if it shouldn't be
+        """
+        if now is None:
+            now = time()
+
+        if state == "RUNNING":
+            self._running_since[program] = now
+            return None
+
+        if state == "STARTING":
+            # Someone has started it by hand, so it's not ours to hold any more
+            self.held.pop(program, None)
+            return None
+
+        if state not in self.FAILED_STATES and (state != "EXITED" or expected):
+            return None
+
+        running_since = self._running_since.pop(program, None)
+        if running_since is not None and now - running_since >= self.stable_after:
+            self.forgive(program)
+
+        if program in self.held:
+            return None
+
+        crashes = [
+            crashed_at
+            for crashed_at in self._crashes.get(program, [])
+            if now - crashed_at < self.window
+        ]
+        crashes.append(now)
+        self._crashes[program] = crashes
+
+        if len(crashes) < self.threshold:
+            return None
+
+        level = self._level.get(program, 0)
+        delay = min(self.max_delay, self.base_delay * 2**level)
+
+        self._level[program] = level + 1
+        self._crashes[program] = []
+        self.held[program] = {
+            "until": now + delay,
+            "delay": delay,
+            "crashes": len(crashes),
+        }
+
+        return delay
+
+    def forgive(self, program):
+        """Forget about a program's past crashes.
+
+        :param program: The full name of the program
+        """
+        self._crashes.pop(program, None)
+        self._level.pop(program, None)
+
+    def next_release(self):
+        """Get when the next held program is due to be started.
+
+        :return: A timestamp, or None if nothing is held back
+        """
+        if not self.held:
+            return None
+
+        return min(hold["until"] for hold in self.held.values())
+
+    def release(self, now=None):
+        """Stop holding back programs which have waited long enough.
+
+        :param now: The current time (defaults to now)
+        :return: A list of programs which should be started again
+        """
+        if now is None:
+            now = time()
+
+        due = sorted(
+            program for program, hold in self.held.items() if hold["until"] <= now
+        )
+        for program in due:
+            del self.held[program]
+
+        return due
+
+    def save(self, filename):
+        """Write the programs being held back to a file for other tools.
+
+        :param filename: The file to write
+        :raise OSError: If the file can't be written
+        """
+        temp_file = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as handle:
+            json.dump(self.held, handle, indent=2, sort_keys=True)
+
+        os.replace(temp_file, filename)
+
+    @classmethod
+    def load_held(cls, filename):
+        """Read the programs being held back from a file.
+
+        :param filename: The file to read
+        :return: A dict like `held`, which is empty if the file can't be read
+        """
+        try:  # pylint:disable=too-many-try-statements
+            with open(filename) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,104 @@
+"""Strategies for cloning projects quickly, and a shared object cache."""
+
+import os
+import re
+
+from superdev.shell import Shell, ShellException, run_sync
+
+
+class CloneStrategy:
+    """The ways we can clone a project."""
+
+    # pylint: disable=too-few-public-methods
+
+    # Everything: the full history with every file
+    FULL = "full"
+
+    # The full history, but file contents are only downloaded when needed
+    PARTIAL = "partial"
+
+    # Only the latest commit. This gets deepened if the strategy changes
+    SHALLOW = "shallow"
+
+    # Borrow objects from a shared local cache of mirrors
+    REFERENCE = "reference"
+
+    ALL = (FULL, PARTIAL, SHALLOW, REFERENCE)
+
+    OPTIONS = {
+        FULL: [],
+        PARTIAL: ["--filter=blob:none"],
+        SHALLOW: ["--depth=1"],
+    }
+
+
+class ObjectCache:
+    """A directory of bare mirrors which checkouts can borrow objects from.
+
+    Checkouts cloned with `--reference` only store objects the mirror doesn't
+    have, so the cache is shared across checkouts and across superdev
+    installs. The mirrors must be kept around once checkouts refer to them.
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("SUPERDEV_CACHE_DIR") or os.path.join(
+                os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                "superdev",
+                "git",
+            )
+
+        self.cache_dir = cache_dir
+
+    def mirror_path(self, git_location):
+        """Get the location of the mirror for a git URL.
+
+        :param git_location: The git URL being mirrored
+        :return: The path of the bare mirror repository
+        """
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", git_location).strip("_")
+        if not name.endswith(".git"):
+            name += ".git"
+
+        return os.path.join(self.cache_dir, name)
+
+    def has_mirror(self, git_location):
+        """Check if a git URL has been mirrored into the cache.
+
+        :param git_location: The git URL to check
+        :return: True if there is a mirror
+        """
+        return os.path.isdir(self.mirror_path(git_location))
+
+    async def warm_async(self, git_location):
+        """Create or update the mirror for a git URL.
+
+        :param git_location: The git URL to mirror
+        :raise ShellException: If anything goes wrong
+        :return: True if the mirror was created, False if it was updated
+        """
+        mirror = self.mirror_path(git_location)
+
+        if os.path.isdir(mirror):
+            await Shell.run_async(mirror, ["git", "remote", "update", "--prune"])
+            return False
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as err:
+            raise ShellException(err.errno, str(err)) from None
+
+        await Shell.run_async(
+            self.cache_dir,
+            ["git", "clone", "--quiet", "--mirror", git_location, mirror],
+        )
+        return True
+
+    def warm(self, git_location):
+        """Create or update the mirror for a git URL.
+
+        :param git_location: The git URL to mirror
+        :raise ShellException: If anything goes wrong
+        :return: True if the mirror was created, False if it was updated
+        """
+        return run_sync(self.warm_async(git_location))
@@ -0,0 +1,94 @@
+"""Read events from supervisor as an event listener.
+
+See http://supervisord.org/events.html for the protocol.
+"""
+
+import os
+import select
+
+STDIN, STDOUT, STDERR = 0, 1, 2
+
+# Sent to supervisor to say we're ready for an event, and to acknowledge one
+# and ask for the next in one go
+READY = b"READY\n"
+OK_READY = b"RESULT 2\nOKREADY\n"
+
+
+def parse_header(data):
+    """Parse a header line of `key:value` tokens.
+
+    :param data: The header as bytes
+    :return: A dict of bytes to bytes
+    """
+    return dict(item.split(b":", 1) for item in data.split())
+
+
+class EventReader:
+    """Read the supervisor event protocol straight from a file descriptor.
+
+    We keep our own buffer rather than using `sys.stdin` so we can read exact
+    byte lengths, and can tell whether more data is waiting without blocking.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buffer = bytearray()
+
+    def wait(self, timeout):
+        """Wait for data to be ready to read.
+
+        :param timeout: The maximum time to wait in seconds
+        :return: True if there is data to read
+        """
+        if self.buffer:
+            return True
+
+        readable, _, _ = select.select([self.fd], [], [], max(0, timeout))
+        return bool(readable)
+
+    def read_event(self):
+        """Read a whole event.
+
+        :raise EOFError: If the input is closed
+        :return: A tuple of the header as a dict, and the payload as bytes
+        """
+        header = parse_header(self.readline())
+
+        return header, self.read(int(header[b"len"]))
+
+    def readline(self):
+        """Read a single line including the trailing newline.
+
+        :raise EOFError: If the input is closed
+        """
+        end = self.buffer.find(b"\n")
+        while end == -1:
+            start = len(self.buffer)
+            self._fill()
+            end = self.buffer.find(b"\n", start)
+
+        return self._take(end + 1)
+
+    def read(self, size):
+        """Read an exact number of bytes.
+
+        :raise EOFError: If the input is closed
+        """
+        while len(self.buffer) < size:
+            self._fill()
+
+        return self._take(size)
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def _fill(self):
+        chunk = os.read(self.fd, self.CHUNK_SIZE)
+        if not chunk:
+            raise EOFError()
+
+        self.buffer.extend(chunk)
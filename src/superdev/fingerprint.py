@@ -0,0 +1,130 @@
+"""Fingerprint the inputs of tox environments so we can skip rebuilding."""
+
+import glob
+import hashlib
+import os
+
+from superdev.shell import RepoState
+
+
+class ToxFingerprint:
+    """A fingerprint of everything a tox environment is built from.
+
+    If the fingerprint hasn't changed since the environment was last built,
+    and the environment is still there, there's no need to run tox again.
+    """
+
+    # Files (relative to the project) which go into building an environment
+    INPUT_PATTERNS = (
+        "tox.ini",
+        "requirements*.txt",
+        "requirements/*.txt",
+        "requirements/*.in",
+        "setup.py",
+        "setup.cfg",
+        ".python-version",
+    )
+
+    def __init__(self, project_dir, tox_env):
+        self.project_dir = project_dir
+        self.tox_env = tox_env
+        self._value = None
+
+    @property
+    def env_dir(self):
+        """Get the directory tox builds the environment in."""
+        return os.path.join(self.project_dir, ".tox", self.tox_env)
+
+    @property
+    def filename(self):
+        """Get the file the fingerprint of the last build is stored in."""
+        return os.path.join(
+            RepoState.git_dir(self.project_dir),
+            f"superdev_tox_{self.tox_env}.fingerprint",
+        )
+
+    @property
+    def value(self):
+        """Get the fingerprint of the inputs as they are now."""
+        if self._value is None:
+            self._value = self._compute()
+
+        return self._value
+
+    def is_current(self):
+        """Check if the environment is built from the current inputs.
+
+        :return: True if the environment exists and the inputs match
+        """
+        if not os.path.isdir(self.env_dir):
+            return False
+
+        try:
+            handle = open(self.filename)
+        except OSError:
+            return False
+
+        with handle:
+            return handle.read().strip() == self.value
+
+    def save(self, value=None):
+        """Record that the environment has been built from the inputs.
+
+        Pass the `value` read before the build, so anything changed during
+        the build is picked up next time.
+
+        :param value: The fingerprint to store (defaults to `value` now)
+        """
+        with open(self.filename, "w") as handle:
+            handle.write(self.value if value is None else value)
+
+    def _compute(self):
+        digest = hashlib.sha256()
+
+        for path in self.input_files():
+            digest.update(os.path.relpath(path, self.project_dir).encode("utf-8"))
+            with open(path, "rb") as handle:
+                digest.update(hashlib.sha256(handle.read()).digest())
+
+        for interpreter in self._interpreters():
+            digest.update(interpreter.encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def input_files(self):
+        """List the files the environment is built from.
+
+        :return: A sorted list of paths
+        """
+        paths = set()
+        for pattern in self.INPUT_PATTERNS:
+            paths.update(glob.glob(os.path.join(self.project_dir, pattern)))
+
+        return sorted(path for path in paths if os.path.isfile(path))
+
+    def _interpreters(self):
+        """Describe the pyenv interpreters the project resolves to.
+
+        This follows the same rules as pyenv without running it, and includes
+        the modification time so reinstalling a version counts as a change.
+        """
+        try:
+            handle = open(os.path.join(self.project_dir, ".python-version"))
+        except OSError:
+            return
+
+        with handle:
+            versions = handle.read().split()
+
+        pyenv_root = os.environ.get("PYENV_ROOT") or os.path.expanduser("~/.pyenv")
+
+        for version in versions:
+            python = os.path.realpath(
+                os.path.join(pyenv_root, "versions", version, "bin", "python")
+            )
+            try:
+                modified = os.stat(python).st_mtime
+            except OSError:
+                modified = None
+
+            yield f"{version}:{python}:{modified}"
@@ -0,0 +1,73 @@
+"""Remember when projects were last fetched, so we can skip fetching."""
+
+import json
+import os
+from time import time
+
+
+class FreshnessRecord:
+    """When a project was last fetched and what its upstream was then.
+
+    The record is stored inside the project's git directory, so it goes
+    wherever the checkout goes and never shows up as a change in the tree.
+    """
+
+    FILENAME = "superdev_freshness.json"
+
+    def __init__(self, filename, fetched_at=None, upstream_sha=None):
+        self.filename = filename
+        self.fetched_at = fetched_at
+        self.upstream_sha = upstream_sha
+
+    @classmethod
+    def load(cls, git_dir):
+        """Load the record for a project.
+
+        A missing or unreadable record is treated as never having fetched.
+
+        :param git_dir: The git directory of the project
+        :return: A `FreshnessRecord` object
+        """
+        filename = os.path.join(git_dir, cls.FILENAME)
+
+        try:  # pylint:disable=too-many-try-statements
+            with open(filename) as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return cls(filename)
+
+        return cls(
+            filename,
+            fetched_at=data.get("fetched_at"),
+            upstream_sha=data.get("upstream_sha"),
+        )
+
+    def is_fresh(self, ttl, now=None):
+        """Check if the last fetch was recent enough to skip another.
+
+        :param ttl: How long a fetch stays fresh in seconds
+        :param now: The current time (defaults to now)
+        :return: True if the project was fetched within the TTL
+        """
+        if not ttl or self.fetched_at is None:
+            return False
+
+        if now is None:
+            now = time()
+
+        return 0 <= now - self.fetched_at < ttl
+
+    def fetched(self, upstream_sha, now=None):
+        """Record a fetch and save the record.
+
+        :param upstream_sha: The SHA of the upstream branch after fetching
+        :param now: The time of the fetch (defaults to now)
+        """
+        self.fetched_at = time() if now is None else now
+        self.upstream_sha = upstream_sha
+
+        with open(self.filename, "w") as handle:
+            json.dump(
+                {"fetched_at": self.fetched_at, "upstream_sha": self.upstream_sha},
+                handle,
+            )
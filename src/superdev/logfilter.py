@@ -0,0 +1,300 @@
+r"""Per-program rules for thinning out log output before it's displayed.
+
+Rules are read from an INI file where each section name is a glob matched
+against program names, and the first matching section applies:
+
+    [*-services]
+    # Lines matching any of these are always shown, whatever else applies
+    keep = (?i:error|exception|traceback)
+    # Lines matching any of these are never shown
+    drop =
+        Pulling fs layer
+        ^\S+ +\| .*Waiting$
+    # Show at most this many lines per second on average...
+    rate = 20
+    # ... but allow bursts of up to this many lines
+    burst = 200
+    # Replace runs of identical lines with a count
+    collapse = true
+
+Lines held back by rate limits or collapsing are reported with a marker line
+saying how many there were, either when output resumes or after
+`LogFilter.REPORT_AFTER` seconds.
+"""
+
+import re
+from configparser import ConfigParser
+from fnmatch import fnmatchcase
+from time import monotonic
+
+
+class LogRule:
+    """The filtering settings for a group of programs."""
+
+    # pylint: disable=too-few-public-methods,too-many-arguments
+
+    def __init__(self, drop=None, keep=None, rate=None, burst=None, collapse=False):
+        """Initialise the rule.
+
+        :param drop: A list of regular expressions for lines to discard
+        :param keep: A list of regular expressions for lines to always show
+        :param rate: The maximum average lines per second to show
+        :param burst: The number of lines which can be shown at once before
+            the rate applies (defaults to `rate`)
+        :param collapse: Whether to collapse runs of identical lines
+        :raise ValueError: If the settings are not valid
+        """
+        self.drop = self._compile(drop)
+        self.keep = self._compile(keep)
+
+        if rate is not None and rate <= 0:
+            raise ValueError(f"The rate must be positive, not {rate}")
+
+        self.rate = rate
+        self.burst = max(1.0, burst or rate or 1.0)
+        self.collapse = collapse
+
+    @classmethod
+    def from_section(cls, section):
+        """Create a rule from a section of a config file.
+
+        :param section: A `configparser.SectionProxy`
+        :raise ValueError: If the settings are not valid
+        """
+        return cls(
+            drop=section.get("drop", "").strip().splitlines(),
+            keep=section.get("keep", "").strip().splitlines(),
+            rate=section.getfloat("rate"),
+            burst=section.getfloat("burst"),
+            collapse=section.getboolean("collapse", False),
+        )
+
+    @staticmethod
+    def _compile(patterns):
+        patterns = [pattern for pattern in patterns or [] if pattern]
+        if not patterns:
+            return None
+
+        # Combine them so each line is only searched once
+        if len(patterns) > 1:
+            patterns = ["|".join(f"(?:{pattern})" for pattern in patterns)]
+
+        try:
+            return re.compile(patterns[0].encode("utf-8"))
+        except re.error as err:
+            raise ValueError(f"Bad pattern in {patterns}: {err}") from err
+
+
+class _Stream:
+    """The state of one channel of one program."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, rule, now):
+        self.rule = rule
+        self.tokens = rule.burst
+        self.updated = now
+
+        self.last_line = None
+        self.repeats = 0
+        self.suppressed = 0
+        self.pending_since = None
+
+    def refill(self, now):
+        """Add the tokens earned since we last looked."""
+        self.tokens = min(
+            self.rule.burst, self.tokens + (now - self.updated) * self.rule.rate
+        )
+        self.updated = now
+
+    def report(self):
+        """Get marker lines for anything held back, and reset the counts."""
+        markers = []
+
+        if self.repeats:
+            markers.append(
+                b"... last line repeated %d time%s ..."
+                % (self.repeats, b"" if self.repeats == 1 else b"s")
+            )
+            self.repeats = 0
+
+        if self.suppressed:
+            markers.append(
+                b"... %d line%s suppressed ..."
+                % (self.suppressed, b"" if self.suppressed == 1 else b"s")
+            )
+            self.suppressed = 0
+
+        self.pending_since = None
+
+        return markers
+
+    def admit(self, line, now):
+        """Pass a line through the collapsing and rate limiting of the rule.
+
+        :param line: The line as bytes
+        :param now: The current `time.monotonic()` value
+        :return: A list of lines to show, which doesn't include the line if
+            it's held back, but may include markers for earlier lines
+        """
+        shown = []
+
+        if self.rule.collapse:
+            if self._is_repeat(line, now):
+                return shown
+
+            if self.repeats:
+                shown.extend(self.report())
+
+        if self.rule.rate:
+            if self._is_over_rate(now):
+                return shown
+
+            if self.suppressed:
+                shown.extend(self.report())
+
+        shown.append(line)
+        return shown
+
+    def _is_repeat(self, line, now):
+        if line != self.last_line:
+            self.last_line = line
+            return False
+
+        self.repeats += 1
+        self._hold(now)
+        return True
+
+    def _is_over_rate(self, now):
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return False
+
+        self.suppressed += 1
+        self._hold(now)
+        return True
+
+    def _hold(self, now):
+        if self.pending_since is None:
+            self.pending_since = now
+
+
+class LogFilter:
+    """Apply `LogRule`s to the output of programs."""
+
+    # Report held back lines once they've been waiting this long in seconds
+    REPORT_AFTER = 1.0
+
+    def __init__(self, rules):
+        """Initialise the filter.
+
+        :param rules: A list of (glob, `LogRule`) tuples, in order of priority
+        """
+        self.rules = rules
+
+        self._streams = {}
+        self._rule_cache = {}
+
+    @classmethod
+    def load(cls, filename):
+        """Load rules from an INI file.
+
+        :param filename: The file to read
+        :raise ValueError: If the file can't be read or is not valid
+        """
+        config = ConfigParser(interpolation=None)
+        if not config.read(filename):
+            raise ValueError(f"Cannot read '{filename}'")
+
+        try:
+            rules = [
+                (name, LogRule.from_section(config[name])) for name in config.sections()
+            ]
+        except (ValueError, KeyError) as err:
+            raise ValueError(f"Bad log rules in '{filename}': {err}") from err
+
+        return cls(rules)
+
+    def rule_for(self, process):
+        """Get the rule which applies to a program.
+
+        :param process: The program name as bytes
+        :return: A `LogRule` or None if no rule applies
+        """
+        if process not in self._rule_cache:
+            name = process.decode("utf-8", "replace")
+            self._rule_cache[process] = next(
+                (rule for pattern, rule in self.rules if fnmatchcase(name, pattern)),
+                None,
+            )
+
+        return self._rule_cache[process]
+
+    def apply(self, process, lines, err=False, now=None):
+        """Filter lines of output from a program.
+
+        :param process: The program name as bytes
+        :param lines: A list of lines as bytes
+        :param err: Whether the lines came from stderr
+        :param now: The current `time.monotonic()` value (defaults to now)
+        :return: A list of the lines to show, including any marker lines
+        """
+        rule = self.rule_for(process)
+        if rule is None:
+            return lines
+
+        if now is None:
+            now = monotonic()
+
+        key = (process, err)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = _Stream(rule, now)
+
+        if rule.rate:
+            stream.refill(now)
+
+        shown = []
+        for line in lines:
+            if rule.keep and rule.keep.search(line):
+                shown.append(line)
+
+            elif not (rule.drop and rule.drop.search(line)):
+                shown.extend(stream.admit(line, now))
+
+        return shown
+
+    def next_report(self):
+        """Get when held back lines should next be reported.
+
+        :return: A `time.monotonic()` value, or None if nothing is waiting
+        """
+        waiting = [
+            stream.pending_since
+            for stream in self._streams.values()
+            if stream.pending_since is not None
+        ]
+        if not waiting:
+            return None
+
+        return min(waiting) + self.REPORT_AFTER
+
+    def reports(self, now=None, force=False):
+        """Get marker lines for anything which has been held back long enough.
+
+        :param now: The current `time.monotonic()` value (defaults to now)
+        :param force: Report everything held back regardless of age
+        :return: A list of (process, err, lines) tuples
+        """
+        if now is None:
+            now = monotonic()
+
+        due = []
+        for (process, err), stream in self._streams.items():
+            if stream.pending_since is None:
+                continue
+
+            if force or now >= stream.pending_since + self.REPORT_AFTER:
+                due.append((process, err, stream.report()))
+
+        return due
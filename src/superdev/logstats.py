@@ -0,0 +1,146 @@
+"""Running counters describing how the log event listener is coping.
+
+The listener keeps a `ListenerStats` and periodically rewrites it to a JSON
+file, which `bin/logger_stats.py` reads to show which programs are the
+noisiest and whether the listener itself is keeping up.
+"""
+
+import json
+import os
+from time import monotonic, time
+
+
+class ListenerStats:
+    """Counters for events, output and where the listener spends its time."""
+
+    # Each counter is its own attribute so the listener can update it cheaply
+    # pylint: disable=too-many-instance-attributes
+
+    # How often to rewrite the stats file in seconds
+    SAVE_EVERY = 1.0
+
+    # Where time is spent: waiting for events on stdin, handling them and
+    # writing acknowledgements and output
+    READING = "reading"
+    PROCESSING = "processing"
+    WRITING = "writing"
+
+    def __init__(self, filename=None, save_every=SAVE_EVERY):
+        """Initialise the stats.
+
+        :param filename: The file to save to, or None to not save
+        :param save_every: How often to save in seconds
+        """
+        self.filename = filename
+        self.save_every = save_every
+
+        self.started = time()
+        self.event_types = {}
+        self.processes = {}
+        self.seconds = {self.READING: 0.0, self.PROCESSING: 0.0, self.WRITING: 0.0}
+        self.max_event_seconds = 0.0
+
+        self._saved_at = monotonic()
+        self._saved_lines = {}
+        self._rates = {}
+
+    def event(self, event_type, seconds):
+        """Count an event.
+
+        :param event_type: The supervisor event name as bytes
+        :param seconds: The time taken to process the event
+        """
+        self.event_types[event_type] = self.event_types.get(event_type, 0) + 1
+        self.seconds[self.PROCESSING] += seconds
+        self.max_event_seconds = max(self.max_event_seconds, seconds)
+
+    def output(self, process, size, lines):
+        """Count output from a program.
+
+        :param process: The program name as bytes
+        :param size: The size of the output in bytes
+        :param lines: The number of lines of output
+        """
+        counts = self.processes.get(process)
+        if counts is None:
+            counts = self.processes[process] = [0, 0, 0]
+
+        counts[0] += 1
+        counts[1] += size
+        counts[2] += lines
+
+    def next_save(self):
+        """Get when the stats should next be saved.
+
+        :return: A `time.monotonic()` value, or None if they aren't saved
+        """
+        if not self.filename:
+            return None
+
+        return self._saved_at + self.save_every
+
+    def as_dict(self):
+        """Get the current stats, updating the recent line rates.
+
+        :return: A JSON serialisable dict
+        """
+        now = monotonic()
+        elapsed = now - self._saved_at
+        if elapsed > 0:
+            self._rates = {
+                process: (counts[2] - self._saved_lines.get(process, 0)) / elapsed
+                for process, counts in self.processes.items()
+            }
+            self._saved_lines = {
+                process: counts[2] for process, counts in self.processes.items()
+            }
+            self._saved_at = now
+
+        processes = {
+            process.decode("utf-8", "replace"): {
+                "events": counts[0],
+                "bytes": counts[1],
+                "lines": counts[2],
+                "lines_per_second": round(self._rates.get(process, 0.0), 1),
+            }
+            for process, counts in self.processes.items()
+        }
+
+        return {
+            "pid": os.getpid(),
+            "started": self.started,
+            "updated": time(),
+            "event_types": {
+                event_type.decode("utf-8", "replace"): count
+                for event_type, count in self.event_types.items()
+            },
+            "processes": processes,
+            "lines_per_second": round(sum(self._rates.values()), 1),
+            "seconds": {key: round(value, 3) for key, value in self.seconds.items()},
+            "max_event_seconds": round(self.max_event_seconds, 6),
+        }
+
+    def save(self):
+        """Write the stats to the file.
+
+        The file is replaced in one go, so readers never see part of it.
+
+        :raise OSError: If the file can't be written
+        """
+        temp_file = f"{self.filename}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as handle:
+            json.dump(self.as_dict(), handle, indent=2, sort_keys=True)
+
+        os.replace(temp_file, self.filename)
+
+    @classmethod
+    def load(cls, filename):
+        """Read saved stats.
+
+        :param filename: The file to read
+        :raise OSError: If the file can't be read
+        :raise ValueError: If the file isn't valid JSON
+        :return: A dict as produced by `as_dict()`
+        """
+        with open(filename) as handle:
+            return json.load(handle)
@@ -0,0 +1,331 @@
+"""A per-process store of log lines which can be queried by time.
+
+Each process gets its own directory of segment files. A segment is a series
+of independently gzipped blocks of lines, and alongside it an index records
+the time range, offset and length of each block. Queries use the index to
+decompress only the blocks they need, rather than scanning whole files.
+
+Segments are rotated when they reach a size limit, and the oldest segments
+are deleted to keep each process under a total size cap.
+
+Each stored line looks like `<timestamp> <O|E> <text>` where O and E stand
+for stdout and stderr.
+"""
+
+import gzip
+import heapq
+import os
+import re
+from time import time
+
+
+class Block:
+    """An entry in a segment index describing one gzipped block."""
+
+    # pylint: disable=too-few-public-methods,too-many-arguments
+
+    def __init__(self, segment, first, last, offset, length, lines):
+        self.segment = segment
+        self.first = first
+        self.last = last
+        self.offset = offset
+        self.length = length
+        self.lines = lines
+
+    def read(self):
+        """Decompress the block.
+
+        :return: A list of (timestamp, is_error, text) tuples
+        """
+        with open(self.segment, "rb") as handle:
+            handle.seek(self.offset)
+            data = gzip.decompress(handle.read(self.length))
+
+        return [LogStore.parse_line(line) for line in data.splitlines()]
+
+
+class _ProcessWriter:
+    """The pending block and current segment for one process."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segment = None
+        self.segment_size = 0
+
+        self.pending = bytearray()
+        self.first = None
+        self.last = None
+        self.lines = 0
+
+
+class LogStore:
+    """Store log lines per process in rotating, compressed, indexed segments."""
+
+    # Lines are gathered into blocks of about this size before compressing
+    BLOCK_SIZE = 64 * 1024
+
+    # Start a new segment once the current one is this big (compressed)
+    SEGMENT_SIZE = 4 * 1024 * 1024
+
+    # Delete the oldest segments once a process uses more than this
+    MAX_BYTES = 32 * 1024 * 1024
+
+    # Write out a partial block once it's been waiting this long in seconds
+    FLUSH_AFTER = 2.0
+
+    SEGMENT_SUFFIX = ".log.gz"
+    INDEX_SUFFIX = ".idx"
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        directory,
+        block_size=BLOCK_SIZE,
+        segment_size=SEGMENT_SIZE,
+        max_bytes=MAX_BYTES,
+        flush_after=FLUSH_AFTER,
+    ):
+        self.directory = directory
+        self.block_size = block_size
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.flush_after = flush_after
+
+        self._writers = {}
+
+    # Writing -----------------------------------------------------------------
+
+    def append(self, process, lines, err=False, now=None):
+        """Add lines of output from a process.
+
+        :param process: The name of the process
+        :param lines: A list of lines as bytes, without newlines
+        :param err: Whether the lines came from stderr
+        :param now: The time the lines were logged (defaults to now)
+        """
+        if not lines:
+            return
+
+        if now is None:
+            now = time()
+
+        writer = self._writer(process)
+        prefix = b"%.3f %s " % (now, b"E" if err else b"O")
+
+        writer.pending += prefix + (b"\n" + prefix).join(lines) + b"\n"
+        writer.lines += len(lines)
+        writer.last = now
+        if writer.first is None:
+            writer.first = now
+
+        if len(writer.pending) >= self.block_size:
+            self._write_block(writer)
+
+    def next_flush(self):
+        """Get when the oldest partial block should be written out.
+
+        :return: A timestamp, or None if nothing is waiting
+        """
+        waiting = [writer.first for writer in self._writers.values() if writer.pending]
+        if not waiting:
+            return None
+
+        return min(waiting) + self.flush_after
+
+    def flush(self, now=None, force=False):
+        """Write out partial blocks which have been waiting long enough.
+
+        :param now: The current time (defaults to now)
+        :param force: Write out every partial block regardless of age
+        """
+        if now is None:
+            now = time()
+
+        for writer in self._writers.values():
+            if writer.pending and (force or now >= writer.first + self.flush_after):
+                self._write_block(writer)
+
+    def _writer(self, process):
+        if process not in self._writers:
+            directory = os.path.join(self.directory, self.safe_name(process))
+            os.makedirs(directory, exist_ok=True)
+            self._writers[process] = _ProcessWriter(directory)
+
+        return self._writers[process]
+
+    def _write_block(self, writer):
+        if writer.segment is None or writer.segment_size >= self.segment_size:
+            self._rotate(writer)
+
+        data = gzip.compress(bytes(writer.pending))
+
+        # Write the data before the index, so the index never points at
+        # something which isn't there
+        with open(writer.segment + self.SEGMENT_SUFFIX, "ab") as handle:
+            handle.write(data)
+
+        with open(writer.segment + self.INDEX_SUFFIX, "a") as handle:
+            handle.write(
+                f"{writer.first:.3f} {writer.last:.3f} "
+                f"{writer.segment_size} {len(data)} {writer.lines}\n"
+            )
+
+        writer.segment_size += len(data)
+        writer.pending = bytearray()
+        writer.first = writer.last = None
+        writer.lines = 0
+
+    def _rotate(self, writer):
+        # Name segments after their start time, so they sort in order
+        name = f"{int(writer.first * 1000):015d}"
+        writer.segment = os.path.join(writer.directory, name)
+        writer.segment_size = 0
+
+        segments = self._segments(writer.directory)
+        sizes = [os.path.getsize(segment + self.SEGMENT_SUFFIX) for segment in segments]
+
+        # Make room for this segment to fill up
+        while segments and sum(sizes) + self.segment_size > self.max_bytes:
+            self._delete_segment(segments.pop(0))
+            sizes.pop(0)
+
+    def _delete_segment(self, segment):
+        for suffix in (self.INDEX_SUFFIX, self.SEGMENT_SUFFIX):
+            try:
+                os.remove(segment + suffix)
+            except FileNotFoundError:
+                pass
+
+    # Reading -----------------------------------------------------------------
+
+    def processes(self):
+        """List the processes with stored logs.
+
+        :return: A sorted list of directory names
+        """
+        try:
+            return sorted(
+                name
+                for name in os.listdir(self.directory)
+                if os.path.isdir(os.path.join(self.directory, name))
+            )
+        except FileNotFoundError:
+            return []
+
+    def blocks(self, process):
+        """List the blocks stored for a process, oldest first.
+
+        :param process: The name of the process
+        :return: A list of `Block` objects
+        """
+        directory = os.path.join(self.directory, self.safe_name(process))
+        blocks = []
+
+        for segment in self._segments(directory):
+            try:
+                entries = self._read_index(segment + self.INDEX_SUFFIX)
+            except FileNotFoundError:
+                continue
+
+            blocks.extend(
+                Block(
+                    segment + self.SEGMENT_SUFFIX,
+                    float(first),
+                    float(last),
+                    int(offset),
+                    int(length),
+                    int(lines),
+                )
+                for first, last, offset, length, lines in entries
+            )
+
+        return blocks
+
+    def tail(self, process, count):
+        """Get the last lines logged by a process.
+
+        :param process: The name of the process
+        :param count: The number of lines to get
+        :return: A list of (timestamp, is_error, text) tuples, oldest first
+        """
+        needed = []
+        total = 0
+
+        # Work back from the end until we have enough lines
+        for block in reversed(self.blocks(process)):
+            if total >= count:
+                break
+            needed.append(block)
+            total += block.lines
+
+        lines = []
+        for block in reversed(needed):
+            lines.extend(block.read())
+
+        return lines[-count:] if count else []
+
+    def between(self, start, end, processes=None):
+        """Get everything logged between two times.
+
+        :param start: The start timestamp
+        :param end: The end timestamp
+        :param processes: The processes to include (defaults to all)
+        :return: An iterator of (timestamp, process, is_error, text) tuples in
+            time order
+        """
+        if processes is None:
+            processes = self.processes()
+
+        streams = [self._between(process, start, end) for process in processes]
+
+        return heapq.merge(*streams, key=lambda item: item[0])
+
+    def _between(self, process, start, end):
+        for block in self.blocks(process):
+            if block.last < start or block.first > end:
+                continue
+
+            for timestamp, err, text in block.read():
+                if start <= timestamp <= end:
+                    yield timestamp, process, err, text
+
+    @classmethod
+    def parse_line(cls, line):
+        """Parse a stored line.
+
+        :param line: The stored line as bytes
+        :return: A tuple of (timestamp, is_error, text)
+        """
+        timestamp, channel, text = line.split(b" ", 2)
+
+        return float(timestamp), channel == b"E", text
+
+    @staticmethod
+    def _read_index(filename):
+        with open(filename) as handle:
+            # Skip anything half written if we were interrupted
+            return [line.split() for line in handle if len(line.split()) == 5]
+
+    @classmethod
+    def _segments(cls, directory):
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+
+        return sorted(
+            os.path.join(directory, name[: -len(cls.SEGMENT_SUFFIX)])
+            for name in names
+            if name.endswith(cls.SEGMENT_SUFFIX)
+        )
+
+    @staticmethod
+    def safe_name(process):
+        """Make a process name safe to use as a directory name.
+
+        :param process: The name of the process
+        :return: The directory name
+        """
+        return re.sub(r"[^A-Za-z0-9._-]", "_", process)
@@ -0,0 +1,387 @@
+"""A lightweight, long running monitor for the development services.
+
+Everything is gathered concurrently in one process without running any
+commands:
+
+ * Ports from `conf/nmap-services` are checked with TCP connects
+ * Supervisor is asked about its processes over XML-RPC
+ * Docker is asked about its containers over its API, and the answer is
+   reused for a few seconds as it's the most expensive to get
+ * The CPU and memory used by each program's processes are read from `/proc`
+
+Only the rows of the display which have changed are redrawn.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import xmlrpc.client
+from time import monotonic, time
+from urllib.parse import quote
+
+from superdev.backoff import RestartBackoff
+from superdev.supervisor import Supervisor
+from superdev.unix_http import HTTPError, request
+
+BOLD = "1"
+RED = "01;31"
+AMBER = "01;33"
+GREEN = "01;32"
+
+
+def colour(text, code):
+    """Wrap text in ANSI colour codes.
+
+    :param text: The text to colour
+    :param code: The ANSI SGR code, or None for no colour
+    """
+    if not code:
+        return text
+
+    return f"\x1b[{code}m{text}\x1b[0m"
+
+
+def _megabytes(size):
+    return f"{size / 2 ** 20:.0f}M"
+
+
+class PortProbe:
+    """Check whether something is listening on a local TCP port."""
+
+    OPEN = "open"
+    CLOSED = "closed"
+    FILTERED = "filtered"
+
+    COLOURS = {OPEN: GREEN, CLOSED: RED, FILTERED: AMBER}
+
+    def __init__(self, name, port, host="127.0.0.1"):
+        self.name = name
+        self.port = port
+        self.host = host
+
+    @classmethod
+    def load(cls, filename, host="127.0.0.1"):
+        """Read the ports to probe from an nmap services file.
+
+        :param filename: The file to read
+        :param host: The host to probe
+        :return: A list of `PortProbe` objects in port order
+        """
+        probes = []
+
+        with open(filename) as handle:
+            for line in handle:
+                fields = line.split("#", 1)[0].split()
+                if len(fields) < 2 or not fields[1].endswith("/tcp"):
+                    continue
+
+                probes.append(cls(fields[0], int(fields[1].split("/")[0]), host))
+
+        return sorted(probes, key=lambda probe: probe.port)
+
+    async def probe(self, timeout=0.5):
+        """Try to connect to the port.
+
+        :param timeout: How long to wait for a connection in seconds
+        :return: `OPEN`, `CLOSED` or `FILTERED` (if the connection timed out)
+        """
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), timeout
+            )
+        except asyncio.TimeoutError:
+            return self.FILTERED
+        except OSError:
+            return self.CLOSED
+
+        writer.close()
+        return self.OPEN
+
+
+class DockerContainers:
+    """Get the state of docker containers, caching the answer for a while."""
+
+    SOCKET = "/var/run/docker.sock"
+
+    # The containers started by the `services` program
+    NAMES = ("superdev_elasticsearch", "superdev_postgres", "superdev_rabbit")
+
+    # How long to reuse an answer in seconds
+    TTL = 5.0
+
+    def __init__(self, names=NAMES, socket_path=None, ttl=TTL):
+        if socket_path is None:
+            docker_host = os.environ.get("DOCKER_HOST", "")
+            if docker_host.startswith("unix://"):
+                socket_path = docker_host[len("unix://") :]
+            else:
+                socket_path = self.SOCKET
+
+        self.names = names
+        self.socket_path = socket_path
+        self.ttl = ttl
+
+        self._fetched_at = None
+        self._result = None
+
+    async def containers(self):
+        """Get the containers, or the reason we couldn't.
+
+        :return: A tuple of (list of container dicts from the docker API, or
+            None, and an error message or None)
+        """
+        if self._fetched_at is None or monotonic() - self._fetched_at > self.ttl:
+            self._result = await self._fetch()
+            self._fetched_at = monotonic()
+
+        return self._result
+
+    async def _fetch(self):
+        filters = quote(json.dumps({"name": list(self.names)}))
+        path = f"/containers/json?all=1&filters={filters}"
+
+        try:
+            containers = json.loads(
+                (await request(self.socket_path, "GET", path)).decode("utf-8")
+            )
+        except (OSError, ValueError) as err:
+            return None, f"Cannot get containers from docker: {err}"
+
+        return sorted(containers, key=self.name), None
+
+    @staticmethod
+    def name(container):
+        """Get the name of a container from the docker API."""
+        return container["Names"][0].lstrip("/") if container["Names"] else ""
+
+
+class Monitor:
+    """Repeatedly gather the state of everything and display it."""
+
+    # What to gather from and how to display it, and what's on the screen now
+    # pylint: disable=too-many-instance-attributes
+
+    # How often to refresh in seconds
+    INTERVAL = 0.5
+
+    PROCESS_COLOURS = {
+        "RUNNING": GREEN,
+        "STARTING": AMBER,
+        "BACKOFF": AMBER,
+        "EXITED": AMBER,
+        "FATAL": RED,
+        "HELD": AMBER,
+    }
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        ports,
+        supervisor,
+        docker,
+        output=None,
+        interval=INTERVAL,
+        held_file=None,
+        resources=None,
+    ):
+        """Initialise the monitor.
+
+        :param ports: A list of `PortProbe` objects
+        :param supervisor: A `Supervisor` object
+        :param docker: A `DockerContainers` object
+        :param output: A text stream to draw on (defaults to stdout)
+        :param interval: How often to refresh in seconds
+        :param held_file: The state file written by `bin/backoff.py`
+        :param resources: A `ResourceSampler` to show what each program uses
+        """
+        self.ports = ports
+        self.supervisor = supervisor
+        self.docker = docker
+        self.output = output or sys.stdout
+        self.interval = interval
+        self.held_file = held_file
+        self.resources = resources
+
+        self._screen = None
+        self._size = None
+
+    async def run(self):
+        """Keep refreshing the display until cancelled."""
+        self.output.write("\x1b[?25l")
+
+        while True:
+            started = monotonic()
+            self.render(await self.lines())
+
+            await asyncio.sleep(max(0, self.interval - (monotonic() - started)))
+
+    def close(self):
+        """Put the terminal back how we found it."""
+        rows = len(self._screen or [])
+        self.output.write(f"\x1b[{rows + 1};1H\x1b[?25h")
+        self.output.flush()
+
+    async def lines(self):
+        """Gather the state of everything.
+
+        :return: A list of (text, colour) tuples, one per line
+        """
+        states, processes, (containers, docker_error) = await asyncio.gather(
+            asyncio.gather(*(probe.probe() for probe in self.ports)),
+            self._processes(),
+            self.docker.containers(),
+        )
+
+        lines = [("Services", BOLD), (f"{'PORT':<10}{'STATE':<10}SERVICE", None)]
+        for probe, state in zip(self.ports, states):
+            lines.append(
+                (
+                    f"{str(probe.port) + '/tcp':<10}{state:<10}{probe.name}",
+                    PortProbe.COLOURS[state],
+                )
+            )
+
+        lines.extend([("", None), ("Docker containers", BOLD)])
+        if docker_error:
+            lines.append((docker_error, RED))
+        else:
+            lines.extend(self._container_lines(containers))
+
+        lines.extend([("", None), ("Supervisor processes", BOLD)])
+        lines.extend(processes)
+
+        return lines
+
+    async def _processes(self):
+        try:
+            processes = await self.supervisor.process_info()
+
+        except HTTPError as err:
+            return [(f"Supervisor error: {err}", RED)]
+
+        except OSError:
+            return [
+                (
+                    f"Cannot connect to supervisor on {self.supervisor.socket_path}. "
+                    "Run make dev",
+                    RED,
+                )
+            ]
+
+        except xmlrpc.client.Fault as err:
+            return [(f"Supervisor error: {err.faultString}", RED)]
+
+        held = RestartBackoff.load_held(self.held_file) if self.held_file else {}
+        lines = []
+
+        for info in processes:
+            name = Supervisor.full_name(info)
+            state, description = info["statename"], info["description"]
+
+            hold = held.get(name)
+            if hold and state != "RUNNING":
+                state = "HELD"
+                description = (
+                    f"failed {hold['crashes']} times, "
+                    f"retrying in {max(0, hold['until'] - time()):.0f}s"
+                )
+
+            lines.append(
+                (
+                    f"{name:<33}{state:<10}{description}",
+                    self.PROCESS_COLOURS.get(state),
+                )
+            )
+
+        if self.resources:
+            lines.extend([("", None), ("Resources", BOLD)])
+            lines.extend(self._resource_lines(processes))
+
+        return lines
+
+    def _resource_lines(self, processes):
+        try:
+            programs, groups = self.resources.update(processes)
+        except OSError as err:
+            return [(f"Cannot read the processes: {err}", RED)]
+
+        lines = [
+            (
+                f"{'PROGRAM':<33}{'CPU%':>6}{'RSS':>8}{'PEAK':>8}"
+                f"{'PROCS':>7}{'THREADS':>9}",
+                None,
+            )
+        ]
+        rows = [(name, name, usage) for name, usage in sorted(programs.items())]
+        rows.extend(
+            (f"{name}:*", f"group:{name}", usage)
+            for name, usage in sorted(groups.items())
+            # Lone programs are their own group
+            if name not in programs
+        )
+
+        for label, name, usage in rows:
+            cpu = "-" if usage.cpu_percent is None else f"{usage.cpu_percent:.0f}"
+            lines.append(
+                (
+                    f"{label:<33}{cpu:>6}{_megabytes(usage.rss):>8}"
+                    f"{_megabytes(self.resources.peak_rss(name)):>8}"
+                    f"{usage.processes:>7}{usage.threads:>9}",
+                    None,
+                )
+            )
+
+        return lines
+
+    @classmethod
+    def _container_lines(cls, containers):
+        rows = [("NAMES", "IMAGE", "STATUS")] + [
+            (DockerContainers.name(container), container["Image"], container["Status"])
+            for container in containers
+        ]
+        widths = [max(len(row[column]) for row in rows) + 3 for column in range(2)]
+
+        lines = []
+        for number, (name, image, status) in enumerate(rows):
+            code = None
+            if number:
+                code = GREEN if status.startswith("Up") else RED
+
+            lines.append((f"{name:<{widths[0]}}{image:<{widths[1]}}{status}", code))
+
+        return lines
+
+    def render(self, lines):
+        """Draw lines, only writing those which have changed.
+
+        :param lines: A list of (text, colour) tuples
+        :return: The number of changes written
+        """
+        size = shutil.get_terminal_size()
+
+        # Lines which wrap would throw out the position of everything below
+        screen = [colour(text[: size.columns - 1], code) for text, code in lines]
+        screen = screen[: size.lines - 1]
+
+        if size != self._size or self._screen is None:
+            # Start again from a blank screen
+            self._size = size
+            self._screen = []
+            self.output.write("\x1b[H\x1b[2J")
+
+        changes = []
+        for row, line in enumerate(screen):
+            if row >= len(self._screen) or self._screen[row] != line:
+                changes.append(f"\x1b[{row + 1};1H{line}\x1b[K")
+
+        if len(screen) < len(self._screen):
+            changes.append(f"\x1b[{len(screen) + 1};1H\x1b[J")
+
+        self._screen = screen
+        if changes:
+            self.output.write("".join(changes))
+            self.output.flush()
+
+        return len(changes)
@@ -0,0 +1,378 @@
+"""Work out what decides how long the stack takes to start.
+
+A `StartupRecord` is made for each start up of supervisor by the
+`bin/startup_recorder.py` event listener. It holds every state change of
+every program, when each port in `conf/nmap-services` first opened and when
+`bin/start_programs.py` found each program ready. Records are kept as JSON
+files, one per run, so runs can be compared.
+
+A `StartupProfile` analyses a record into a timeline per program, the
+critical path through the dependencies in `conf/startup.conf` and the time
+lost to failed starts.
+"""
+
+import json
+import os
+from time import time
+
+from superdev.timing import Span, Timeline
+
+
+class StartupRecord:
+    """Everything that happened during one start up.
+
+    All times are stored in seconds since the record started.
+    """
+
+    SUFFIX = ".json"
+
+    def __init__(self, started, transitions=None, ports=None, ready=None):
+        """Initialise the record.
+
+        :param started: When the run started as a timestamp
+        :param transitions: A list of (offset, program, state) lists
+        :param ports: A dict of port name to a dict with "port" and "opened"
+        :param ready: A dict of program name to offset
+        """
+        self.started = started
+        self.transitions = transitions or []
+        self.ports = ports or {}
+        self.ready = ready or {}
+
+    def state_changed(self, program, state, now=None):
+        """Record a program changing state.
+
+        :param program: The name of the program, like "h-dev"
+        :param state: The state it moved into, like "RUNNING"
+        :param now: The time of the change (defaults to now)
+        """
+        self.transitions.append([self._offset(now), program, state])
+
+    def port_opened(self, name, port, now=None):
+        """Record a port opening for the first time.
+
+        :param name: The name of the port from `conf/nmap-services`
+        :param port: The port number
+        :param now: The time it opened (defaults to now)
+        """
+        if name not in self.ports:
+            self.ports[name] = {"port": port, "opened": self._offset(now)}
+
+    def mark_ready(self, program, now=None):
+        """Record a program becoming ready.
+
+        :param program: The name of the program
+        :param now: The time it became ready (defaults to now)
+        """
+        if program not in self.ready:
+            self.ready[program] = self._offset(now)
+
+    def _offset(self, now):
+        return round((time() if now is None else now) - self.started, 3)
+
+    def save(self, directory):
+        """Write the record into a directory of runs.
+
+        :param directory: The directory to write to
+        :raise OSError: If the file can't be written
+        :return: The name of the file written
+        """
+        os.makedirs(directory, exist_ok=True)
+        filename = os.path.join(directory, f"{int(self.started)}{self.SUFFIX}")
+
+        temp_file = f"{filename}.tmp"
+        with open(temp_file, "w") as handle:
+            json.dump(
+                {
+                    "started": self.started,
+                    "transitions": self.transitions,
+                    "ports": self.ports,
+                    "ready": self.ready,
+                },
+                handle,
+                indent=1,
+            )
+        os.replace(temp_file, filename)
+
+        return filename
+
+    @classmethod
+    def load(cls, filename):
+        """Read a record from a file.
+
+        :param filename: The file to read
+        :raise OSError: If the file can't be read
+        :raise ValueError: If the file is not valid
+        """
+        with open(filename) as handle:
+            data = json.load(handle)
+
+        try:
+            return cls(
+                data["started"], data["transitions"], data["ports"], data["ready"]
+            )
+        except (KeyError, TypeError) as err:
+            raise ValueError(f"Not a startup record: {filename}") from err
+
+    @staticmethod
+    def load_ready(filename):
+        """Read when programs became ready from `Orchestrator`'s ready file.
+
+        :param filename: The file to read
+        :return: A dict of program name to timestamp, which is empty if the
+            file can't be read
+        """
+        try:  # pylint:disable=too-many-try-statements
+            with open(filename) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def runs(cls, directory):
+        """List the records in a directory.
+
+        :param directory: The directory to look in
+        :return: A list of filenames, oldest first
+        """
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+
+        return sorted(
+            os.path.join(directory, name) for name in names if name.endswith(cls.SUFFIX)
+        )
+
+
+class ProgramTimeline:
+    """The important moments in one program's start up."""
+
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+
+    def __init__(self, name, transitions, ready=None):
+        """Initialise the timeline.
+
+        :param name: The name of the program
+        :param transitions: A list of (offset, state) for this program, in order
+        :param ready: When it was found ready, if it has readiness probes
+        """
+        self.name = name
+        self.transitions = transitions
+
+        starts = [offset for offset, state in transitions if state == "STARTING"]
+        running = [offset for offset, state in transitions if state == "RUNNING"]
+
+        # When supervisor first tried to start it
+        self.spawned = starts[0] if starts else None
+        # When it got to RUNNING for the last time, on the attempt which stuck
+        self.running = running[-1] if running else None
+
+        # Everything before the attempt which worked was wasted
+        successful = [
+            offset
+            for offset in starts
+            if self.running is not None and offset <= self.running
+        ]
+        self.succeeded_at = successful[-1] if successful else self.spawned
+        self.restarts = max(0, len(starts) - 1)
+        self.lost = (
+            self.succeeded_at - self.spawned if self.succeeded_at is not None else 0.0
+        )
+
+        self.ready = ready if ready is not None else self.running
+
+
+class StartupProfile:
+    """An analysis of a `StartupRecord`."""
+
+    def __init__(self, record, after=None):
+        """Initialise the profile.
+
+        :param record: The `StartupRecord` to analyse
+        :param after: A dict of program name to the programs it waits for, as
+            from `StartupPlan.after`
+        """
+        self.record = record
+        self.after = after or {}
+
+        transitions = {}
+        for offset, program, state in record.transitions:
+            transitions.setdefault(program, []).append((offset, state))
+
+        self.programs = {
+            name: ProgramTimeline(name, program_transitions, record.ready.get(name))
+            for name, program_transitions in sorted(transitions.items())
+        }
+
+    @property
+    def all_ready(self):
+        """Get when the last program became ready, or None."""
+        times = [
+            program.ready
+            for program in self.programs.values()
+            if program.ready is not None
+        ]
+        return max(times) if times else None
+
+    @property
+    def lost_to_restarts(self):
+        """Get the total time programs spent on start attempts which failed."""
+        return sum(program.lost for program in self.programs.values())
+
+    def critical_path(self):
+        """Get the chain of programs which decided when everything was ready.
+
+        This starts from the last program to become ready, and works back
+        through whatever it waited for which became ready last.
+
+        :return: A list of program names, in the order they became ready
+        """
+        ready = {
+            name: program.ready
+            for name, program in self.programs.items()
+            if program.ready is not None
+        }
+        if not ready:
+            return []
+
+        path = [max(ready, key=ready.get)]
+        while True:
+            waited_for = [
+                name for name in self.after.get(path[-1], []) if name in ready
+            ]
+            if not waited_for:
+                break
+
+            path.append(max(waited_for, key=ready.get))
+
+        return list(reversed(path))
+
+    def format(self, width=40):
+        """Describe the profile as text, with a timeline bar per program.
+
+        In the bars `~` is time lost to failed attempts, `-` is the attempt
+        which worked starting up, `=` is waiting to be ready and `|` is ready.
+
+        :param width: The width of the timeline bars
+        :return: A list of lines
+        """
+        end = max(
+            [self.all_ready or 0]
+            + [offset for offset, _, _ in self.record.transitions]
+            + [port["opened"] for port in self.record.ports.values()]
+        )
+        scale = width / end if end else 0
+        critical = set(self.critical_path())
+
+        lines = [
+            f"  {'program':<20}{'spawned':>8}{'restarts':>9}{'lost':>8}"
+            f"{'running':>9}{'ready':>8}  timeline"
+        ]
+        for name, program in self.programs.items():
+            lines.append(
+                f"{'*' if name in critical else ' '} {name:<20}"
+                f"{self._seconds(program.spawned):>8}{program.restarts:>9}"
+                f"{self._seconds(program.lost):>8}{self._seconds(program.running):>9}"
+                f"{self._seconds(program.ready):>8}  {self._bar(program, scale)}"
+            )
+
+        if self.record.ports:
+            lines.extend(["", f"  {'port':<20}{'opened':>8}"])
+            for name, port in sorted(
+                self.record.ports.items(), key=lambda item: item[1]["opened"]
+            ):
+                lines.append(
+                    f"  {name + ' (' + str(port['port']) + ')':<20}"
+                    f"{self._seconds(port['opened']):>8}"
+                )
+
+        lines.extend(
+            [
+                "",
+                f"All ready after: {self._seconds(self.all_ready)}",
+                f"Critical path (*): {' -> '.join(self.critical_path()) or '-'}",
+                f"Time lost to failed starts: {self._seconds(self.lost_to_restarts)}",
+            ]
+        )
+
+        return lines
+
+    def compare(self, previous):
+        """Describe how this profile differs from an earlier one.
+
+        :param previous: Another `StartupProfile`
+        :return: A list of lines
+        """
+        lines = []
+
+        for name, program in self.programs.items():
+            before = previous.programs.get(name)
+            if before is None or before.ready is None or program.ready is None:
+                continue
+
+            lines.append(
+                f"  {name:<20} ready {self._seconds(program.ready):>8} "
+                f"(was {self._seconds(before.ready)}, "
+                f"{program.ready - before.ready:+.1f}s)"
+            )
+
+        if self.all_ready is not None and previous.all_ready is not None:
+            lines.append(
+                f"  {'all ready':<20}       {self._seconds(self.all_ready):>8} "
+                f"(was {self._seconds(previous.all_ready)}, "
+                f"{self.all_ready - previous.all_ready:+.1f}s)"
+            )
+
+        return lines
+
+    def timeline(self):
+        """Convert the profile into a `Timeline` to write out as a trace.
+
+        :return: A `Timeline` with a lane per program
+        """
+        timeline = Timeline()
+        timeline.origin = 0
+
+        for name, program in self.programs.items():
+            transitions = program.transitions + [(None, None)]
+            for (start, state), (end, _) in zip(transitions, transitions[1:]):
+                if end is None:
+                    end = max(start, self.all_ready or start)
+
+                timeline.spans.append(Span(state, name, "state", start, end))
+
+            if program.ready is not None:
+                timeline.spans.append(
+                    Span("ready", name, "ready", program.ready, program.ready)
+                )
+
+        for name, port in self.record.ports.items():
+            timeline.spans.append(
+                Span(f"{name} open", "ports", "port", port["opened"], port["opened"])
+            )
+
+        return timeline
+
+    @staticmethod
+    def _seconds(value):
+        return "-" if value is None else f"{value:.1f}s"
+
+    @staticmethod
+    def _bar(program, scale):
+        if program.spawned is None:
+            return ""
+
+        def column(offset):
+            return int(round(offset * scale))
+
+        bar_text = " " * column(program.spawned)
+        bar_text += "~" * (column(program.succeeded_at) - len(bar_text))
+
+        if program.running is not None:
+            bar_text += "-" * max(0, column(program.running) - len(bar_text))
+
+        if program.ready is not None:
+            bar_text += "=" * max(0, column(program.ready) - len(bar_text)) + "|"
+
+        return bar_text
@@ -0,0 +1,223 @@
+"""Run only the part of the stack needed for a task.
+
+Profiles pick a subset of the projects and programs, and are described in a
+file like this:
+
+    [via]
+    projects = via
+
+    [lms-web]
+    programs = lms-web
+
+Everything a profile needs is pulled in with it. Projects bring in the
+projects they `require` in `git_projects.json`, and programs bring in the
+programs they start `after` in `conf/startup.conf`. Every program of a named
+(or required) project is run, but when a project only comes in for one of
+its programs, just that program and what it needs are run.
+
+The "all" profile always exists, and runs everything.
+"""
+
+import glob
+import os
+from configparser import ConfigParser
+
+
+class StackProfile:
+    """A named subset of the projects and programs."""
+
+    ALL = "all"
+
+    def __init__(self, name, projects=(), programs=()):
+        """Initialise the profile.
+
+        :param name: The name of the profile
+        :param projects: Project names to run everything from, or None for
+            every project
+        :param programs: Program names to run
+        """
+        self.name = name
+        self.projects = None if projects is None else list(projects)
+        self.programs = list(programs)
+
+    @classmethod
+    def load(cls, filename, name):
+        """Read a profile from a profiles file.
+
+        :param filename: The file to read
+        :param name: The name of the profile
+        :raise ValueError: If the file can't be read or has no such profile
+        """
+        if name == cls.ALL:
+            return cls(name, projects=None)
+
+        config = ConfigParser(interpolation=None)
+        if not config.read(filename):
+            raise ValueError(f"Cannot read '{filename}'")
+
+        if not config.has_section(name):
+            names = ", ".join([cls.ALL] + config.sections())
+            raise ValueError(f"No profile called '{name}' (try one of: {names})")
+
+        section = config[name]
+        return cls(
+            name,
+            section.get("projects", "").split(),
+            section.get("programs", "").split(),
+        )
+
+    def resolve(self, requires, services, after):
+        """Work out every project and program the profile needs.
+
+        :param requires: A dict of project name to the projects it needs
+        :param services: A dict of project name to the programs it has
+        :param after: A dict of program name to the programs it waits for
+        :raise ValueError: If the profile mentions an unknown project or
+            program
+        :return: A tuple of the sorted project names and program names
+        """
+        project_of = {
+            program: project
+            for project, programs in services.items()
+            for program in programs
+        }
+
+        whole = set(requires if self.projects is None else self.projects)
+        programs = set(self.programs)
+
+        unknown = sorted(whole - set(requires)) + sorted(programs - set(project_of))
+        if unknown:
+            raise ValueError(
+                f"Profile '{self.name}' has unknown projects or programs: "
+                f"{', '.join(unknown)}"
+            )
+
+        while True:
+            # Projects we only need part of still need what they require
+            partial = {
+                project_of[program] for program in programs if program in project_of
+            }
+            known = set(whole)
+            for project in whole | partial:
+                whole.update(requires.get(project, []))
+
+            needed = set(programs)
+            for project in whole:
+                needed.update(services.get(project, []))
+            for program in list(needed):
+                needed.update(after.get(program, []))
+
+            # Each pass only follows one level of `requires` and `after`, so
+            # carry on until neither projects nor programs are added
+            if needed == programs and whole == known:
+                break
+
+            programs = needed
+
+        return sorted(whole | partial), sorted(programs)
+
+
+class SupervisorConfig:
+    """The supervisord config, made from the main file and the projects'."""
+
+    # Each project's programs are in `<conf_dir>/<project>/services.conf`
+    SERVICES_FILE = "services.conf"
+
+    PROGRAM = "program:"
+    GROUP = "group:"
+
+    def __init__(self, base_file, conf_dir):
+        """Initialise the config.
+
+        :param base_file: The main supervisord config file
+        :param conf_dir: The directory holding a directory per project
+        :raise ValueError: If any of the files can't be read
+        """
+        self.base = self._read(base_file)
+
+        self.projects = {}
+        for filename in sorted(
+            glob.glob(os.path.join(conf_dir, "*", self.SERVICES_FILE))
+        ):
+            project = os.path.basename(os.path.dirname(filename))
+            self.projects[project] = self._read(filename)
+
+    @property
+    def services(self):
+        """Get a dict of project name to the programs it has."""
+        return {
+            project: [
+                section[len(self.PROGRAM) :]
+                for section in config.sections()
+                if section.startswith(self.PROGRAM)
+            ]
+            for project, config in self.projects.items()
+        }
+
+    def write(self, filename, programs, start_programs=None):
+        """Write a supervisord config which only has some programs.
+
+        The programs in the main file, like the event listeners, are always
+        kept. The result doesn't include any other files.
+
+        :param filename: The file to write
+        :param programs: The names of the project programs to keep
+        :param start_programs: The name of the program which starts the
+            others, to tell to only start these programs
+        :raise OSError: If the file can't be written
+        """
+        programs = set(programs)
+
+        combined = self._new_config()
+        for section in self.base.sections():
+            if section != "include":
+                combined[section] = self.base[section]
+
+        start_section = f"{self.PROGRAM}{start_programs}"
+        if start_programs and combined.has_section(start_section):
+            combined[start_section]["command"] += "".join(
+                f" --only {program}" for program in sorted(programs)
+            )
+
+        for config in self.projects.values():
+            for section in config.sections():
+                if section.startswith(self.PROGRAM):
+                    if section[len(self.PROGRAM) :] in programs:
+                        combined[section] = config[section]
+
+                elif section.startswith(self.GROUP):
+                    members = [
+                        name
+                        for name in config[section]["programs"].split(",")
+                        if name.strip() in programs
+                    ]
+                    if members:
+                        combined[section] = config[section]
+                        combined[section]["programs"] = ",".join(members)
+
+                else:
+                    combined[section] = config[section]
+
+        temp_file = f"{filename}.tmp"
+        with open(temp_file, "w") as handle:
+            handle.write(
+                "; Written by superdev.profiles, don't edit this as it will be "
+                "replaced\n\n"
+            )
+            combined.write(handle)
+        os.replace(temp_file, filename)
+
+    @classmethod
+    def _read(cls, filename):
+        config = cls._new_config()
+        if not config.read(filename):
+            raise ValueError(f"Cannot read '{filename}'")
+
+        return config
+
+    @staticmethod
+    def _new_config():
+        config = ConfigParser(interpolation=None)
+        # Keep the case of option names, supervisor cares about it
+        config.optionxform = str
+        return config
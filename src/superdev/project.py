@@ -1,25 +1,53 @@
 """Manipulate and update H git repositories."""
 
+import asyncio
 import json
 import os
-from multiprocessing import Pool, cpu_count
+import xmlrpc.client
 from time import sleep
 
-import pkg_resources
-from colorama import Fore, Style, init
-
-from superdev.shell import Git, ShellException, Tox
+from superdev.clone import CloneStrategy, ObjectCache
+from superdev.fingerprint import ToxFingerprint
+from superdev.freshness import FreshnessRecord
+from superdev.remote import reachable_remotes
+from superdev.scheduler import StageScheduler
+from superdev.shell import Git, RepoState, ShellException, Tox, run_sync
+from superdev.timing import Timeline
 
 
 class Project:
     """Prepare and update a single git project."""
 
+    # Most of the attributes are options passed on by `ProjectManager`
+    # pylint: disable=too-many-instance-attributes
+
     def __init__(self, base_dir, name, git_url, **kwargs):
         self.base_dir = base_dir
         self.name = name
         self.git_location = git_url
         self.services = kwargs.get("services")
         self.tox_init = kwargs.get("tox_init")
+        # Other projects which need to be run for this one to work
+        self.requires = kwargs.get("requires", [])
+
+        # How long a fetch stays fresh enough to skip fetching again, and
+        # whether we know the remote can't be reached at all
+        self.fetch_ttl = kwargs.get("fetch_ttl")
+        self.offline = kwargs.get("offline", False)
+
+        # Rebuild tox environments even if their inputs haven't changed
+        self.force_tox = kwargs.get("force_tox", False)
+
+        # How to clone the project, and the `ObjectCache` to borrow from when
+        # cloning with `CloneStrategy.REFERENCE`
+        self.clone_strategy = kwargs.get("clone_strategy", CloneStrategy.FULL)
+        self.object_cache = kwargs.get("object_cache") or ObjectCache()
+
+        # Where we record how long each stage takes
+        self.timeline = kwargs.get("timeline") or Timeline()
+
+        # The last `RepoState` snapshot we took of the checkout
+        self.state = None
 
     @property
     def path(self):
@@ -31,67 +59,303 @@ class Project:
         """Determine if the project exists on the disk."""
         return os.path.exists(self.path)
 
-    def initialise(self):
+    def initialise(self, scheduler=None):
         """Get the project ready to work.
 
         This will clone if necessary and update if possible.
+
+        This is the blocking version of `initialise_async()`.
+
+        :param scheduler: A `StageScheduler` to run the stages in
+        :return: A tuple of name, (success, status message) and `RepoState`
+        """
+        return run_sync(self.initialise_async(scheduler))
+
+    async def initialise_async(self, scheduler=None):
+        """Get the project ready to work.
+
+        This will clone if necessary and update if possible. The repo update
+        and each tox environment are run as separate tasks in the "repo" and
+        "tox" stages of the scheduler.
+
+        :param scheduler: A `StageScheduler` to run the stages in
+        :return: A tuple of name, (success, status message) and `RepoState`
+            (or None if the state could not be read)
         """
+        if scheduler is None:
+            scheduler = StageScheduler(ProjectManager.STAGE_LIMITS)
+
         try:
-            status = self._initialise()
+            status = await self._initialise(scheduler)
 
         except ShellException as err:
             self._report(f"Failed with error: {err}")
             status = False, f"Unhandled exception: {err.__class__.__name__}:{err}"
 
-        return self.name, status, self._get_branch()
+        return self.name, status, self.state
 
-    def _initialise(self):
-        status = self._update_repo()
-        status = self._update_tox(status)
+    async def _initialise(self, scheduler):
+        status = await self._in_stage(scheduler, "repo", "repo", self._update_repo)
+        status = await self._update_tox(status, scheduler)
         self._report("Complete")
 
         return status
 
-    def _update_tox(self, status):
-        try:  # pylint:disable=too-many-try-statements
-            if self.tox_init:
-                for env in self.tox_init:
-                    self._report(f"Initialising tox env '{env}'...")
-                    Tox.run(self.path, env, ["--notest"])
+    async def _in_stage(self, scheduler, stage, name, coroutine_function, *args):
+        # pylint: disable=too-many-arguments
+        slot = scheduler.slot(stage)
 
-        except ShellException:
-            return False, f"Tox prep failed for '{env}'"
+        with self.timeline.span(f"waiting for {stage}", self.name, "queue"):
+            await slot.acquire()
+
+        with self.timeline.span(name, self.name):
+            try:
+                return await coroutine_function(*args)
+            finally:
+                slot.release()
+
+    async def _update_tox(self, status, scheduler):
+        if not self.tox_init:
+            return status
+
+        # The environments are independent of each other, so we can build
+        # them all at the same time
+        results = await asyncio.gather(
+            *(
+                self._in_stage(scheduler, "tox", f"tox {env}", self._init_tox_env, env)
+                for env in self.tox_init
+            )
+        )
+
+        for env, success in zip(self.tox_init, results):
+            if not success:
+                return False, f"Tox prep failed for '{env}'"
 
         return status
 
-    def _update_repo(self):
+    def input_state(self):
+        """Take a cheap snapshot of what decides how the project is prepared.
+
+        This only reads refs and file details, so it can be polled often.
+
+        :return: A value which changes when the checked out commit, or any of
+            the files the tox environments are built from, change
+        """
+        if not self.exists:
+            return None
+
+        try:
+            branch = RepoState.read_branch(self.path)
+        except ShellException:
+            return None
+
+        commit = RepoState.read_ref(
+            self.path,
+            "HEAD" if branch == RepoState.DETACHED else f"refs/heads/{branch}",
+        )
+
+        files = []
+        for env in self.tox_init or []:
+            fingerprint = ToxFingerprint(self.path, env)
+            files.append((env, os.path.isdir(fingerprint.env_dir)))
+
+            for path in fingerprint.input_files():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                files.append((path, stat.st_mtime_ns, stat.st_size))
+
+        return branch, commit, tuple(files)
+
+    async def refresh_async(self, scheduler):
+        """Rebuild only the tox environments whose inputs have changed.
+
+        :param scheduler: A `StageScheduler` to run the rebuilds in
+        :return: A tuple of the environments rebuilt, and whether they all
+            built successfully
+        """
+        stale = [
+            env
+            for env in self.tox_init or []
+            if not ToxFingerprint(self.path, env).is_current()
+        ]
+        if not stale:
+            self._report("Changed, but the tox environments are up to date")
+            return [], True
+
+        results = await asyncio.gather(
+            *(
+                self._in_stage(scheduler, "tox", f"tox {env}", self._init_tox_env, env)
+                for env in stale
+            )
+        )
+
+        return stale, all(results)
+
+    async def restart_programs_async(self, supervisor, programs):
+        """Restart any of the project's programs which are running.
+
+        :param supervisor: A `Supervisor` to restart them through
+        :param programs: The names of the project's programs
+        :return: The full names of the programs restarted
+        """
+        try:
+            running = await self._restart_running(supervisor, programs)
+        except (OSError, xmlrpc.client.Fault) as err:
+            self._report(f"Could not restart programs: {err}")
+            return []
+
+        if running:
+            self._report(f"Restarted {', '.join(running)}")
+
+        return running
+
+    @staticmethod
+    async def _restart_running(supervisor, programs):
+        running = [
+            supervisor.full_name(info)
+            for info in await supervisor.process_info()
+            if info["name"] in programs
+            and info["statename"] in ("STARTING", "RUNNING", "BACKOFF")
+        ]
+
+        for name in running:
+            await supervisor.call("supervisor.stopProcess", name, True)
+        for name in running:
+            await supervisor.call("supervisor.startProcess", name, False)
+
+        return running
+
+    async def _init_tox_env(self, env):
+        fingerprint = ToxFingerprint(self.path, env)
+
+        if not self.force_tox and fingerprint.is_current():
+            self._report(f"Tox env '{env}' is up to date (skipping)")
+            return True
+
+        # Take the fingerprint before building, so anything which changes
+        # while tox runs is seen as a change next time
+        inputs = fingerprint.value
+
+        self._report(f"Initialising tox env '{env}'...")
+        try:
+            await Tox.run_async(self.path, env, ["--notest"])
+
+        except ShellException:
+            return False
+
+        fingerprint.save(inputs)
+        return True
+
+    async def _update_repo(self):
         if not self.exists:
-            self._report("Cloning...")
-            Git.clone(self.base_dir, self.git_location)
+            if self.offline:
+                self._report("OFFLINE, CANNOT CLONE (skipping)")
+                return False, "Offline, could not clone"
+
+            await self._clone()
+
+            # A fresh clone is clean and up to date, so all we need is the
+            # branch, which we can read without starting git again
+            branch = RepoState.read_branch(self.path)
+            self.state = RepoState(branch, clean=True, upstream=f"origin/{branch}")
+
+            # Cloning counts as fetching
+            FreshnessRecord.load(RepoState.git_dir(self.path)).fetched(
+                RepoState.read_ref(self.path, self.state.upstream)
+            )
             return True, "Cloned"
 
-        if Git.is_clean(self.path):
+        self.state = await RepoState.probe_async(self.path)
+
+        if not self.state.clean:
+            self._report("UNCOMMITTED CHANGES (skipping update)")
+            return False, "Uncommitted changes"
+
+        freshness = FreshnessRecord.load(RepoState.git_dir(self.path))
+
+        # Shallow clones get their history back if we change strategy
+        deepen = self.clone_strategy != CloneStrategy.SHALLOW and (
+            RepoState.is_shallow(self.path)
+        )
+
+        if self.offline:
+            self._report("Offline (using what we last fetched)")
+            status = "Offline, not fetched"
+
+        elif freshness.is_fresh(self.fetch_ttl) and not deepen:
+            self._report("Recently fetched (skipping fetch)")
+            status = "Fetched recently"
+
+        else:
             self._report("Updating...")
+            upstream = self.state.upstream
+            previous_sha = RepoState.read_ref(self.path, upstream)
+
             try:
-                Git.fast_forward(self.path)
+                await Git.fetch_async(self.path, unshallow=deepen)
 
             except ShellException:
-                self._report("UPDATE FAILED, CANNOT FAST FORWARD (skipping update)")
-                return False, "Could not fast-forward"
+                self._report("UPDATE FAILED, CANNOT FETCH (skipping update)")
+                return False, "Could not fetch"
 
-            return True, "Updated"
+            upstream_sha = RepoState.read_ref(self.path, upstream)
+            if upstream_sha is None or upstream_sha != previous_sha:
+                # Something new arrived, so our old idea of how far behind
+                # we are can't be trusted
+                self.state.behind = None
 
-        self._report("UNCOMMITTED CHANGES (skipping update)")
-        return False, "Uncommitted changes"
+            freshness.fetched(upstream_sha)
+            status = "Updated"
 
-    def _report(self, string):
-        print(f"[{self.name}]".ljust(10) + " " + string)
+        return await self._fast_forward(status)
+
+    async def _fast_forward(self, status):
+        if self.state.behind == 0:
+            return True, status
 
-    def _get_branch(self):
         try:
-            return Git.get_branch(self.path)
+            await Git.merge_upstream_async(self.path)
+
         except ShellException:
-            return "?????"
+            self._report("UPDATE FAILED, CANNOT FAST FORWARD (skipping update)")
+            return False, "Could not fast-forward"
+
+        self.state.behind = 0
+        return True, status
+
+    async def warm_cache_async(self):
+        """Create or update this project's mirror in the object cache.
+
+        :return: True if the project was cached successfully
+        """
+        try:
+            created = await self.object_cache.warm_async(self.git_location)
+
+        except ShellException as err:
+            self._report(f"Could not cache: {err}")
+            return False
+
+        self._report("Added to the object cache" if created else "Cache updated")
+        return True
+
+    async def _clone(self):
+        options = list(CloneStrategy.OPTIONS.get(self.clone_strategy, []))
+
+        if self.clone_strategy == CloneStrategy.REFERENCE:
+            if not self.object_cache.has_mirror(self.git_location):
+                self._report("Adding to the object cache...")
+                await self.object_cache.warm_async(self.git_location)
+
+            options += ["--reference", self.object_cache.mirror_path(self.git_location)]
+
+        self._report(f"Cloning ({self.clone_strategy})...")
+        await Git.clone_async(self.base_dir, self.git_location, options)
+
+    def _report(self, string):
+        print(f"[{self.name}]".ljust(10) + " " + string)
 
 
 class ProjectManager:
@@ -99,43 +363,248 @@ class ProjectManager:
 
     # pylint: disable=too-few-public-methods
 
-    PROJECT_DATA = json.load(
-        pkg_resources.resource_stream("superdev", "resource/git_projects.json")
+    # The projects to manage, read by `project_data()`. This is read straight
+    # from the package rather than with `pkg_resources`, which is very slow
+    # to import
+    PROJECT_DATA_FILE = os.path.join(
+        os.path.dirname(__file__), "resource", "git_projects.json"
     )
-
-    def __init__(self, base_dir):
+    _project_data = None
+
+    # How many tasks can run at once in each stage. Git work is mostly
+    # waiting on the network, so we can run plenty at once, but tox installs
+    # compete for CPU and disk
+    STAGE_LIMITS = {"repo": 8, "tox": max(1, (os.cpu_count() or 2) // 2)}
+
+    # Don't fetch a project again if we fetched it this many seconds ago
+    FETCH_TTL = 300
+
+    # How long to wait to see if a remote is there at all before going offline
+    REACHABILITY_TIMEOUT = 2.0
+
+    # How often to check projects for changes in seconds, when watching
+    WATCH_INTERVAL = 2.0
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        base_dir,
+        stage_limits=None,
+        fetch_ttl=None,
+        offline=None,
+        force=False,
+        clone_strategy=CloneStrategy.FULL,
+        cache_dir=None,
+        project_data=None,
+    ):
+        """Create a project manager.
+
+        :param base_dir: The directory to keep the projects in
+        :param stage_limits: A dict of overrides for `STAGE_LIMITS`
+        :param fetch_ttl: Overrides `FETCH_TTL` (0 to always fetch)
+        :param offline: True to never fetch, False to always try, or None to
+            check if the remotes are reachable first
+        :param force: Rebuild tox environments even if nothing has changed
+        :param clone_strategy: One of `CloneStrategy.ALL` to use when cloning
+        :param cache_dir: The directory of the shared `ObjectCache`
+        :param project_data: A dict of project name to settings to use instead
+            of `project_data()`
+        """
         self.base_dir = base_dir
+        self.stage_limits = dict(self.STAGE_LIMITS, **(stage_limits or {}))
+        self.offline = offline
+        self.object_cache = ObjectCache(cache_dir)
+        self.timeline = Timeline()
+
+        if clone_strategy not in CloneStrategy.ALL:
+            raise ValueError(f"Unknown clone strategy '{clone_strategy}'")
+
+        if fetch_ttl is None:
+            fetch_ttl = self.FETCH_TTL
 
         self.projects = {
-            name: Project(base_dir, name, **data)
-            for name, data in self.PROJECT_DATA.items()
+            name: Project(
+                base_dir,
+                name,
+                fetch_ttl=fetch_ttl,
+                force_tox=force,
+                clone_strategy=clone_strategy,
+                object_cache=self.object_cache,
+                timeline=self.timeline,
+                **data,
+            )
+            for name, data in (
+                self.project_data() if project_data is None else project_data
+            ).items()
         }
 
-    def prepare_all(self):
-        """Prepare all projects for work, in parallel."""
+    @classmethod
+    def project_data(cls):
+        """Get the settings for every project we manage.
+
+        The file is only read the first time this is called.
 
-        # Work on the projects in parallel
-        results = Pool(cpu_count()).map(self._prep_project, self.projects.values())
+        :return: A dict of project name to a dict of settings
+        """
+        if cls._project_data is None:
+            with open(cls.PROJECT_DATA_FILE) as handle:
+                cls._project_data = json.load(handle)
+
+        return cls._project_data
+
+    def prepare_all(self, countdown=True):
+        """Prepare all projects for work, in parallel.
+
+        :param countdown: Pause with a warning if anything went wrong
+        :return: True if every project was prepared successfully
+        """
+
+        with self.timeline.listening():
+            results = run_sync(self._prepare_all())
 
         all_good = self._print_results(results)
+        self._print_slowest(self.timeline)
 
-        if not all_good:
+        if not all_good and countdown:
             self._issue_warning_countdown()
 
-    # pylint: disable=no-self-use
-    def _prep_project(self, project):
-        return project.initialise()
+        return all_good
+
+    def warm_cache(self):
+        """Create or update the shared object cache for every project.
+
+        :return: True if every project was cached successfully
+        """
+        return run_sync(self._warm_cache())
+
+    async def _warm_cache(self):
+        scheduler = StageScheduler(self.stage_limits)
+
+        results = await asyncio.gather(
+            *(
+                scheduler.run("repo", project.warm_cache_async)
+                for project in self.projects.values()
+            )
+        )
+
+        return all(results)
+
+    def watch(self, supervisor=None, programs=None, interval=WATCH_INTERVAL):
+        """Keep the projects prepared as they change, until interrupted.
+
+        Each project's checked out commit and the files its tox environments
+        are built from are polled. When they change only the environments
+        which are out of date are rebuilt, and then only that project's
+        running programs are restarted.
+
+        :param supervisor: A `Supervisor` to restart programs through, or None
+            to not restart anything
+        :param programs: A dict of project name to the names of its programs
+        :param interval: How often to check in seconds
+        """
+        print(f"Watching {', '.join(self.projects)} for changes (Ctrl-C to stop)")
+
+        try:
+            run_sync(self._watch(supervisor, programs or {}, interval))
+        except KeyboardInterrupt:
+            pass
+
+    async def _watch(self, supervisor, programs, interval):
+        scheduler = StageScheduler(self.stage_limits)
+        states = {
+            name: project.input_state() for name, project in self.projects.items()
+        }
+
+        while True:
+            await asyncio.sleep(interval)
+            await self._refresh_changed(states, scheduler, supervisor, programs)
+
+    async def _refresh_changed(self, states, scheduler, supervisor, programs):
+        """Refresh the projects which changed since the states were taken.
+
+        :param states: A dict of project name to `Project.input_state()`,
+            which is updated for each project refreshed successfully
+        :return: A dict of the name of each project which changed to the
+            environments rebuilt for it
+        """
+        changed = {}
+        for name, project in self.projects.items():
+            state = project.input_state()
+            if state != states.get(name):
+                changed[project] = state
+
+        async def refresh(project, state):
+            rebuilt, success = await project.refresh_async(scheduler)
+
+            # Projects which failed (like when pip can't be reached) are
+            # tried again next time, rather than waiting for another change
+            if not success:
+                return rebuilt
+
+            states[project.name] = state
+            if rebuilt and supervisor:
+                await project.restart_programs_async(
+                    supervisor, programs.get(project.name, [])
+                )
+
+            return rebuilt
+
+        results = await asyncio.gather(
+            *(refresh(project, state) for project, state in changed.items())
+        )
+
+        return {project.name: rebuilt for project, rebuilt in zip(changed, results)}
+
+    async def _prepare_all(self):
+        # Every project shares one scheduler, so one project's tox build can
+        # overlap with another project's fetch
+        scheduler = StageScheduler(self.stage_limits)
+
+        with self.timeline.span("check remotes", "superdev"):
+            await self._check_remotes()
+
+        return await asyncio.gather(
+            *(project.initialise_async(scheduler) for project in self.projects.values())
+        )
+
+    async def _check_remotes(self):
+        if self.offline is not None:
+            for project in self.projects.values():
+                project.offline = self.offline
+            return
+
+        # One quick check per remote host saves every project waiting for its
+        # own timeout when we are offline
+        reachable = await reachable_remotes(
+            (project.git_location for project in self.projects.values()),
+            timeout=self.REACHABILITY_TIMEOUT,
+        )
+
+        for project in self.projects.values():
+            project.offline = not reachable[project.git_location]
 
     @staticmethod
     def _print_results(results):
+        # This is only needed at the end, so don't slow down importing us
+        # pylint: disable=import-outside-toplevel
+        from colorama import Fore, Style, init
+
         init()  # Initialise colourisation
         print()
 
         all_good = True
 
-        for project, (success, status), branch in results:
+        for project, (success, status), state in results:
             output = project.ljust(10)
-            branch_string = f"({branch})".ljust(30)
+            branch = state.branch if state else "?????"
+
+            tracking = ""
+            # How far behind we are isn't known once a fetch has moved the
+            # upstream and we couldn't fast forward to it
+            if state and state.behind is not None and (state.ahead or state.behind):
+                tracking = f" +{state.ahead}/-{state.behind}"
+
+            branch_string = f"({branch}{tracking})".ljust(30)
 
             if branch == "master":
                 output += branch_string
@@ -154,8 +623,34 @@ class ProjectManager:
 
         return all_good
 
+    @staticmethod
+    def _print_slowest(timeline, count=5):
+        slowest = timeline.slowest(count)
+        if not slowest:
+            return
+
+        print("Slowest stages:")
+        for span in slowest:
+            commands = [
+                child
+                for child in timeline.spans
+                if child.category == timeline.SUBPROCESS
+                and child.lane == span.lane
+                and span.start <= child.start <= span.end
+            ]
+            print(
+                f"  {span.duration:7.2f}s  "
+                + f"[{span.lane}]".ljust(10)
+                + f" {span.name} ({len(commands)} commands)"
+            )
+
+        print()
+
     @staticmethod
     def _issue_warning_countdown():
+        # pylint: disable=import-outside-toplevel
+        from colorama import Fore, Style
+
         for sec in range(10, 0, -1):
             print(
                 f"{Fore.RED}Something above isn't right.{Style.RESET_ALL} Pausing {sec} \r",
@@ -0,0 +1,81 @@
+"""Check whether git remotes can be reached."""
+
+import asyncio
+import os
+import re
+from urllib.parse import urlparse
+
+# Like `git@github.com:hypothesis/h.git`
+SCP_LIKE = re.compile(r"^(?:[^@/]+@)?(?P<host>[^:/]+):(?!//)")
+
+DEFAULT_PORTS = {"ssh": 22, "git": 9418, "http": 80, "https": 443}
+
+
+def parse_location(git_url):
+    """Work out where a git URL points.
+
+    :param git_url: A git URL in any of the forms git accepts
+    :return: A tuple of (host, port) for network remotes, or (None, path) for
+        local ones
+    """
+    if "://" in git_url:
+        parsed = urlparse(git_url)
+        if parsed.scheme == "file":
+            return None, parsed.path
+
+        return parsed.hostname, parsed.port or DEFAULT_PORTS.get(parsed.scheme, 22)
+
+    match = SCP_LIKE.match(git_url)
+    if match:
+        return match.group("host"), DEFAULT_PORTS["ssh"]
+
+    return None, git_url
+
+
+async def is_reachable(git_url, timeout=2.0):
+    """Check if a git remote can be reached, quickly.
+
+    For network remotes this only tries to open a TCP connection to the host,
+    which is much faster than waiting for git to time out. This doesn't read
+    `~/.ssh/config`, so a `Host` with a `ProxyCommand`, a different `Port` or
+    a `HostName` alias can look unreachable when git could reach it. Pass
+    `--online` to `bin/initialise_projects.py` to skip the check.
+
+    :param git_url: The git URL to check
+    :param timeout: How long to wait for a connection in seconds
+    :return: True if the remote can be reached
+    """
+    host, port = parse_location(git_url)
+
+    if host is None:
+        return os.path.exists(port)
+
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return False
+    except OSError:
+        return False
+
+    writer.close()
+    return True
+
+
+async def reachable_remotes(git_urls, timeout=2.0):
+    """Check a collection of git URLs, checking each host only once.
+
+    :param git_urls: An iterable of git URLs
+    :param timeout: How long to wait for each connection in seconds
+    :return: A dict of git URL to whether it's reachable
+    """
+    git_urls = list(git_urls)
+    locations = {git_url: parse_location(git_url) for git_url in git_urls}
+
+    # Pick one URL to stand in for each distinct location
+    checks = {location: git_url for git_url, location in locations.items()}
+    results = await asyncio.gather(
+        *(is_reachable(git_url, timeout) for git_url in checks.values())
+    )
+    reachable = dict(zip(checks.keys(), results))
+
+    return {git_url: reachable[locations[git_url]] for git_url in git_urls}
@@ -0,0 +1,340 @@
+"""Measure how much CPU and memory each supervised program is using.
+
+Programs like `make dev` start whole trees of processes (make, tox, node,
+gunicorn, celery...), so supervisor's pid for a program is only the top of
+the tree. Each sample asks supervisor for the pids, reads every process in
+`/proc` once, and adds up each program's tree of descendants:
+
+ * `rss` - Resident memory in bytes. Shared pages are counted once for
+   every process using them, so this over counts forked workers
+ * `pss` - Proportional memory in bytes, where shared pages are split
+   between the processes sharing them. This is slower to read, so it's
+   optional
+ * `cpu_time` - CPU seconds used by the tree, including finished children
+ * `cpu_percent` - CPU used since the last sample, where 100 is one core
+ * `threads` and `processes` - How many of each are in the tree
+
+Programs are also added up by their supervisor group, and the last few
+samples of each are kept to report peaks and averages.
+"""
+
+import json
+import os
+from collections import deque
+from time import monotonic, time
+
+from superdev.supervisor import Supervisor
+
+
+class Usage:
+    """The resources used by a tree of processes."""
+
+    def __init__(self, processes=0, threads=0, rss=0, pss=None, cpu_time=0.0):
+        self.processes = processes
+        self.threads = threads
+        self.rss = rss
+        self.pss = pss
+        self.cpu_time = cpu_time
+
+        # Filled in by `ResourceSampler` once there is a sample to compare to
+        self.cpu_percent = None
+
+    def add(self, other):
+        """Add another usage to this one.
+
+        :param other: The `Usage` to add
+        :return: This object
+        """
+        self.processes += other.processes
+        self.threads += other.threads
+        self.rss += other.rss
+        self.cpu_time += other.cpu_time
+
+        if other.pss is not None:
+            self.pss = (self.pss or 0) + other.pss
+
+        return self
+
+    def as_dict(self):
+        """Get the usage as a dict suitable for JSON."""
+        return {
+            "processes": self.processes,
+            "threads": self.threads,
+            "rss": self.rss,
+            "pss": self.pss,
+            "cpu_time": round(self.cpu_time, 2),
+            "cpu_percent": (
+                None if self.cpu_percent is None else round(self.cpu_percent, 1)
+            ),
+        }
+
+
+class ProcessTable:
+    """Every process in `/proc`, read once."""
+
+    PROC_DIR = "/proc"
+
+    # The number of clock ticks per second, and bytes per page
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def __init__(self, proc_dir=PROC_DIR):
+        """Read every process.
+
+        :param proc_dir: Where the proc filesystem is mounted
+        :raise OSError: If the proc filesystem can't be read
+        """
+        self.proc_dir = proc_dir
+
+        # pid to its `Usage`, and pid to the pids of its children
+        self.processes = {}
+        self.children = {}
+
+        for name in os.listdir(proc_dir):
+            if not name.isdigit():
+                continue
+
+            pid = int(name)
+            stat = self._read_stat(pid)
+            if stat is None:
+                # The process ended while we were looking
+                continue
+
+            ppid, usage = stat
+            self.processes[pid] = usage
+            self.children.setdefault(ppid, []).append(pid)
+
+    def tree(self, pid):
+        """Get a process and all its descendants.
+
+        :param pid: The pid at the top of the tree
+        :return: A list of pids, empty if the process doesn't exist
+        """
+        if pid not in self.processes:
+            return []
+
+        pids, pending = [], [pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            pending.extend(self.children.get(pid, []))
+
+        return pids
+
+    def usage(self, pid, pss=False):
+        """Add up the resources used by a process and its descendants.
+
+        :param pid: The pid at the top of the tree
+        :param pss: Read the proportional memory as well (slower)
+        :return: A `Usage` object
+        """
+        total = Usage(pss=0 if pss else None)
+
+        for member in self.tree(pid):
+            total.add(self.processes[member])
+            if pss:
+                total.pss += self._read_pss(member)
+
+        return total
+
+    def _read(self, pid, name):
+        with open(os.path.join(self.proc_dir, str(pid), name), "rb") as handle:
+            return handle.read()
+
+    def _read_stat(self, pid):
+        try:
+            stat = self._read(pid, "stat")
+        except OSError:
+            return None
+
+        # The command name is in brackets and can contain anything, so the
+        # fields are counted from the last bracket. See `man 5 proc`
+        fields = stat[stat.rfind(b")") + 2 :].split()
+
+        # utime, stime, cutime and cstime. The children's time is only from
+        # children which have finished, so live children aren't counted twice
+        ticks = sum(int(field) for field in fields[11:15])
+
+        return (
+            int(fields[1]),
+            Usage(
+                processes=1,
+                threads=int(fields[17]),
+                rss=int(fields[21]) * self.PAGE_SIZE,
+                cpu_time=ticks / self.CLOCK_TICKS,
+            ),
+        )
+
+    def _read_pss(self, pid):
+        # `smaps_rollup` is much quicker than adding up `smaps` ourselves, but
+        # only exists on Linux 4.14+. Other people's processes can't be read
+        try:
+            rollup = self._read(pid, "smaps_rollup")
+        except OSError:
+            return 0
+
+        for line in rollup.splitlines():
+            if line.startswith(b"Pss:"):
+                return int(line.split()[1]) * 1024
+
+        return 0
+
+
+class ResourceSampler:
+    """Sample the resources used by each program and group over time."""
+
+    # The options, and the latest sample with the history behind it
+    # pylint: disable=too-many-instance-attributes
+
+    # How many samples to keep for peaks and averages
+    WINDOW = 60
+
+    def __init__(
+        self, supervisor, proc_dir=ProcessTable.PROC_DIR, pss=False, window=WINDOW
+    ):
+        """Initialise the sampler.
+
+        :param supervisor: A `Supervisor` object to get the pids from
+        :param proc_dir: Where the proc filesystem is mounted
+        :param pss: Read the proportional memory as well (slower)
+        :param window: How many samples to keep for peaks and averages
+        """
+        self.supervisor = supervisor
+        self.proc_dir = proc_dir
+        self.pss = pss
+        self.window = window
+
+        self.sampled_at = None
+        self.programs = {}
+        self.groups = {}
+
+        # Name to a deque of (rss, cpu_percent) from recent samples
+        self.history = {}
+
+        self._previous = {}
+
+    async def sample(self, processes=None):
+        """Take a sample of every running program.
+
+        :param processes: The result of `Supervisor.process_info()` if it has
+            been called already
+        :raise OSError: If supervisor or the proc filesystem can't be read
+        :raise xmlrpc.client.Fault: If supervisor reports an error
+        :return: A tuple of dicts of program and group name to `Usage`
+        """
+        if processes is None:
+            processes = await self.supervisor.process_info()
+
+        return self.update(processes)
+
+    def update(self, processes, now=None):
+        """Take a sample of the programs supervisor has told us about.
+
+        :param processes: The result of `Supervisor.process_info()`
+        :param now: The monotonic time of the sample
+        :raise OSError: If the proc filesystem can't be read
+        :return: A tuple of dicts of program and group name to `Usage`
+        """
+        now = monotonic() if now is None else now
+        table = ProcessTable(self.proc_dir)
+
+        programs, groups = {}, {}
+        for info in processes:
+            if not info.get("pid"):
+                continue
+
+            usage = table.usage(info["pid"], pss=self.pss)
+            if not usage.processes:
+                continue
+
+            programs[Supervisor.full_name(info)] = usage
+            groups.setdefault(info["group"], Usage(pss=0 if self.pss else None)).add(
+                usage
+            )
+
+        self._set_cpu_percent(programs, groups, processes, now)
+        self._record(programs)
+        self._record(groups, prefix="group:")
+
+        self.sampled_at = now
+        self.programs, self.groups = programs, groups
+        return programs, groups
+
+    def peak_rss(self, name):
+        """Get the most memory a program or group used in recent samples.
+
+        :param name: A program name, or "group:" and a group name
+        """
+        return max((rss for rss, _ in self.history.get(name, ())), default=0)
+
+    def mean_cpu_percent(self, name):
+        """Get the average CPU a program or group used in recent samples.
+
+        :param name: A program name, or "group:" and a group name
+        :return: The average, or None if there are no samples to compare yet
+        """
+        values = [
+            percent for _, percent in self.history.get(name, ()) if percent is not None
+        ]
+        if not values:
+            return None
+
+        return sum(values) / len(values)
+
+    def snapshot(self):
+        """Get the latest sample as a dict suitable for JSON."""
+
+        def describe(usages, prefix=""):
+            described = {}
+            for name, usage in sorted(usages.items()):
+                described[name] = usage.as_dict()
+                described[name]["peak_rss"] = self.peak_rss(prefix + name)
+
+                mean = self.mean_cpu_percent(prefix + name)
+                described[name]["mean_cpu_percent"] = (
+                    None if mean is None else round(mean, 1)
+                )
+
+            return described
+
+        return {
+            "time": time(),
+            "window": self.window,
+            "programs": describe(self.programs),
+            "groups": describe(self.groups, prefix="group:"),
+        }
+
+    def write(self, filename):
+        """Write the latest sample to a JSON file.
+
+        :param filename: The file to write
+        :raise OSError: If the file can't be written
+        """
+        temp_file = f"{filename}.tmp"
+        with open(temp_file, "w") as handle:
+            json.dump(self.snapshot(), handle, indent=2)
+        os.replace(temp_file, filename)
+
+    def _set_cpu_percent(self, programs, groups, processes, now):
+        # Programs are keyed by pid as well, so a restart starts afresh rather
+        # than looking like negative CPU use. Groups lose time when members
+        # stop, so they are never allowed to go below zero
+        pids = {Supervisor.full_name(info): info.get("pid") for info in processes}
+        current = {
+            ("program", name, pids[name]): usage for name, usage in programs.items()
+        }
+        current.update({("group", name, None): usage for name, usage in groups.items()})
+
+        if self.sampled_at is not None and now > self.sampled_at:
+            elapsed = now - self.sampled_at
+            for key, usage in current.items():
+                if key in self._previous:
+                    used = usage.cpu_time - self._previous[key]
+                    usage.cpu_percent = max(0.0, used) / elapsed * 100
+
+        self._previous = {key: usage.cpu_time for key, usage in current.items()}
+
+    def _record(self, usages, prefix=""):
+        for name, usage in usages.items():
+            history = self.history.setdefault(prefix + name, deque(maxlen=self.window))
+            history.append((usage.rss, usage.cpu_percent))
@@ -0,0 +1,50 @@
+"""Run work in stages which each have their own concurrency limit."""
+
+import asyncio
+
+
+class StageScheduler:
+    """Schedule coroutines into named stages with separate limits.
+
+    Each stage has its own pool of slots, so slow work in one stage (like
+    building tox environments) doesn't hold up work in another (like fetching
+    from git). Work for one project can then overlap with work from another.
+    """
+
+    DEFAULT_LIMIT = 1
+
+    def __init__(self, limits):
+        """Create a scheduler.
+
+        :param limits: A dict of stage name to the maximum number of tasks
+            allowed to run in that stage at once
+        """
+        self.limits = dict(limits)
+        self._semaphores = {}
+
+    async def run(self, stage, coroutine_function, *args, **kwargs):
+        """Run a coroutine function once a slot in the stage is free.
+
+        :param stage: The name of the stage to run in
+        :param coroutine_function: The coroutine function to call
+        :param args: Positional arguments for the function
+        :param kwargs: Keyword arguments for the function
+        :return: The result of the coroutine
+        """
+        async with self.slot(stage):
+            return await coroutine_function(*args, **kwargs)
+
+    def slot(self, stage):
+        """Get the semaphore which controls the slots in a stage.
+
+        :param stage: The name of the stage
+        :return: An `asyncio.Semaphore`
+        """
+        # Semaphores are created lazily, as they must be made inside the
+        # event loop which is going to use them
+        if stage not in self._semaphores:
+            self._semaphores[stage] = asyncio.Semaphore(
+                max(1, self.limits.get(stage, self.DEFAULT_LIMIT))
+            )
+
+        return self._semaphores[stage]
@@ -1,44 +1,126 @@
-"""Wrappers for various shell commands."""
+"""Wrappers for various shell commands.
+
+Commands are run by an asyncio based engine which passes the working
+directory to each subprocess directly, rather than changing the directory of
+the whole process. This means many commands can be run at once in a single
+process. Every wrapper is available as a coroutine (`*_async`) and as a
+blocking call which runs the coroutine to completion.
+"""
+
 # pylint: disable=too-few-public-methods
 
+import asyncio
 import os
-from contextlib import contextmanager
-from subprocess import CalledProcessError, check_output
+from subprocess import PIPE
+from time import perf_counter
 
 
 class ShellException(ChildProcessError):
     """Any error encountered during a shell operation."""
 
 
+def run_sync(coroutine):
+    """Run a coroutine to completion from blocking code.
+
+    This creates a fresh event loop for every call, so it can be called from
+    any code which isn't already running in an event loop. Before Python 3.8
+    the child watcher only works in the main thread, so coroutines which
+    start subprocesses must be run from the main thread.
+
+    :param coroutine: The coroutine to run
+    :return: The result of the coroutine
+    """
+    if hasattr(asyncio, "run"):
+        return asyncio.run(coroutine)
+
+    # Python 3.6 has no `asyncio.run`. Setting the loop is required to attach
+    # the child watcher, without which we can't wait on subprocesses
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
 class Shell:
     """Perform arbitrary shell commands in a directory."""
 
+    # Callables which are told about every command once it finishes. They are
+    # called with `commands`, `cwd`, `start`, `end`, `returncode` and
+    # `output_bytes` keyword arguments. See `superdev.timing.Timeline`
+    listeners = []
+
     @classmethod
-    def run_in_dir(cls, base_dir, commands, env=None):
+    async def run_async(cls, base_dir, commands, env=None):
         """Run a command inside a directory and return the result.
 
+        The command is executed directly, without a shell, so each argument
+        is passed through as is.
+
         :param base_dir: The directory to run in
         :param commands: The parts of the command as a list
         :param env: A dict for environment variables
         :raise ShellException: If anything goes wrong
+        :raise asyncio.CancelledError: If we are cancelled, after killing the
+            command
         :return: The output of the command
         """
-        with cls._in_dir(base_dir):
-            try:
-                return check_output(" ".join(commands), shell=True, env=env)
-            except CalledProcessError as err:
-                raise ShellException(*err.args) from None
+        start = perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *commands, cwd=base_dir, env=env, stdout=PIPE
+            )
+        except OSError as err:
+            cls._notify(commands, base_dir, start, returncode=None, output=b"")
+            raise ShellException(err.errno, commands) from None
+
+        try:
+            output, _ = await process.communicate()
+
+        except asyncio.CancelledError:
+            # Don't leave orphaned processes behind us if we are abandoned
+            process.kill()
+            await process.wait()
+            cls._notify(commands, base_dir, start, process.returncode, output=b"")
+            raise
+
+        cls._notify(commands, base_dir, start, process.returncode, output)
+
+        if process.returncode:
+            raise ShellException(process.returncode, commands)
+
+        return output
 
     @classmethod
-    @contextmanager
-    def _in_dir(cls, base_dir):
-        pwd = os.getcwd()
-        os.chdir(base_dir)
+    def _notify(cls, commands, cwd, start, returncode, output):
+        # pylint: disable=too-many-arguments
+        end = perf_counter()
+
+        for listener in cls.listeners:
+            listener(
+                commands=commands,
+                cwd=cwd,
+                start=start,
+                end=end,
+                returncode=returncode,
+                output_bytes=len(output),
+            )
 
-        try:
-            yield
-        finally:
-            os.chdir(pwd)
+    @classmethod
+    def run_in_dir(cls, base_dir, commands, env=None):
+        """Run a command inside a directory and return the result.
+
+        This is the blocking version of `run_async()`.
+
+        :param base_dir: The directory to run in
+        :param commands: The parts of the command as a list
+        :param env: A dict for environment variables
+        :raise ShellException: If anything goes wrong
+        :return: The output of the command
+        """
+        return run_sync(cls.run_async(base_dir, commands, env=env))
 
 
 class Tox:
@@ -50,12 +132,13 @@ class Tox:
     """
 
     @classmethod
-    def run(cls, base_dir, tox_env, options=None):
+    async def run_async(cls, base_dir, tox_env, options=None):
         """Run arbitrary tox commands in an environment.
 
         :param base_dir: The base directory to run in
         :param tox_env: The tox environment to run in
         :param options: List of options to add to the end of the command
+        :return: Tox command output
         """
         # Use pyenv ourselves to avoid just picking up the virtualenv version
         # of tox from the superdev project
@@ -64,7 +147,7 @@ class Tox:
         if options:
             tox_command.extend(options)
 
-        Shell.run_in_dir(
+        return await Shell.run_async(
             base_dir,
             tox_command,
             # Tell pyenv to look in the target directory to pick up the right
@@ -72,6 +155,17 @@ class Tox:
             env=dict(os.environ, PYENV_DIR=os.path.abspath(base_dir)),
         )
 
+    @classmethod
+    def run(cls, base_dir, tox_env, options=None):
+        """Run arbitrary tox commands in an environment.
+
+        :param base_dir: The base directory to run in
+        :param tox_env: The tox environment to run in
+        :param options: List of options to add to the end of the command
+        :return: Tox command output
+        """
+        return run_sync(cls.run_async(base_dir, tox_env, options))
+
 
 class Git:
     """Perform various git actions in directories.
@@ -82,14 +176,38 @@ class Git:
     """
 
     @classmethod
-    def clone(cls, base_dir, git_location):
+    async def clone_async(cls, base_dir, git_location, options=None):
         """Clone a repository.
 
         :param base_dir: The directory to run the command in
         :param git_location: The git URL to clone
+        :param options: List of extra options for `git clone`
         :return: Git command output
         """
-        return Shell.run_in_dir(base_dir, ["git", "clone", git_location])
+        return await Shell.run_async(
+            base_dir, ["git", "clone"] + list(options or []) + [git_location]
+        )
+
+    @classmethod
+    def clone(cls, base_dir, git_location, options=None):
+        """Clone a repository.
+
+        :param base_dir: The directory to run the command in
+        :param git_location: The git URL to clone
+        :param options: List of extra options for `git clone`
+        :return: Git command output
+        """
+        return run_sync(cls.clone_async(base_dir, git_location, options))
+
+    @classmethod
+    async def checkout_async(cls, base_dir, branch="master"):
+        """Checkout a particular branch in a repository.
+
+        :param base_dir: The directory to run the command in
+        :param branch: The branch to checkout
+        :return: Git command output
+        """
+        return await Shell.run_async(base_dir, ["git", "checkout", branch])
 
     @classmethod
     def checkout(cls, base_dir, branch="master"):
@@ -99,7 +217,16 @@ class Git:
         :param branch: The branch to checkout
         :return: Git command output
         """
-        return Shell.run_in_dir(base_dir, ["git", "checkout", branch])
+        return run_sync(cls.checkout_async(base_dir, branch))
+
+    @classmethod
+    async def fast_forward_async(cls, base_dir):
+        """Fast-forward the branch if possible.
+
+        :param base_dir: The directory to run the command in
+        :return: Git command output
+        """
+        return await Shell.run_async(base_dir, ["git", "pull", "--ff-only"])
 
     @classmethod
     def fast_forward(cls, base_dir):
@@ -108,7 +235,66 @@ class Git:
         :param base_dir: The directory to run the command in
         :return: Git command output
         """
-        return Shell.run_in_dir(base_dir, ["git", "pull", "--ff-only"])
+        return run_sync(cls.fast_forward_async(base_dir))
+
+    @classmethod
+    async def fetch_async(cls, base_dir, unshallow=False):
+        """Fetch from the remote without changing the checkout.
+
+        :param base_dir: The directory to run the command in
+        :param unshallow: Fetch the full history of a shallow clone
+        :return: Git command output
+        """
+        command = ["git", "fetch", "--quiet"]
+        if unshallow:
+            command.append("--unshallow")
+
+        return await Shell.run_async(base_dir, command)
+
+    @classmethod
+    def fetch(cls, base_dir, unshallow=False):
+        """Fetch from the remote without changing the checkout.
+
+        :param base_dir: The directory to run the command in
+        :param unshallow: Fetch the full history of a shallow clone
+        :return: Git command output
+        """
+        return run_sync(cls.fetch_async(base_dir, unshallow))
+
+    @classmethod
+    async def merge_upstream_async(cls, base_dir):
+        """Fast-forward the branch to the last fetched upstream if possible.
+
+        This doesn't touch the network.
+
+        :param base_dir: The directory to run the command in
+        :return: Git command output
+        """
+        return await Shell.run_async(
+            base_dir, ["git", "merge", "--ff-only", "--quiet", "@{upstream}"]
+        )
+
+    @classmethod
+    def merge_upstream(cls, base_dir):
+        """Fast-forward the branch to the last fetched upstream if possible.
+
+        This doesn't touch the network.
+
+        :param base_dir: The directory to run the command in
+        :return: Git command output
+        """
+        return run_sync(cls.merge_upstream_async(base_dir))
+
+    @classmethod
+    async def is_clean_async(cls, base_dir):
+        """Determine if the checkout is completely clean.
+
+        No uncommitted changes and no untracked files.
+
+        :param base_dir: The directory to run the command in
+        :return: True if the checkout is clean
+        """
+        return not await Shell.run_async(base_dir, ["git", "status", "--porcelain"])
 
     @classmethod
     def is_clean(cls, base_dir):
@@ -117,9 +303,22 @@ class Git:
         No uncommitted changes and no untracked files.
 
         :param base_dir: The directory to run the command in
-        :return: Git command output
+        :return: True if the checkout is clean
+        """
+        return run_sync(cls.is_clean_async(base_dir))
+
+    @classmethod
+    async def get_branch_async(cls, base_dir):
+        """Get the currently checked out branch.
+
+        :param base_dir: The directory to run the command in
+        :return: The branch name
         """
-        return not Shell.run_in_dir(base_dir, ["git", "status", "--porcelain"])
+        output = await Shell.run_async(
+            base_dir, ["git", "rev-parse", "--abbrev-ref", "HEAD"]
+        )
+
+        return output.decode("utf-8").strip()
 
     @classmethod
     def get_branch(cls, base_dir):
@@ -128,9 +327,178 @@ class Git:
         :param base_dir: The directory to run the command in
         :return: The branch name
         """
+        return run_sync(cls.get_branch_async(base_dir))
+
+
+class RepoState:
+    """A snapshot of the state of a git checkout.
+
+    This answers whether the tree is clean, which branch is checked out and
+    how far it is ahead or behind its upstream from a single call to git.
+    """
+
+    # This is what `git rev-parse --abbrev-ref HEAD` gives for a detached HEAD
+    DETACHED = "HEAD"
+
+    def __init__(self, branch, clean, ahead=0, behind=0, upstream=None):
+        self.branch = branch
+        self.clean = clean
+        self.ahead = ahead
+        self.behind = behind
+        self.upstream = upstream
+
+    @classmethod
+    async def probe_async(cls, base_dir):
+        """Read the state of a checkout.
+
+        :param base_dir: The directory of the checkout
+        :raise ShellException: If anything goes wrong
+        :return: A `RepoState` object
+        """
+        output = await Shell.run_async(
+            base_dir, ["git", "status", "--porcelain=v2", "--branch"]
+        )
+
+        return cls.from_porcelain(output.decode("utf-8"))
+
+    @classmethod
+    def probe(cls, base_dir):
+        """Read the state of a checkout.
+
+        :param base_dir: The directory of the checkout
+        :raise ShellException: If anything goes wrong
+        :return: A `RepoState` object
+        """
+        return run_sync(cls.probe_async(base_dir))
+
+    @classmethod
+    def from_porcelain(cls, output):
+        """Create a state from the output of `git status --porcelain=v2 --branch`.
+
+        :param output: The decoded output of the command
+        :return: A `RepoState` object
+        """
+        headers = {}
+        clean = True
+
+        for line in output.splitlines():
+            if line.startswith("# "):
+                key, _, value = line[2:].partition(" ")
+                headers[key] = value
+            elif line:
+                clean = False
+
+        branch = headers.get("branch.head", cls.DETACHED)
+        if branch == "(detached)":
+            branch = cls.DETACHED
+
+        ahead, behind = 0, 0
+        if "branch.ab" in headers:
+            ahead, behind = (abs(int(part)) for part in headers["branch.ab"].split())
+
+        return cls(
+            branch=branch,
+            clean=clean,
+            ahead=ahead,
+            behind=behind,
+            upstream=headers.get("branch.upstream"),
+        )
+
+    @classmethod
+    def read_branch(cls, base_dir):
+        """Read the checked out branch straight from `.git/HEAD`.
+
+        This avoids starting git at all, for when we only need the branch.
+
+        :param base_dir: The directory of the checkout
+        :raise ShellException: If the HEAD can't be read
+        :return: The branch name
+        """
+        try:
+            handle = open(os.path.join(cls.git_dir(base_dir), "HEAD"))
+        except OSError as err:
+            raise ShellException(err.errno, str(err)) from None
+
+        with handle:
+            head = handle.read().strip()
+
+        if head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/") :]
+
+        return cls.DETACHED
+
+    @classmethod
+    def read_ref(cls, base_dir, ref):
+        """Read the SHA a ref points to straight from the git directory.
+
+        Short names are looked up as branches, then remote tracking branches,
+        in the same way as git does. Symbolic refs are not followed.
+
+        :param base_dir: The directory of the checkout
+        :param ref: The ref to read like `origin/master`
+        :return: The SHA of the ref or None if it can't be found
+        """
+        if not ref:
+            return None
+
+        git_dir = cls.git_dir(base_dir)
+        candidates = [ref, f"refs/heads/{ref}", f"refs/remotes/{ref}"]
+
+        for candidate in candidates:
+            try:  # pylint:disable=too-many-try-statements
+                with open(os.path.join(git_dir, candidate)) as handle:
+                    return handle.read().strip()
+            except OSError:
+                continue
+
+        # Refs which haven't changed in a while get packed into one file
+        try:  # pylint:disable=too-many-try-statements
+            with open(os.path.join(git_dir, "packed-refs")) as handle:
+                packed = dict(
+                    reversed(line.split())
+                    for line in handle
+                    if line[0] not in "#^" and len(line.split()) == 2
+                )
+        except OSError:
+            return None
+
+        for candidate in candidates:
+            if candidate in packed:
+                return packed[candidate]
+
+        return None
+
+    @classmethod
+    def is_shallow(cls, base_dir):
+        """Check if a checkout is a shallow clone.
+
+        :param base_dir: The directory of the checkout
+        :return: True if the checkout only has part of the history
+        """
+        return os.path.exists(os.path.join(cls.git_dir(base_dir), "shallow"))
+
+    @classmethod
+    def git_dir(cls, base_dir):
+        """Get the git directory for a checkout.
+
+        This follows `.git` files, as used by worktrees and submodules.
+
+        :param base_dir: The directory of the checkout
+        :return: The path of the git directory
+        """
+        git_dir = os.path.join(base_dir, ".git")
+
+        if os.path.isfile(git_dir):
+            with open(git_dir) as handle:
+                target = handle.read().strip()
+
+            if target.startswith("gitdir:"):
+                return os.path.join(base_dir, target[len("gitdir:") :].strip())
+
+        return git_dir
 
+    def __repr__(self):
         return (
-            Shell.run_in_dir(base_dir, ["git", "rev-parse", "--abbrev-ref", "HEAD"])
-            .decode("utf-8")
-            .strip()
+            f"RepoState(branch={self.branch!r}, clean={self.clean}, "
+            f"ahead={self.ahead}, behind={self.behind})"
         )
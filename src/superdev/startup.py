@@ -0,0 +1,468 @@
+"""Start supervised programs in dependency order, once what they need is ready.
+
+Supervisor has no idea of one program depending on another, so the programs
+which need something else to be up first are configured with
+`autostart=false` and described in a startup file like this:
+
+    [h-services]
+    ready =
+        tcp:5432
+        http://localhost:9200
+
+    [h-dev]
+    after = h-services
+
+Each program is started through supervisor's RPC interface as soon as every
+program in its `after` list is ready. A program is ready when all its `ready`
+probes pass:
+
+ * `tcp:<port>` or `tcp:<host>:<port>` - The port accepts connections
+ * `http://...` or `https://...` - The URL gives any response below 500
+ * `log:<regex>` - A line of the program's output matches
+
+Programs without probes are ready once they are RUNNING, or for one-shot
+programs once they have exited successfully.
+"""
+
+import asyncio
+import json
+import os
+import re
+import xmlrpc.client
+from configparser import ConfigParser
+from time import monotonic, time
+from urllib.parse import urlparse
+
+from superdev.monitor import PortProbe
+from superdev.supervisor import Supervisor
+
+
+class TCPProbe:
+    """Ready when a TCP port accepts connections."""
+
+    def __init__(self, host, port):
+        self.port_probe = PortProbe(None, port, host)
+
+    async def check(self, orchestrator, program):  # pylint: disable=unused-argument
+        """Check the probe.
+
+        :param orchestrator: The `Orchestrator` checking the probe
+        :param program: The name of the program being checked
+        :return: True if the probe passes
+        """
+        return await self.port_probe.probe() == PortProbe.OPEN
+
+    def __repr__(self):
+        return f"tcp:{self.port_probe.host}:{self.port_probe.port}"
+
+
+class HTTPProbe:
+    """Ready when a URL gives a response which isn't a server error."""
+
+    def __init__(self, url):
+        self.url = url
+
+    async def check(self, orchestrator, program):  # pylint: disable=unused-argument
+        """Check the probe.
+
+        :param orchestrator: The `Orchestrator` checking the probe
+        :param program: The name of the program being checked
+        :return: True if the probe passes
+        """
+        parsed = urlparse(self.url)
+        secure = parsed.scheme == "https"
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    parsed.hostname, parsed.port or (443 if secure else 80), ssl=secure
+                ),
+                orchestrator.probe_timeout,
+            )
+        except asyncio.TimeoutError:
+            return False
+        except OSError:
+            return False
+
+        # Writing only buffers the request, so it's reading which can fail
+        writer.write(
+            f"GET {path} HTTP/1.0\r\nHost: {parsed.netloc}\r\n\r\n".encode("utf-8")
+        )
+        try:
+            status_line = await asyncio.wait_for(
+                reader.readline(), orchestrator.probe_timeout
+            )
+        except asyncio.TimeoutError:
+            return False
+        except OSError:
+            return False
+        finally:
+            writer.close()
+
+        try:
+            return int(status_line.split()[1]) < 500
+        except (IndexError, ValueError):
+            return False
+
+    def __repr__(self):
+        return self.url
+
+
+class LogProbe:
+    """Ready when a line of the program's output matches a regex."""
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern, re.MULTILINE)
+
+        # Output is only read once, so remember what we've seen
+        self.matched = set()
+
+    async def check(self, orchestrator, program):
+        """Check the probe.
+
+        :param orchestrator: The `Orchestrator` checking the probe
+        :param program: The name of the program being checked
+        :return: True if the probe passes
+        """
+        if program not in self.matched:
+            if self.pattern.search(await orchestrator.new_output(program)):
+                self.matched.add(program)
+
+        return program in self.matched
+
+    def __repr__(self):
+        return f"log:{self.pattern.pattern}"
+
+
+def parse_probe(spec):
+    """Create a probe from its description in a startup file.
+
+    :param spec: A string like "tcp:5432", "http://localhost/" or "log:Ready"
+    :raise ValueError: If the description isn't valid
+    :return: A probe object
+    """
+    kind, _, value = spec.partition(":")
+
+    if kind == "tcp":
+        host, _, port = value.rpartition(":")
+        try:
+            return TCPProbe(host or "127.0.0.1", int(port))
+        except ValueError as err:
+            raise ValueError(f"Bad port in probe '{spec}'") from err
+
+    if kind in ("http", "https"):
+        return HTTPProbe(spec)
+
+    if kind == "log":
+        try:
+            return LogProbe(value)
+        except re.error as err:
+            raise ValueError(f"Bad regex in probe '{spec}': {err}") from err
+
+    raise ValueError(f"Unknown kind of probe '{spec}'")
+
+
+class StartupPlan:
+    """The dependencies and readiness probes for each program."""
+
+    def __init__(self, after, ready):
+        """Initialise the plan.
+
+        :param after: A dict of program name to the names it waits for
+        :param ready: A dict of program name to a list of probes
+        :raise ValueError: If the dependencies form a cycle
+        """
+        self.after = after
+        self.ready = ready
+
+        # Anything mentioned but not fully described waits for nothing, and
+        # has no probes
+        names = set(after) | set(ready)
+        for dependencies in after.values():
+            names.update(dependencies)
+
+        for name in names:
+            self.after.setdefault(name, [])
+            self.ready.setdefault(name, [])
+
+        self._check_for_cycles()
+
+    @classmethod
+    def load(cls, filename):
+        """Read a plan from a startup file.
+
+        :param filename: The file to read
+        :raise ValueError: If the file can't be read or is not valid
+        """
+        config = ConfigParser(interpolation=None)
+        if not config.read(filename):
+            raise ValueError(f"Cannot read '{filename}'")
+
+        after, ready = {}, {}
+        for name in config.sections():
+            section = config[name]
+            after[name] = section.get("after", "").split()
+            ready[name] = [
+                parse_probe(spec.strip())
+                for spec in section.get("ready", "").strip().splitlines()
+                if spec.strip()
+            ]
+
+        return cls(after, ready)
+
+    @property
+    def programs(self):
+        """Get the names of all the programs in the plan."""
+        return sorted(self.after)
+
+    def only(self, programs):
+        """Get a plan for just some of the programs.
+
+        :param programs: The names of the programs to keep
+        :raise ValueError: If a kept program waits for one which isn't kept
+        :return: A new `StartupPlan`
+        """
+        kept = [name for name in self.programs if name in set(programs)]
+
+        for name in kept:
+            missing = [dep for dep in self.after[name] if dep not in programs]
+            if missing:
+                raise ValueError(
+                    f"'{name}' waits for {', '.join(missing)}, which won't be run"
+                )
+
+        return StartupPlan(
+            {name: list(self.after[name]) for name in kept},
+            {name: list(self.ready[name]) for name in kept},
+        )
+
+    def _check_for_cycles(self):
+        done = set()
+
+        def visit(name, path):
+            if name in path:
+                raise ValueError(
+                    f"Startup dependencies loop: {' -> '.join(path + [name])}"
+                )
+
+            if name not in done:
+                for dependency in self.after[name]:
+                    visit(dependency, path + [name])
+                done.add(name)
+
+        for name in self.programs:
+            visit(name, [])
+
+
+class Orchestrator:
+    """Start programs through supervisor as their dependencies become ready."""
+
+    # Most of the attributes are private caches of what supervisor told us
+    # pylint: disable=too-many-instance-attributes
+
+    # How often to check on things in seconds
+    INTERVAL = 0.25
+
+    # How long to wait for any one probe in seconds
+    PROBE_TIMEOUT = 1.0
+
+    # How much of a program's output to read at a time for log probes
+    LOG_CHUNK = 64 * 1024
+
+    # Supervisor fault codes
+    ALREADY_STARTED = 60
+
+    def __init__(self, plan, supervisor, interval=INTERVAL, ready_file=None):
+        """Initialise the orchestrator.
+
+        :param plan: The `StartupPlan` to follow
+        :param supervisor: A `Supervisor` object
+        :param interval: How often to check on things in seconds
+        :param ready_file: A file to record when each program became ready
+            in, for `superdev.profiler`
+        """
+        self.plan = plan
+        self.supervisor = supervisor
+        self.interval = interval
+        self.probe_timeout = self.PROBE_TIMEOUT
+        self.ready_file = ready_file
+
+        self.ready_at = {}
+        self._ready_times = {}
+        self._ready = {}
+        self._started = monotonic()
+        self._info = None
+        self._info_at = None
+        self._info_lock = None
+        self._log_offsets = {}
+
+    async def run(self, timeout=None):
+        """Start everything in order and wait for it all to be ready.
+
+        :param timeout: The longest to wait in seconds, or None to wait forever
+        :raise OSError: If supervisor can't be reached
+        :raise ValueError: If supervisor doesn't know about a program
+        :raise xmlrpc.client.Fault: If supervisor can't start a program
+        :return: True if everything became ready in time
+        """
+        self._started = monotonic()
+        self._ready = {name: asyncio.Event() for name in self.plan.programs}
+
+        await self._wait_for_supervisor(timeout)
+
+        tasks = [
+            asyncio.ensure_future(self._start_program(name))
+            for name in self.plan.programs
+        ]
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+        except asyncio.TimeoutError:
+            waiting = [name for name in self.plan.programs if name not in self.ready_at]
+            self._report("startup", f"Gave up waiting for: {', '.join(waiting)}")
+            return False
+
+        self._report("startup", f"All ready in {self._elapsed():.1f}s")
+        return True
+
+    async def new_output(self, program):
+        """Get output from a program since we last asked.
+
+        :param program: The name of the program
+        :return: The output as a string
+        """
+        name = await self._full_name(program)
+        output = []
+
+        for method in (
+            "supervisor.tailProcessStdoutLog",
+            "supervisor.tailProcessStderrLog",
+        ):
+            offset = self._log_offsets.get((program, method), 0)
+            try:
+                data, offset, _ = await self.supervisor.call(
+                    method, name, offset, self.LOG_CHUNK
+                )
+            except xmlrpc.client.Fault:
+                # Probably no log file for this channel
+                continue
+
+            self._log_offsets[(program, method)] = offset
+            output.append(data)
+
+        return "\n".join(output)
+
+    async def _wait_for_supervisor(self, timeout):
+        deadline = None if timeout is None else monotonic() + timeout
+
+        while True:
+            try:
+                await self._process_info(fresh=True)
+            except OSError:
+                if deadline is not None and monotonic() > deadline:
+                    raise
+            else:
+                return
+
+            await asyncio.sleep(self.interval)
+
+    async def _start_program(self, program):
+        dependencies = self.plan.after[program]
+        for dependency in dependencies:
+            await self._ready[dependency].wait()
+
+        if dependencies:
+            await self._start(program)
+            self._report(program, f"Started after {', '.join(dependencies)}")
+
+        await self._wait_until_ready(program)
+
+        self.ready_at[program] = self._elapsed()
+        self._ready[program].set()
+        self._report(program, "Ready")
+        self._save_ready(program)
+
+    def _save_ready(self, program):
+        if not self.ready_file:
+            return
+
+        self._ready_times[program] = time()
+
+        try:
+            self._write_ready_file()
+        except OSError as err:
+            self._report(program, f"Cannot record being ready: {err}")
+
+    def _write_ready_file(self):
+        temp_file = f"{self.ready_file}.tmp"
+        with open(temp_file, "w") as handle:
+            json.dump(self._ready_times, handle)
+        os.replace(temp_file, self.ready_file)
+
+    async def _start(self, program):
+        try:
+            await self.supervisor.call(
+                "supervisor.startProcess", await self._full_name(program), False
+            )
+        except xmlrpc.client.Fault as err:
+            if err.faultCode != self.ALREADY_STARTED:
+                raise
+
+    async def _wait_until_ready(self, program):
+        probes = self.plan.ready[program]
+
+        while True:
+            info = (await self._process_info()).get(program)
+
+            if info and probes:
+                if info["statename"] in ("STARTING", "RUNNING"):
+                    results = await asyncio.gather(
+                        *(probe.check(self, program) for probe in probes)
+                    )
+                    if all(results):
+                        return
+
+            elif info and self._is_up(info):
+                return
+
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    def _is_up(info):
+        if info["statename"] == "RUNNING":
+            return True
+
+        # One-shot programs which have finished successfully
+        return info["statename"] == "EXITED" and info["exitstatus"] == 0
+
+    async def _full_name(self, program):
+        info = (await self._process_info()).get(program)
+        if info is None:
+            raise ValueError(f"Supervisor has no program called '{program}'")
+
+        return Supervisor.full_name(info)
+
+    async def _process_info(self, fresh=False):
+        if self._info_lock is None:
+            self._info_lock = asyncio.Lock()
+
+        # Share one call between all the programs checking at the same time
+        async with self._info_lock:
+            if fresh or self._info_at is None:
+                stale = True
+            else:
+                stale = monotonic() - self._info_at > self.interval
+
+            if stale:
+                self._info = {
+                    info["name"]: info for info in await self.supervisor.process_info()
+                }
+                self._info_at = monotonic()
+
+        return self._info
+
+    def _elapsed(self):
+        return monotonic() - self._started
+
+    def _report(self, program, message):
+        print(f"[{program}] {message} ({self._elapsed():.1f}s)", flush=True)
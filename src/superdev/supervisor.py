@@ -0,0 +1,68 @@
+"""Talk to supervisord through its XML-RPC interface."""
+
+import xmlrpc.client
+from xml.parsers.expat import ExpatError
+
+from superdev.unix_http import request
+
+
+class Supervisor:
+    """An asyncio client for supervisord's XML-RPC API on a unix socket.
+
+    This speaks to the `[unix_http_server]` configured in
+    `conf/supervisord.conf`, so it's much cheaper than running `supervisorctl`.
+    """
+
+    SOCKET = "/tmp/supervisor.sock"
+
+    def __init__(self, socket_path=SOCKET, timeout=2.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    async def call(self, method, *params):
+        """Call an XML-RPC method.
+
+        :param method: The method name like "supervisor.getState"
+        :param params: Parameters for the method
+        :raise OSError: If supervisor can't be reached, or answers with an
+            HTTP error (see `superdev.unix_http.HTTPError`)
+        :raise xmlrpc.client.Fault: If supervisor reports an error
+        :return: The result of the call
+        """
+        body = xmlrpc.client.dumps(params, method).encode("utf-8")
+
+        response = await request(
+            self.socket_path,
+            "POST",
+            "/RPC2",
+            body,
+            {"Content-Type": "text/xml"},
+            timeout=self.timeout,
+        )
+
+        try:
+            (result,), _ = xmlrpc.client.loads(response)
+        except (xmlrpc.client.ResponseError, ExpatError) as err:
+            raise OSError(f"Bad XML-RPC response from supervisor: {err}") from err
+
+        return result
+
+    async def process_info(self):
+        """Get the state of every process.
+
+        :return: A list of dicts as described for `getAllProcessInfo` in the
+            supervisor API documentation
+        """
+        return await self.call("supervisor.getAllProcessInfo")
+
+    @staticmethod
+    def full_name(info):
+        """Get the name of a process as used by `supervisorctl`.
+
+        :param info: A dict from `process_info()`
+        :return: A name like "h:h-dev", or just the name for lone programs
+        """
+        if info["group"] == info["name"]:
+            return info["name"]
+
+        return f"{info['group']}:{info['name']}"
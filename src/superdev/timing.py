@@ -0,0 +1,182 @@
+"""Record how long each stage and subprocess takes."""
+
+import asyncio
+import json
+from contextlib import contextmanager
+from time import perf_counter
+
+from superdev.shell import Shell
+
+# `asyncio.current_task()` is new in Python 3.7
+_CURRENT_TASK = getattr(asyncio, "current_task", None) or getattr(
+    asyncio.Task, "current_task"
+)
+
+
+def _current_task():
+    try:
+        return _CURRENT_TASK()
+    except RuntimeError:
+        # We aren't inside a running event loop
+        return None
+
+
+class Span:
+    """A period of wall-clock time spent on one thing."""
+
+    # pylint: disable=too-few-public-methods,too-many-arguments
+
+    def __init__(self, name, lane, category, start, end=None, args=None):
+        self.name = name
+        self.lane = lane
+        self.category = category
+        self.start = start
+        self.end = end
+        self.args = args or {}
+
+    @property
+    def duration(self):
+        """Get the length of the span in seconds."""
+        return (self.end or perf_counter()) - self.start
+
+
+class Timeline:
+    """A collection of spans for stages and the subprocesses run in them.
+
+    Subprocesses are recorded by listening to `Shell`, and are put in the
+    same lane as the innermost span open in the asyncio task which ran them.
+    """
+
+    STAGE = "stage"
+    SUBPROCESS = "subprocess"
+
+    def __init__(self):
+        self.origin = perf_counter()
+        self.spans = []
+        self._open = {}
+
+    @contextmanager
+    def span(self, name, lane, category=STAGE, **args):
+        """Time the body of a `with` block.
+
+        :param name: The name of the span
+        :param lane: The lane to show the span in (like a project name)
+        :param category: The category of the span
+        :param args: Any extra details to store with the span
+        :return: A context manager yielding the `Span`
+        """
+        span = Span(name, lane, category, perf_counter(), args=args)
+        task = _current_task()
+        stack = self._open.setdefault(task, [])
+        stack.append(span)
+
+        try:
+            yield span
+        finally:
+            stack.remove(span)
+            if not stack:
+                self._open.pop(task, None)
+
+            span.end = perf_counter()
+            self.spans.append(span)
+
+    @contextmanager
+    def listening(self):
+        """Record every subprocess `Shell` runs in the body of a `with` block.
+
+        :return: A context manager
+        """
+        Shell.listeners.append(self.record_command)
+        try:
+            yield self
+        finally:
+            Shell.listeners.remove(self.record_command)
+
+    # pylint: disable=too-many-arguments
+    def record_command(self, commands, cwd, start, end, returncode, output_bytes):
+        """Record a subprocess which has finished.
+
+        This is called by `Shell` for every command it runs.
+
+        :param commands: The parts of the command
+        :param cwd: The directory the command was run in
+        :param start: When the command started (from `perf_counter()`)
+        :param end: When the command finished (from `perf_counter()`)
+        :param returncode: The exit code, or None if it never started
+        :param output_bytes: The number of bytes the command output
+        """
+        stack = self._open.get(_current_task())
+        lane = stack[-1].lane if stack else "shell"
+
+        self.spans.append(
+            Span(
+                " ".join(commands[:3]),
+                lane,
+                self.SUBPROCESS,
+                start,
+                end,
+                args={
+                    "command": " ".join(commands),
+                    "cwd": cwd,
+                    "exit_code": returncode,
+                    "output_bytes": output_bytes,
+                },
+            )
+        )
+
+    def slowest(self, count=5, category=STAGE):
+        """Get the slowest spans.
+
+        :param count: The maximum number of spans to return
+        :param category: The category of span to consider
+        :return: A list of `Span` objects, slowest first
+        """
+        spans = [span for span in self.spans if span.category == category]
+
+        return sorted(spans, key=lambda span: span.duration, reverse=True)[:count]
+
+    def trace_events(self):
+        """Convert the spans into the Trace Event Format.
+
+        The result can be loaded into `chrome://tracing` or Perfetto.
+
+        :return: A dict of trace data
+        """
+        lanes = {}
+        events = []
+
+        for span in sorted(self.spans, key=lambda span: span.start):
+            lane_id = lanes.setdefault(span.lane, len(lanes) + 1)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": lane_id,
+                    "ts": round((span.start - self.origin) * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "args": span.args,
+                }
+            )
+
+        events.extend(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": lane_id,
+                "args": {"name": lane},
+            }
+            for lane, lane_id in lanes.items()
+        )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, filename):
+        """Write the spans to a file in the Trace Event Format.
+
+        :param filename: The file to write to
+        """
+        with open(filename, "w") as handle:
+            json.dump(self.trace_events(), handle, indent=1)
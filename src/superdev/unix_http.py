@@ -0,0 +1,112 @@
+"""Make simple HTTP requests over unix sockets without blocking.
+
+Supervisor and docker both serve their APIs on unix sockets. This is just
+enough HTTP/1.0 to talk to them from asyncio code without threads or extra
+dependencies.
+"""
+
+import asyncio
+
+
+class HTTPError(OSError):
+    """A request was answered with an error status.
+
+    This is an `OSError` so code which copes with the server being
+    unreachable copes with it answering badly too.
+    """
+
+    def __init__(self, status, body):
+        super().__init__(f"HTTP status {status}")
+        self.status = status
+        self.body = body
+
+
+async def request(socket_path, method, path, body=b"", headers=None, timeout=2.0):
+    """Make an HTTP request over a unix socket.
+
+    :param socket_path: The path of the socket
+    :param method: The HTTP method like "GET" or "POST"
+    :param path: The path to request, including any query string
+    :param body: The request body as bytes
+    :param headers: A dict of extra headers to send
+    :param timeout: The longest to wait for the whole request in seconds
+    :raise OSError: If the socket can't be reached, or the request times out
+    :raise HTTPError: If the response has an error status
+    :return: The response body as bytes
+    """
+    # pylint: disable=too-many-arguments
+    try:
+        return await asyncio.wait_for(
+            _request(socket_path, method, path, body, headers or {}), timeout
+        )
+    except asyncio.TimeoutError as err:
+        raise TimeoutError(f"No response from '{socket_path}' in {timeout}s") from err
+
+
+async def _request(socket_path, method, path, body, headers):
+    # pylint: disable=too-many-arguments
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+
+    headers = dict(headers, Host="localhost", Connection="close")
+    headers["Content-Length"] = str(len(body))
+
+    head = f"{method} {path} HTTP/1.0\r\n" + "".join(
+        f"{key}: {value}\r\n" for key, value in headers.items()
+    )
+
+    # Writing only buffers the request, so it's reading which can fail
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    try:
+        response = await reader.read()
+    finally:
+        writer.close()
+
+    return parse_response(response)
+
+
+def parse_response(response):
+    """Parse a complete HTTP response.
+
+    :param response: The response as bytes
+    :raise OSError: If the response is not valid HTTP
+    :raise HTTPError: If the response has an error status
+    :return: The response body as bytes
+    """
+    head, separator, body = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError) as err:
+        raise OSError(f"Not a valid HTTP response: {lines[0]!r}") from err
+
+    if not separator:
+        raise OSError("The HTTP response was cut short")
+
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        body = _dechunk(body)
+
+    if status >= 400:
+        raise HTTPError(status, body)
+
+    return body
+
+
+def _dechunk(body):
+    data = bytearray()
+
+    while body:
+        size, _, body = body.partition(b"\r\n")
+        size = int(size.split(b";")[0], 16)
+        if not size:
+            break
+
+        data += body[:size]
+        body = body[size + 2 :]
+
+    return bytes(data)
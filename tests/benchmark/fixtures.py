@@ -0,0 +1,119 @@
+"""Generate local projects for benchmarking project preparation."""
+
+import os
+import random
+import stat
+import subprocess
+import sys
+
+# A stand in for `pyenv exec tox -e <env> --notest` which takes as long as the
+# `benchmark_seconds` setting for the env in tox.ini, and creates the env dir
+FAKE_PYENV = """#!{python}
+import configparser
+import os
+import sys
+import time
+
+env = sys.argv[sys.argv.index("-e") + 1]
+config = configparser.ConfigParser()
+config.read("tox.ini")
+time.sleep(config.getfloat("testenv:" + env, "benchmark_seconds", fallback=0))
+os.makedirs(os.path.join(".tox", env), exist_ok=True)
+"""
+
+
+def install_fake_pyenv(bin_dir):
+    """Write a fake `pyenv` into a directory.
+
+    :param bin_dir: The directory to put on the front of `PATH`
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    filename = os.path.join(bin_dir, "pyenv")
+
+    with open(filename, "w") as handle:
+        handle.write(FAKE_PYENV.format(python=sys.executable))
+
+    os.chmod(filename, os.stat(filename).st_mode | stat.S_IEXEC)
+
+
+def tox_ini(tox_envs, tox_seconds):
+    """Create the contents of a tox.ini with envs taking a set time.
+
+    :param tox_envs: The names of the environments
+    :param tox_seconds: How long each env should take to build
+    :return: The contents of the file
+    """
+    sections = ["[tox]\nskipsdist = true\n"]
+    for env in tox_envs:
+        sections.append(f"[testenv:{env}]\nbenchmark_seconds = {tox_seconds}\n")
+
+    return "\n".join(sections)
+
+
+# pylint: disable=too-many-arguments
+def make_remote(path, commits, files, file_size, tox_envs, tox_seconds, seed=0):
+    """Create a bare repository with generated history.
+
+    The history is written with `git fast-import`, so large repositories can
+    be made quickly.
+
+    :param path: Where to create the bare repository
+    :param commits: The number of commits to make
+    :param files: The number of files in the tree
+    :param file_size: The size of each file version in bytes
+    :param tox_envs: The names of the tox environments in the tox.ini
+    :param tox_seconds: How long each tox environment takes to build
+    :param seed: The seed for generating file contents
+    """
+    subprocess.check_call(["git", "init", "--quiet", "--bare", path])
+
+    rand = random.Random(seed)
+    stream = bytearray()
+
+    def blob(path, content):
+        stream.extend(f"M 644 inline {path}\ndata {len(content)}\n".encode("utf-8"))
+        stream.extend(content + b"\n")
+
+    for mark in range(1, commits + 1):
+        message = f"Commit {mark}".encode("utf-8")
+        stream.extend(
+            f"commit refs/heads/master\nmark :{mark}\n"
+            f"committer Bench <bench@example.com> {1600000000 + mark} +0000\n"
+            f"data {len(message)}\n".encode("utf-8") + message + b"\n"
+        )
+
+        if mark == 1:
+            blob("tox.ini", tox_ini(tox_envs, tox_seconds).encode("utf-8"))
+            blob("requirements.txt", b"pytest\n")
+            changed = range(files)
+        else:
+            stream.extend(f"from :{mark - 1}\n".encode("utf-8"))
+            changed = rand.sample(range(files), min(files, 3))
+
+        for number in changed:
+            content = rand.getrandbits(8 * file_size).to_bytes(file_size, "little")
+            blob(f"src/file_{number}.bin", content)
+
+    subprocess.run(
+        ["git", "fast-import", "--quiet"], input=bytes(stream), cwd=path, check=True
+    )
+
+
+def make_remotes(remote_dir, count, **kwargs):
+    """Create a number of bare repositories and project data for them.
+
+    :param remote_dir: The directory to create the repositories in
+    :param count: The number of repositories
+    :param kwargs: Arguments for `make_remote()`
+    :return: A dict of project data like `ProjectManager.project_data()`
+    """
+    project_data = {}
+
+    for number in range(count):
+        name = f"project{number}"
+        path = os.path.join(remote_dir, f"{name}.git")
+        make_remote(path, seed=number, **kwargs)
+
+        project_data[name] = {"git_url": path, "tox_init": list(kwargs["tox_envs"])}
+
+    return project_data
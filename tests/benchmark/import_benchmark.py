@@ -0,0 +1,165 @@
+"""Benchmark how long our modules and scripts take to import.
+
+Supervisor restarts listeners like `bin/logger.py` whenever they exit, and
+every `make` target starts Python again, so import time is paid often. Each
+target is imported in a fresh interpreter several times, and the fastest
+run is reported along with how many modules it pulled in.
+
+`BUDGETS` sets the most time each target may take, and the modules it must
+never import. This exits with an error if a target goes over budget, and
+`tests/unit/superdev/import_time_test.py` fails if a target imports a module
+it mustn't. Timing is left out of the unit tests as it depends on the machine.
+
+Usage:
+
+    python -m tests.benchmark.import_benchmark [--runs 5] [--importtime]
+"""
+
+import json
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Target to (most seconds to import, modules it must never import). Targets
+# are module names, or paths of scripts relative to the root of the repo.
+# Budgets are about 2-3 times what each target takes now, so they allow for
+# slower machines but still catch a return to the old ~200ms imports
+BUDGETS = {
+    "superdev.project": (0.15, ["pkg_resources", "colorama"]),
+    "superdev.startup": (0.15, ["pkg_resources"]),
+    "bin/logger.py": (0.03, ["pkg_resources", "asyncio"]),
+    "bin/backoff.py": (0.15, ["pkg_resources"]),
+    "bin/start_programs.py": (0.15, ["pkg_resources"]),
+    "bin/initialise_projects.py": (0.2, ["pkg_resources", "colorama"]),
+}
+
+# Run in a fresh interpreter to time the import and list what it pulled in.
+# Scripts are run without `__name__ == "__main__"`, so only their imports
+# and module level code run
+MEASURE = """
+import json
+import os
+import runpy
+import sys
+from time import perf_counter
+
+target = sys.argv[1]
+before = set(sys.modules)
+start = perf_counter()
+
+if target.endswith(".py"):
+    sys.path.insert(0, os.path.dirname(target))
+    runpy.run_path(target, run_name="import_benchmark")
+else:
+    __import__(target)
+
+print(json.dumps({
+    "seconds": perf_counter() - start,
+    "modules": sorted(set(sys.modules) - before),
+}))
+"""
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument("--runs", type=int, default=5, help="Imports of each target")
+PARSER.add_argument(
+    "--importtime",
+    action="store_true",
+    help="Show the slowest modules for each target (needs Python 3.7+)",
+)
+PARSER.add_argument("target", nargs="*", help="Targets to measure (defaults to all)")
+
+
+def _command(target, *options):
+    if target.endswith(".py"):
+        target = os.path.join(ROOT_DIR, target)
+
+    return [sys.executable, *options, "-c", MEASURE, target]
+
+
+def _env():
+    path = [os.path.join(ROOT_DIR, "src"), ROOT_DIR]
+    if os.environ.get("PYTHONPATH"):
+        path.append(os.environ["PYTHONPATH"])
+
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(path))
+
+
+def measure(target, runs=3):
+    """Import a target in fresh interpreters and measure it.
+
+    :param target: A module name, or the path of a script from the repo root
+    :param runs: How many times to import it
+    :return: A dict with the fastest "seconds" and the "modules" imported
+    """
+    results = []
+    for _ in range(runs):
+        output = subprocess.check_output(_command(target), env=_env(), cwd=ROOT_DIR)
+        results.append(json.loads(output.decode("utf-8")))
+
+    return min(results, key=lambda result: result["seconds"])
+
+
+def slowest_imports(target, count=10):
+    """Find the modules which take longest to import, with `-X importtime`.
+
+    :param target: A module name, or the path of a script from the repo root
+    :param count: How many modules to return
+    :return: A list of (cumulative microseconds, module name), slowest first
+    """
+    # Only show what the target imported, not what Python starting did
+    modules = set(measure(target, runs=1)["modules"])
+
+    process = subprocess.run(
+        _command(target, "-X", "importtime"),
+        env=_env(),
+        cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+
+    timings = []
+    for line in process.stderr.decode("utf-8").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.strip() in modules:
+            timings.append((int(cumulative), name.strip()))
+
+    return sorted(timings, reverse=True)[:count]
+
+
+def main():
+    """Measure each target and print the results."""
+    args = PARSER.parse_args()
+
+    print(f"{'target':<30} {'import':>9} {'budget':>9} {'modules':>8}")
+    failed = False
+    for target in args.target or BUDGETS:
+        result = measure(target, args.runs)
+        budget, forbidden = BUDGETS.get(target, (None, []))
+        problems = [name for name in forbidden if name in result["modules"]]
+        if budget is not None and result["seconds"] > budget:
+            problems.insert(0, "OVER BUDGET")
+        failed = failed or bool(problems)
+
+        print(
+            f"{target:<30} {result['seconds'] * 1000:>7.1f}ms "
+            + (f"{budget * 1000:>7.0f}ms" if budget else f"{'-':>9}")
+            + f" {len(result['modules']):>8}  {', '.join(problems)}"
+        )
+
+        if args.importtime:
+            for cumulative, name in slowest_imports(target):
+                print(f"    {cumulative / 1000:>7.1f}ms  {name}")
+
+    if failed:
+        sys.exit("Some imports are over budget or import forbidden modules")
+
+
+if __name__ == "__main__":
+    main()
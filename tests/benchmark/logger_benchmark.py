@@ -0,0 +1,264 @@
+"""Benchmark the throughput of the `bin/logger.py` event listener.
+
+This drives a listener over pipes in the same way supervisord does: waiting
+for READY, sending one PROCESS_LOG_STDOUT or PROCESS_LOG_STDERR event and
+waiting for its RESULT before sending the next. Events have realistic header
+and payload sizes and are spread across the programs in `conf/*/services.conf`.
+
+It reports:
+
+ * Events per second
+ * Acknowledgement latency - from sending an event to getting its RESULT
+ * Output latency - from sending an event to its lines appearing on stderr
+ * CPU time used by the listener per event
+
+Several listeners can be compared by passing `--listener` more than once, for
+example with an older copy from `git show HEAD~1:bin/logger.py`.
+
+Usage:
+
+    python -m tests.benchmark.logger_benchmark [--events 20000] [--rate 500]
+"""
+
+import glob
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+from argparse import ArgumentParser
+from time import perf_counter, sleep
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+PARSER = ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument(
+    "--listener",
+    action="append",
+    help="A listener script to benchmark (defaults to bin/logger.py)",
+)
+PARSER.add_argument("--events", type=int, default=20000, help="Events to send")
+PARSER.add_argument(
+    "--rate",
+    type=float,
+    help="Send events at this many per second, rather than as fast as possible",
+)
+PARSER.add_argument("--seed", type=int, default=0, help="Seed for generating events")
+PARSER.add_argument(
+    "--burst-rate",
+    type=float,
+    default=5000,
+    help="Events per second in a startup burst, to size buffer_size for",
+)
+PARSER.add_argument(
+    "--burst-seconds", type=float, default=5, help="Length of a startup burst"
+)
+
+MARKER = re.compile(rb"#(\d+)#")
+
+
+def program_names():
+    """Get the names of all the programs supervisor runs for us."""
+    names = []
+    for filename in sorted(glob.glob(os.path.join(ROOT_DIR, "conf/*/services.conf"))):
+        with open(filename) as handle:
+            names.extend(re.findall(r"^\[program:(.+)\]", handle.read(), re.MULTILINE))
+
+    return names or ["program"]
+
+
+def make_events(count, seed=0):
+    """Generate encoded log events as supervisord would send them.
+
+    Each event's first line carries a `#<serial>#` marker so we can tell
+    when its output arrives.
+
+    :param count: The number of events to generate
+    :param seed: The seed for the random generator
+    :return: A list of bytes, one per event
+    """
+    rand = random.Random(seed)
+    names = program_names()
+    events = []
+
+    for serial in range(count):
+        name = rand.choice(names)
+        channel = rand.choice(["stdout", "stderr"])
+        lines = [
+            f"#{serial}# 2020-05-26 17:25:04,203 [{rand.randint(1000, 99999)}] "
+            + "x" * rand.randint(20, 160)
+        ]
+        lines.extend("y" * rand.randint(20, 160) for _ in range(rand.randint(0, 4)))
+
+        payload = (
+            f"processname:{name} groupname:{name.split('-')[0]} "
+            f"pid:{rand.randint(1000, 99999)} channel:{channel}\n"
+            + "\n".join(lines)
+            + "\n"
+        ).encode("utf-8")
+
+        header = (
+            "ver:3.0 server:supervisor "
+            f"serial:{serial} pool:logger poolserial:{serial} "
+            f"eventname:PROCESS_LOG_{channel.upper()} len:{len(payload)}\n"
+        ).encode("utf-8")
+
+        events.append(header + payload)
+
+    return events
+
+
+class OutputWatcher(threading.Thread):
+    """Read the listener's stderr and note when each event's output arrives."""
+
+    def __init__(self, fd):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.arrivals = {}
+        self.bytes = 0
+
+    def run(self):
+        pending = b""
+        while True:
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                return
+
+            now = perf_counter()
+            self.bytes += len(chunk)
+            pending += chunk
+            complete, _, pending = pending.rpartition(b"\n")
+
+            for match in MARKER.finditer(complete):
+                self.arrivals[int(match.group(1))] = now
+
+
+def _read_until(fd, token, buffer):
+    while token not in buffer:
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            raise EOFError("The listener exited")
+        buffer += chunk
+
+    return buffer[buffer.index(token) + len(token) :]
+
+
+def run_listener(listener, events, rate=None):
+    """Drive a listener with events and measure it.
+
+    :param listener: The path of the listener script
+    :param events: The encoded events to send
+    :param rate: Events per second to send at, or None for as fast as possible
+    :return: A dict of measurements
+    """
+    process = subprocess.Popen(
+        [sys.executable, listener],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+    )
+    watcher = OutputWatcher(process.stderr.fileno())
+    watcher.start()
+
+    stdin, stdout = process.stdin.fileno(), process.stdout.fileno()
+    buffer = _read_until(stdout, b"READY\n", b"")
+
+    sent_at = []
+    ack_latencies = []
+    start = perf_counter()
+
+    for serial, event in enumerate(events):
+        if rate:
+            delay = start + serial / rate - perf_counter()
+            if delay > 0:
+                sleep(delay)
+
+        sent_at.append(perf_counter())
+        os.write(stdin, event)
+        buffer = _read_until(stdout, b"READY\n", buffer)
+        ack_latencies.append(perf_counter() - sent_at[-1])
+
+    elapsed = perf_counter() - start
+
+    process.stdin.close()
+    _, _, usage = os.wait4(process.pid, 0)
+    watcher.join()
+    process.stdout.close()
+    process.stderr.close()
+
+    output_latencies = [
+        watcher.arrivals[serial] - sent
+        for serial, sent in enumerate(sent_at)
+        if serial in watcher.arrivals
+    ]
+
+    return {
+        "events_per_second": len(events) / elapsed,
+        "ack_latency": percentiles(ack_latencies),
+        "output_latency": percentiles(output_latencies),
+        "cpu_per_event": (usage.ru_utime + usage.ru_stime) / len(events),
+        "output_bytes": watcher.bytes,
+        "missing_output": len(events) - len(output_latencies),
+    }
+
+
+def percentiles(values, points=(50, 90, 99, 100)):
+    """Get percentiles of a list of values.
+
+    :param values: The values to summarise
+    :param points: The percentiles to get
+    :return: A dict of percentile to value
+    """
+    if not values:
+        return {point: float("nan") for point in points}
+
+    ordered = sorted(values)
+    return {
+        point: ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))]
+        for point in points
+    }
+
+
+def _format_latency(latencies):
+    return "  ".join(
+        f"p{point}={value * 1000:.2f}ms" for point, value in latencies.items()
+    )
+
+
+def main():
+    """Run the benchmark for each listener and print the results."""
+    args = PARSER.parse_args()
+    listeners = args.listener or [os.path.join(ROOT_DIR, "bin", "logger.py")]
+    events = make_events(args.events, args.seed)
+
+    mode = f"at {args.rate:g} events/s" if args.rate else "as fast as possible"
+    print(f"Sending {len(events)} events {mode}\n")
+
+    for listener in listeners:
+        result = run_listener(listener, events, args.rate)
+        capacity = result["events_per_second"]
+
+        print(listener)
+        print(f"  Throughput:     {capacity:,.0f} events/s")
+        print(f"  Ack latency:    {_format_latency(result['ack_latency'])}")
+        print(f"  Output latency: {_format_latency(result['output_latency'])}")
+        print(f"  CPU per event:  {result['cpu_per_event'] * 1e6:.1f}us")
+        print(f"  Output:         {result['output_bytes']:,} bytes")
+
+        if result["missing_output"]:
+            print(f"  MISSING OUTPUT: {result['missing_output']} events")
+
+        if not args.rate:
+            backlog = max(0, (args.burst_rate - capacity) * args.burst_seconds)
+            print(
+                f"  A burst of {args.burst_rate:g} events/s for "
+                f"{args.burst_seconds:g}s needs buffer_size >= {int(backlog) + 1}"
+            )
+
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Benchmark `ProjectManager.prepare_all` against local fixture repositories.
+
+Three scenarios are measured:
+
+ * cold - Nothing has been cloned yet
+ * warm - Everything is cloned, fetched and built already
+ * dirty - Everything is cloned, but every checkout has uncommitted changes
+
+Each measurement runs in a fresh process so the peak RSS figures are for that
+scenario alone. Results are compared against stored baselines, and the
+script exits with an error if any scenario has regressed.
+
+Usage:
+
+    python -m tests.benchmark.prepare_benchmark [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from superdev.project import ProjectManager
+from tests.benchmark.fixtures import install_fake_pyenv, make_remotes
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+SCENARIOS = ("cold", "warm", "dirty")
+
+# The least each measurement may grow by before it counts as a regression.
+# Warm runs take a few tens of milliseconds, so a fraction of them on its
+# own is well inside the noise of the scheduler
+MIN_SLACK = {"wall_time": 0.1, "peak_rss_kb": 0}
+
+PARSER = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+PARSER.add_argument("--projects", type=int, default=6, help="Number of repos")
+PARSER.add_argument("--commits", type=int, default=50, help="Commits per repo")
+PARSER.add_argument("--files", type=int, default=50, help="Files per repo")
+PARSER.add_argument("--file-size", type=int, default=4096, help="Bytes per file")
+PARSER.add_argument("--tox-envs", type=int, default=1, help="Tox envs per repo")
+PARSER.add_argument(
+    "--tox-seconds", type=float, default=0.5, help="Time to build each tox env"
+)
+PARSER.add_argument(
+    "--scenario", choices=SCENARIOS, action="append", help="Only run these"
+)
+PARSER.add_argument("--baseline", default=BASELINE_FILE, help="The baseline file")
+PARSER.add_argument(
+    "--save-baseline", action="store_true", help="Store the results as the baseline"
+)
+PARSER.add_argument(
+    "--tolerance",
+    type=float,
+    default=0.5,
+    help="Allowed fractional increase in time or memory before failing",
+)
+
+# Used internally to run one phase of a scenario in a fresh process
+PARSER.add_argument("--phase", choices=("setup", "measure"), help=argparse.SUPPRESS)
+PARSER.add_argument("--root", help=argparse.SUPPRESS)
+
+
+def run_phase(root, scenario, phase):
+    """Run one phase of a scenario in this process.
+
+    :param root: The directory holding the fixture remotes and checkouts
+    :param scenario: The name of the scenario
+    :param phase: "setup" to get the checkouts ready, "measure" to time it
+    :return: A dict of measurements
+    """
+    with open(os.path.join(root, "projects.json")) as handle:
+        project_data = json.load(handle)
+
+    work_dir = os.path.join(root, "work")
+    os.environ["PATH"] = os.path.join(root, "bin") + os.pathsep + os.environ["PATH"]
+
+    if phase == "setup":
+        _prepare(work_dir, project_data)
+
+        if scenario == "dirty":
+            for name in project_data:
+                with open(os.path.join(work_dir, name, "DIRTY.txt"), "w") as handle:
+                    handle.write("Uncommitted change")
+
+        return {}
+
+    start = perf_counter()
+    manager = _prepare(work_dir, project_data)
+    wall_time = perf_counter() - start
+
+    return {
+        "wall_time": round(wall_time, 3),
+        "subprocesses": sum(
+            1
+            for span in manager.timeline.spans
+            if span.category == manager.timeline.SUBPROCESS
+        ),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def _prepare(work_dir, project_data):
+    os.makedirs(work_dir, exist_ok=True)
+    manager = ProjectManager(work_dir, offline=False, project_data=project_data)
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        manager.prepare_all(countdown=False)
+
+    return manager
+
+
+def run_scenario(args, scenario):
+    """Run a scenario from scratch, each phase in a fresh process.
+
+    :param args: The parsed command line arguments
+    :param scenario: The name of the scenario
+    :return: A dict of measurements
+    """
+    root = tempfile.mkdtemp(prefix=f"superdev-benchmark-{scenario}-")
+
+    project_data = make_remotes(
+        os.path.join(root, "remotes"),
+        args.projects,
+        commits=args.commits,
+        files=args.files,
+        file_size=args.file_size,
+        tox_envs=[f"env{number}" for number in range(args.tox_envs)],
+        tox_seconds=args.tox_seconds,
+    )
+    with open(os.path.join(root, "projects.json"), "w") as handle:
+        json.dump(project_data, handle)
+
+    install_fake_pyenv(os.path.join(root, "bin"))
+
+    phases = ["measure"] if scenario == "cold" else ["setup", "measure"]
+    for phase in phases:
+        output = subprocess.check_output(
+            [sys.executable, "-m", __spec__.name, "--root", root]
+            + ["--scenario", scenario, "--phase", phase],
+            stderr=subprocess.DEVNULL,
+        )
+
+    shutil.rmtree(root)
+
+    return json.loads(output.decode("utf-8"))
+
+
+def find_regressions(results, baselines, tolerance):
+    """Compare results against the baselines.
+
+    :param results: A dict of scenario name to measurements
+    :param baselines: A dict of scenario name to baseline measurements
+    :param tolerance: The allowed fractional increase in time and memory,
+        which is never less than `MIN_SLACK`
+    :return: A list of messages describing each regression
+    """
+    regressions = []
+
+    for scenario, result in results.items():
+        baseline = baselines.get(scenario)
+        if not baseline:
+            continue
+
+        if result["subprocesses"] > baseline["subprocesses"]:
+            regressions.append(
+                f"{scenario}: {result['subprocesses']} subprocesses, "
+                f"baseline was {baseline['subprocesses']}"
+            )
+
+        for key, min_slack in MIN_SLACK.items():
+            if result[key] > baseline[key] + max(baseline[key] * tolerance, min_slack):
+                regressions.append(
+                    f"{scenario}: {key} was {result[key]}, baseline was {baseline[key]}"
+                )
+
+    return regressions
+
+
+def main():
+    """Run the benchmarks and compare them against the baselines."""
+    args = PARSER.parse_args()
+    scenarios = args.scenario or SCENARIOS
+
+    if args.phase:
+        print(json.dumps(run_phase(args.root, scenarios[0], args.phase)))
+        return
+
+    config = {
+        key: getattr(args, key)
+        for key in ("projects", "commits", "files", "file_size", "tox_envs")
+    }
+    config["tox_seconds"] = args.tox_seconds
+
+    results = {}
+    print("scenario   wall time   subprocesses   peak RSS   peak child RSS")
+    for scenario in scenarios:
+        results[scenario] = result = run_scenario(args, scenario)
+        print(
+            f"{scenario:<10} {result['wall_time']:>8.2f}s   "
+            f"{result['subprocesses']:>12}   {result['peak_rss_kb']:>6} kB   "
+            f"{result['peak_child_rss_kb']:>11} kB"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as handle:
+            json.dump(
+                {"config": config, "results": results}, handle, indent=4, sort_keys=True
+            )
+            handle.write("\n")
+
+        print(f"Saved baseline to: {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as handle:
+            baselines = json.load(handle)
+    except FileNotFoundError:
+        print("No baseline to compare with. Run with --save-baseline to make one")
+        return
+
+    if baselines["config"] != config:
+        print("The baseline was made with different settings, so can't compare")
+        return
+
+    regressions = find_regressions(results, baselines["results"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import functools
+import os
+import subprocess
 from unittest import mock
 
 import pytest
@@ -17,3 +19,31 @@ def _autopatcher(request, target, **kwargs):
 @pytest.fixture
 def patch(request):
     return functools.partial(_autopatcher, request)
+
+
+@pytest.fixture
+def git_remote(tmp_path):
+    """Create a local bare repository with two commits to act as a remote."""
+    source = tmp_path / "source"
+    remote = tmp_path / "remote.git"
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="test",
+        GIT_AUTHOR_EMAIL="test@example.com",
+        GIT_COMMITTER_NAME="test",
+        GIT_COMMITTER_EMAIL="test@example.com",
+    )
+
+    def git(*args, cwd=source):
+        subprocess.check_call(["git", *args], cwd=str(cwd), env=env)
+
+    source.mkdir()
+    git("init", "-q", "-b", "master")
+    for commit in ("first", "second"):
+        (source / "README.md").write_text(commit)
+        git("add", "README.md")
+        git("commit", "-q", "-m", commit)
+
+    git("clone", "-q", "--bare", str(source), str(remote), cwd=tmp_path)
+
+    return str(remote)
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+
+import pytest
+from backoff import BackoffListener
+
+from superdev.backoff import RestartBackoff
+
+
+class TestBackoffListener:
+    def test_it_holds_back_crashing_programs(self, listener, supervisor, pipe):
+        _, write_fd = pipe
+        _write_event(write_fd, "EXITED", "h-dev", expected=b"0")
+        _write_event(write_fd, "EXITED", "h-dev", expected=b"1")
+        _write_event(write_fd, "BACKOFF", "h-dev")
+        _write_event(write_fd, "BACKOFF", "backoff")
+        _write_event(write_fd, "BACKOFF", "backoff")
+        os.close(write_fd)
+
+        listener.main_loop()
+
+        assert supervisor.calls == [("supervisor.stopProcess", "h:h-dev", False)]
+        with open(listener.state_file) as handle:
+            assert list(json.load(handle)) == ["h:h-dev"]
+
+    def test_it_starts_held_programs_again(self, listener, supervisor, pipe):
+        _, write_fd = pipe
+        listener.backoff.base_delay = 0.01
+        _write_event(write_fd, "BACKOFF", "h-dev")
+        _write_event(write_fd, "BACKOFF", "h-dev")
+
+        # Let it wait for the hold to end before it gets any more events
+        def finish():
+            _write_event(write_fd, "STARTING", "h-dev")
+            os.close(write_fd)
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+        listener.main_loop()
+        timer.join()
+
+        assert supervisor.calls == [
+            ("supervisor.stopProcess", "h:h-dev", False),
+            ("supervisor.startProcess", "h:h-dev", False),
+        ]
+        assert not listener.backoff.held
+
+    @pytest.fixture
+    def supervisor(self):
+        class FakeSupervisor:
+            def __init__(self):
+                self.calls = []
+
+            async def call(self, method, *params):
+                self.calls.append((method, *params))
+
+        return FakeSupervisor()
+
+    @pytest.fixture
+    def listener(self, supervisor, pipe, tmp_path):
+        read_fd, _ = pipe
+        output = os.open(str(tmp_path / "output"), os.O_WRONLY | os.O_CREAT)
+
+        yield BackoffListener(
+            RestartBackoff(threshold=2, base_delay=60),
+            supervisor,
+            state_file=str(tmp_path / "backoff.json"),
+            ignore=["backoff"],
+            stdin=read_fd,
+            stdout=output,
+            stderr=output,
+        )
+
+        os.close(output)
+
+
+def _write_event(fd, state, process, expected=b"1"):
+    payload = b"processname:%s groupname:h from_state:RUNNING expected:%s pid:1" % (
+        process.encode("utf-8"),
+        expected,
+    )
+    os.write(
+        fd,
+        b"ver:3.0 eventname:PROCESS_STATE_%s len:%d\n%s"
+        % (state.encode("utf-8"), len(payload), payload),
+    )
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The scripts in bin/ aren't a package, so make them importable by name
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, "bin")
+)
+
+
+@pytest.fixture
+def pipe():
+    """Get a pipe to stand in for supervisor talking to an event listener."""
+    read_fd, write_fd = os.pipe()
+    yield read_fd, write_fd
+
+    for fd in (read_fd, write_fd):
+        try:
+            os.close(fd)
+        except OSError:
+            pass
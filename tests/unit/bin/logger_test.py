@@ -0,0 +1,108 @@
+import os
+import threading
+
+import pytest
+from logger import StderrRedirect
+
+
+class TestStderrRedirect:
+    def test_it_reads_events_in_pieces(self, listener, pipe, writes):
+        _, write_fd = pipe
+        # Make every event take several reads
+        listener.reader.CHUNK_SIZE = 7
+        _write_event(write_fd, "PROCESS_LOG_STDOUT", b"web", b"one\ntwo\n")
+        _write_event(write_fd, "PROCESS_LOG_STDERR", b"web", b"three\n")
+        os.close(write_fd)
+
+        listener.main_loop()
+
+        # The prefix only widens once there is a longer name
+        assert b"".join(writes) == b"web | one\nweb | two\nweb:ERR | three\n"
+
+    def test_it_writes_events_which_arrive_together_at_once(
+        self, listener, pipe, writes
+    ):
+        _, write_fd = pipe
+        for number in range(5):
+            _write_event(write_fd, "PROCESS_LOG_STDOUT", b"web", b"line %d\n" % number)
+        os.close(write_fd)
+
+        listener.main_loop()
+
+        assert writes == [b"".join(b"web | line %d\n" % number for number in range(5))]
+
+    def test_it_writes_once_the_buffer_is_full(self, listener, pipe, writes):
+        _, write_fd = pipe
+        listener.MAX_BUFFER = 10
+        for number in range(3):
+            _write_event(write_fd, "PROCESS_LOG_STDOUT", b"web", b"line %d\n" % number)
+        os.close(write_fd)
+
+        listener.main_loop()
+
+        assert writes == [b"web | line %d\n" % number for number in range(3)]
+
+    def test_it_writes_when_nothing_else_arrives_in_time(self, listener, pipe, writes):
+        _, write_fd = pipe
+        listener.latency = 0.01
+        _write_event(write_fd, "PROCESS_LOG_STDOUT", b"web", b"first\n")
+
+        def finish():
+            _write_event(write_fd, "PROCESS_LOG_STDOUT", b"web", b"second\n")
+            os.close(write_fd)
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+        listener.main_loop()
+        timer.join()
+
+        assert writes == [b"web | first\n", b"web | second\n"]
+
+    def test_it_ignores_other_events(self, listener, pipe, writes):
+        _, write_fd = pipe
+        _write_event(write_fd, "PROCESS_STATE_RUNNING", b"web", b"")
+        os.close(write_fd)
+
+        listener.main_loop()
+
+        assert not writes
+
+    @pytest.fixture
+    def listener(self, pipe, tmp_path):
+        read_fd, _ = pipe
+        stdout = os.open(str(tmp_path / "stdout"), os.O_WRONLY | os.O_CREAT)
+        stderr = os.open(str(tmp_path / "stderr"), os.O_WRONLY | os.O_CREAT)
+
+        # Long enough that only the end of the input flushes, unless a test
+        # says otherwise
+        yield StderrRedirect(stdin=read_fd, stdout=stdout, stderr=stderr, latency=10)
+
+        os.close(stdout)
+        os.close(stderr)
+
+    @pytest.fixture
+    def writes(self, listener, monkeypatch):
+        """Get every write of output the listener makes."""
+        writes = []
+        write_all = listener._write_all  # pylint: disable=protected-access
+
+        def record_write_all(fd, data):
+            if fd == listener.stderr:
+                writes.append(bytes(data))
+            write_all(fd, data)
+
+        monkeypatch.setattr(listener, "_write_all", record_write_all)
+        return writes
+
+
+def _write_event(fd, event_name, process, data):
+    payload = b"processname:%s groupname:%s pid:1 channel:stdout\n%s" % (
+        process,
+        process,
+        data,
+    )
+    os.write(
+        fd,
+        b"ver:3.0 eventname:%s len:%d\n%s"
+        % (event_name.encode("utf-8"), len(payload), payload),
+    )
@@ -0,0 +1,22 @@
+import json
+
+from replay_all_templates import find_projects
+
+from superdev.project import Project
+
+
+def test_find_projects(tmp_path):
+    projects = [Project(str(tmp_path), name, f"{name}.git") for name in "abc"]
+    for name, template in (("a", "gh:example/one"), ("b", "gh:example/one")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ".cookiecutter.json").write_text(
+            json.dumps({"_template": template, "name": name})
+        )
+
+    by_template = find_projects(projects)
+
+    assert list(by_template) == ["gh:example/one"]
+    assert [
+        (project.name, config["name"])
+        for project, config in by_template["gh:example/one"]
+    ] == [("a", "a"), ("b", "b")]
@@ -0,0 +1,281 @@
+# These tests cover the helpers which do the work directly
+# pylint: disable=protected-access
+import json
+import os
+import subprocess
+
+import pytest
+from replay_cookie_cutter import CookieCutter, RenderCache, SyncReport
+
+
+class TestSyncReport:
+    def test_lines(self):
+        report = SyncReport()
+        report.add(SyncReport.CHANGED, "b.txt")
+        report.add(SyncReport.CREATED, "a.txt")
+        report.add(SyncReport.UNCHANGED, "c.txt")
+        report.add(SyncReport.UNCHANGED, "d.txt")
+
+        assert report.lines() == [
+            "  created    a.txt",
+            "  changed    b.txt",
+            "Created 1, changed 1, skipped 0 and left 2 unchanged files",
+        ]
+
+    def test_lines_for_a_cached_dry_run(self):
+        report = SyncReport(dry_run=True)
+        report.add(SyncReport.SKIPPED, "a.txt")
+        report.cached = True
+
+        assert report.lines()[-1] == (
+            "Would have created 0, changed 0, skipped 1 and left 0 unchanged "
+            "files (using a cached render)"
+        )
+
+
+class TestRenderCache:
+    def test_key(self):
+        key = RenderCache.key("abc", {"a": 1, "b": 2})
+
+        assert key == RenderCache.key("abc", {"b": 2, "a": 1})
+        assert key != RenderCache.key("abd", {"a": 1, "b": 2})
+        assert key != RenderCache.key("abc", {"a": 1, "b": 3})
+
+    def test_add_and_get(self, cache):
+        assert cache.get("key") is None
+
+        path = cache.add("key", _render("new"))
+
+        assert cache.get("key") == path
+        assert _read(path) == "new"
+        assert os.listdir(cache.directory) == ["key"]
+
+    def test_add_when_someone_else_added_it_first(self, cache):
+        def render(output_dir):
+            _render("theirs")(os.path.join(cache.directory, "key"))
+            _render("ours")(output_dir)
+
+        path = cache.add("key", render)
+
+        assert _read(path) == "theirs"
+        assert os.listdir(cache.directory) == ["key"]
+
+    def test_add_raises_if_the_render_fails(self, cache):
+        def render(_output_dir):
+            raise OSError("Disk full")
+
+        with pytest.raises(OSError):
+            cache.add("key", render)
+
+        assert not os.listdir(cache.directory)
+
+    def test_evict_removes_old_renders(self, cache):
+        self._add(cache, "old", used=0)
+        self._add(cache, "new", used=RenderCache.MAX_AGE)
+
+        removed = cache.evict(now=RenderCache.MAX_AGE + 1)
+
+        assert removed == [os.path.join(cache.directory, "old")]
+
+    def test_evict_removes_the_least_recently_used_when_too_big(self, cache):
+        cache.max_size = 5
+        self._add(cache, "a", used=1)
+        self._add(cache, "b", used=2)
+        self._add(cache, "c", used=3)
+
+        removed = cache.evict(now=10)
+
+        assert sorted(os.listdir(cache.directory)) == ["c"]
+        assert removed == [os.path.join(cache.directory, name) for name in "ab"]
+
+    def test_evict_leaves_renders_in_progress_unless_old(self, cache):
+        cache.max_size = 0
+        self._add(cache, "new" + RenderCache.STAGING, used=10)
+        self._add(cache, "old" + RenderCache.STAGING, used=0)
+
+        cache.evict(now=RenderCache.MAX_AGE + 5)
+
+        assert os.listdir(cache.directory) == ["new" + RenderCache.STAGING]
+
+    def test_evict_without_a_directory(self, tmp_path):
+        assert not RenderCache(str(tmp_path / "missing")).evict()
+
+    @staticmethod
+    def _add(cache, name, used):
+        path = os.path.join(cache.directory, name)
+        _render("four")(path)
+        os.utime(path, (used, used))
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        directory = tmp_path / "cache"
+        directory.mkdir()
+        return RenderCache(str(directory))
+
+
+class TestCookieCutter:
+    @pytest.mark.parametrize(
+        "rel_path,matches",
+        (("docs/a.txt", True), ("setup.cfg", True), ("docs/a.md", False)),
+    )
+    def test_compile_patterns(self, rel_path, matches):
+        skip = CookieCutter._compile_patterns(["docs/*.txt", "setup.cfg"])
+
+        assert bool(skip.match(rel_path)) == matches
+
+    def test_compile_patterns_without_patterns(self):
+        assert CookieCutter._compile_patterns([]) is None
+
+    def test_compare(self, tmp_path):
+        source = tmp_path / "source"
+        target = tmp_path / "target"
+        source.write_text("same")
+
+        assert CookieCutter._compare(str(source), str(target)) == SyncReport.CREATED
+
+        target.write_text("same")
+        assert CookieCutter._compare(str(source), str(target)) == SyncReport.UNCHANGED
+
+        target.chmod(0o755)
+        assert CookieCutter._compare(str(source), str(target)) == SyncReport.CHANGED
+
+        target.chmod(source.stat().st_mode)
+        target.write_text("diff")
+        assert CookieCutter._compare(str(source), str(target)) == SyncReport.CHANGED
+
+    @pytest.mark.parametrize("dry_run", (True, False))
+    def test_copy_tree(self, tmp_path, dry_run):
+        source = tmp_path / "source"
+        target = tmp_path / "target"
+        for tree, files in (
+            (source, {"new.txt": "new", "a/changed.txt": "new", "a/skip.txt": "new"}),
+            (target, {"a/changed.txt": "old", "a/skip.txt": "old", "same": "x"}),
+        ):
+            for rel_path, content in files.items():
+                (tree / rel_path).parent.mkdir(parents=True, exist_ok=True)
+                (tree / rel_path).write_text(content)
+        (source / "same").write_text("x")
+
+        report = CookieCutter._copy_tree(
+            str(source), str(target), skip_patterns=["*/skip.txt"], dry_run=dry_run
+        )
+
+        assert report.files == {
+            SyncReport.CREATED: ["new.txt"],
+            SyncReport.CHANGED: [os.path.join("a", "changed.txt")],
+            SyncReport.SKIPPED: [os.path.join("a", "skip.txt")],
+            SyncReport.UNCHANGED: ["same"],
+        }
+        assert (target / "a" / "skip.txt").read_text() == "old"
+        assert (target / "a" / "changed.txt").read_text() == (
+            "old" if dry_run else "new"
+        )
+        assert (target / "new.txt").exists() != dry_run
+
+    def test_sync_reuses_cached_renders(self, template, tmp_path):
+        project_dir = tmp_path / "demo"
+        project_dir.mkdir()
+        config = {"_template": template, "name": "demo"}
+        cache = RenderCache(str(tmp_path / "cache"))
+
+        first = CookieCutter.sync(str(project_dir), config, cache=cache)
+        (project_dir / "README.md").write_text("local changes")
+        second = CookieCutter.sync(str(project_dir), config, cache=cache)
+
+        assert first.files[SyncReport.CREATED] == ["README.md"]
+        assert not first.cached
+        assert second.files[SyncReport.CHANGED] == ["README.md"]
+        assert second.cached
+        assert (project_dir / "README.md").read_text() == "Hello demo"
+
+    def test_sync_renders_the_revision_it_caches(self, template, tmp_path, monkeypatch):
+        remote = tmp_path / "remote.git"
+        _git("clone", "-q", "--bare", template, str(remote), cwd=tmp_path)
+        project_dir = tmp_path / "demo"
+        project_dir.mkdir()
+        config = {"_template": f"file://{remote}", "name": "demo"}
+        cache = RenderCache(str(tmp_path / "cache"))
+        template_revision = CookieCutter.template_revision
+
+        def change_the_template_after_looking(template_dir):
+            # Someone pushes to the template while we are working
+            revision = template_revision(template_dir)
+            readme = os.path.join(template, "{{cookiecutter.name}}", "README.md")
+            with open(readme, "w") as handle:
+                handle.write("Changed")
+            _git("commit", "-q", "-am", "Change", cwd=template)
+            _git("push", "-q", str(remote), "HEAD:master", cwd=template)
+            return revision
+
+        monkeypatch.setattr(
+            CookieCutter, "template_revision", change_the_template_after_looking
+        )
+        revision = CookieCutter._git("rev-parse", "HEAD", cwd=template)
+
+        CookieCutter.sync(str(project_dir), config, cache=cache)
+
+        assert os.listdir(cache.directory) == [RenderCache.key(revision, config)]
+        assert (project_dir / "README.md").read_text() == "Hello demo"
+
+    def test_sync_rejects_other_projects(self, template, tmp_path):
+        config = {"_template": template, "name": "other"}
+
+        with pytest.raises(ValueError):
+            CookieCutter.sync(str(tmp_path), config)
+
+    def test_template_revision(self, template):
+        revision = CookieCutter.template_revision(template)
+
+        assert revision == CookieCutter._git("rev-parse", "HEAD", cwd=template)
+
+        with open(os.path.join(template, "uncommitted"), "w") as handle:
+            handle.write("changes")
+
+        assert CookieCutter.template_revision(template) is None
+
+    @pytest.mark.parametrize("template", ("missing", "gh:example/template"))
+    def test_template_revision_for_templates_which_arent_local(self, template):
+        assert CookieCutter.template_revision(template) is None
+
+    @pytest.fixture
+    def template(self, tmp_path, monkeypatch):
+        # Keep cookiecutter's replay files out of the real home directory
+        monkeypatch.setenv("HOME", str(tmp_path / "home"))
+
+        template = tmp_path / "template"
+        (template / "{{cookiecutter.name}}").mkdir(parents=True)
+        (template / "cookiecutter.json").write_text(json.dumps({"name": "demo"}))
+        (template / "{{cookiecutter.name}}" / "README.md").write_text(
+            "Hello {{cookiecutter.name}}"
+        )
+
+        for args in (["init", "-q", "-b", "master"], ["add", "."]):
+            _git(*args, cwd=template)
+        _git("commit", "-q", "-m", "Init", cwd=template)
+
+        return str(template)
+
+
+def _git(*args, cwd):
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="test",
+        GIT_AUTHOR_EMAIL="test@example.com",
+        GIT_COMMITTER_NAME="test",
+        GIT_COMMITTER_EMAIL="test@example.com",
+    )
+    subprocess.check_call(["git", *args], cwd=str(cwd), env=env)
+
+
+def _render(content):
+    def render(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "file"), "w") as handle:
+            handle.write(content)
+
+    return render
+
+
+def _read(path):
+    with open(os.path.join(path, "file")) as handle:
+        return handle.read()
@@ -0,0 +1,67 @@
+import os
+import socket
+
+import pytest
+from startup_recorder import StartupRecorder
+
+from superdev.monitor import PortProbe
+from superdev.profiler import StartupRecord
+
+
+class TestStartupRecorder:
+    def test_it_records_state_changes(self, recorder, pipe, runs_dir):
+        _, write_fd = pipe
+        payload = b"processname:h-dev groupname:h from_state:STARTING pid:1"
+        os.write(
+            write_fd,
+            b"ver:3.0 eventname:PROCESS_STATE_RUNNING len:%d\n%s"
+            % (len(payload), payload),
+        )
+        os.close(write_fd)
+
+        recorder.main_loop()
+
+        (filename,) = StartupRecord.runs(str(runs_dir))
+        record = StartupRecord.load(filename)
+        assert [transition[1:] for transition in record.transitions] == [
+            ["h-dev", "RUNNING"]
+        ]
+
+    def test_check_records_ports_opening(self, recorder, listening_port, runs_dir):
+        recorder._check()  # pylint: disable=protected-access
+
+        assert recorder.record.ports["web"]["port"] == listening_port
+        assert "closed" not in recorder.record.ports
+        assert StartupRecord.runs(str(runs_dir))
+
+    @pytest.fixture
+    def recorder(self, pipe, runs_dir, listening_port, closed_port, tmp_path):
+        read_fd, _ = pipe
+        output = os.open(str(tmp_path / "output"), os.O_WRONLY | os.O_CREAT)
+
+        yield StartupRecorder(
+            str(runs_dir),
+            [PortProbe("web", listening_port), PortProbe("closed", closed_port)],
+            stdin=read_fd,
+            stdout=output,
+            stderr=output,
+        )
+
+        os.close(output)
+
+    @pytest.fixture
+    def runs_dir(self, tmp_path):
+        return tmp_path / "runs"
+
+    @pytest.fixture
+    def listening_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            sock.listen()
+            yield sock.getsockname()[1]
+
+    @pytest.fixture
+    def closed_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
@@ -0,0 +1,82 @@
+import pytest
+
+from superdev.backoff import RestartBackoff
+
+
+class TestRestartBackoff:
+    def test_it_holds_back_programs_which_keep_failing(self, backoff):
+        assert backoff.state_changed("h:h-dev", "BACKOFF", now=0) is None
+        assert backoff.state_changed("h:h-dev", "EXITED", expected=False, now=1) is None
+        assert backoff.state_changed("h:h-dev", "FATAL", now=2) == 5
+
+        assert backoff.held == {"h:h-dev": {"until": 7, "delay": 5, "crashes": 3}}
+        assert backoff.next_release() == 7
+
+    @pytest.mark.parametrize(
+        "state,expected", (("EXITED", True), ("STOPPED", True), ("STOPPING", True))
+    )
+    def test_other_states_are_not_failures(self, backoff, state, expected):
+        for now in range(5):
+            assert backoff.state_changed("h:h-dev", state, expected, now=now) is None
+
+    def test_old_failures_are_forgotten(self, backoff):
+        backoff.state_changed("h:h-dev", "BACKOFF", now=0)
+        backoff.state_changed("h:h-dev", "BACKOFF", now=1)
+
+        assert backoff.state_changed("h:h-dev", "BACKOFF", now=100) is None
+
+    def test_the_delay_doubles_up_to_a_limit(self, backoff):
+        delays = []
+        now = 0
+        for _ in range(6):
+            for _ in range(3):
+                now += 1
+                delay = backoff.state_changed("h:h-dev", "BACKOFF", now=now)
+
+            delays.append(delay)
+            backoff.release(now=now + delay)
+
+        assert delays == [5, 10, 20, 40, 40, 40]
+
+    def test_stable_programs_are_forgiven(self, backoff):
+        for now in range(3):
+            backoff.state_changed("h:h-dev", "BACKOFF", now=now)
+        backoff.release(now=100)
+
+        backoff.state_changed("h:h-dev", "RUNNING", now=100)
+        backoff.state_changed("h:h-dev", "EXITED", expected=False, now=200)
+        backoff.state_changed("h:h-dev", "BACKOFF", now=201)
+
+        assert backoff.state_changed("h:h-dev", "BACKOFF", now=202) == 5
+
+    def test_release(self, backoff):
+        for now in range(3):
+            backoff.state_changed("h:h-dev", "BACKOFF", now=now)
+            backoff.state_changed("via", "BACKOFF", now=now + 1)
+
+        assert not backoff.release(now=6)
+        assert backoff.release(now=7) == ["h:h-dev"]
+        assert backoff.release(now=8) == ["via"]
+        assert backoff.next_release() is None
+
+    def test_starting_by_hand_stops_holding_back(self, backoff):
+        for now in range(3):
+            backoff.state_changed("h:h-dev", "BACKOFF", now=now)
+
+        backoff.state_changed("h:h-dev", "STARTING", now=4)
+
+        assert not backoff.held
+
+    def test_save_and_load_held(self, backoff, tmp_path):
+        filename = str(tmp_path / "backoff.json")
+        for now in range(3):
+            backoff.state_changed("h:h-dev", "BACKOFF", now=now)
+
+        backoff.save(filename)
+
+        assert RestartBackoff.load_held(filename) == backoff.held
+        assert RestartBackoff.load_held(str(tmp_path / "missing.json")) == {}
+
+    @pytest.fixture
+    def backoff(self):
+        return RestartBackoff(threshold=3, window=60, base_delay=5, max_delay=40)
@@ -0,0 +1,53 @@
+import os
+
+from superdev.clone import ObjectCache
+from superdev.shell import Git, RepoState, Shell
+
+
+class TestObjectCache:
+    def test_mirror_path(self, tmp_path):
+        cache = ObjectCache(str(tmp_path))
+
+        assert cache.mirror_path("git@github.com:hypothesis/h.git") == os.path.join(
+            str(tmp_path), "git_github.com_hypothesis_h.git"
+        )
+
+    def test_it_defaults_to_the_user_cache(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("SUPERDEV_CACHE_DIR", raising=False)
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+        assert ObjectCache().cache_dir == os.path.join(str(tmp_path), "superdev", "git")
+
+    def test_warm_creates_then_updates(self, git_remote, tmp_path):
+        cache = ObjectCache(str(tmp_path / "cache"))
+
+        assert cache.warm(git_remote)
+        assert cache.has_mirror(git_remote)
+        assert not cache.warm(git_remote)
+
+    def test_checkouts_can_borrow_from_it(self, git_remote, tmp_path):
+        cache = ObjectCache(str(tmp_path / "cache"))
+        cache.warm(git_remote)
+
+        Git.clone(
+            str(tmp_path), git_remote, ["--reference", cache.mirror_path(git_remote)]
+        )
+
+        alternates = tmp_path / "remote" / ".git" / "objects" / "info" / "alternates"
+        assert alternates.exists()
+        assert RepoState.read_branch(str(tmp_path / "remote")) == "master"
+
+
+class TestShallowClones:
+    def test_they_can_be_deepened(self, git_remote, tmp_path):
+        Git.clone(str(tmp_path), "file://" + git_remote, ["--depth=1"])
+        checkout = str(tmp_path / "remote")
+
+        assert RepoState.is_shallow(checkout)
+
+        Git.fetch(checkout, unshallow=True)
+
+        assert not RepoState.is_shallow(checkout)
+        assert Shell.run_in_dir(checkout, ["git", "rev-list", "--count", "HEAD"]) == (
+            b"2\n"
+        )
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from superdev.events import EventReader, parse_header
+
+
+class TestEventReader:
+    def test_read_event(self, pipe):
+        read_fd, write_fd = pipe
+        os.write(write_fd, b"ver:3.0 eventname:TICK_5 len:5\nhello")
+        os.write(write_fd, b"ver:3.0 eventname:TICK_60 len:0\n")
+        reader = EventReader(read_fd)
+
+        assert reader.read_event() == (
+            {b"ver": b"3.0", b"eventname": b"TICK_5", b"len": b"5"},
+            b"hello",
+        )
+        assert reader.read_event()[0][b"eventname"] == b"TICK_60"
+
+    def test_wait(self, pipe):
+        read_fd, write_fd = pipe
+        reader = EventReader(read_fd)
+
+        assert not reader.wait(0)
+        os.write(write_fd, b"data")
+        assert reader.wait(0)
+
+    def test_it_raises_when_the_input_closes(self, pipe):
+        read_fd, write_fd = pipe
+        os.write(write_fd, b"ver:3.0 len:10\nshort")
+        os.close(write_fd)
+
+        with pytest.raises(EOFError):
+            EventReader(read_fd).read_event()
+
+    @pytest.fixture
+    def pipe(self):
+        read_fd, write_fd = os.pipe()
+        yield read_fd, write_fd
+
+        for fd in (read_fd, write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def test_parse_header():
+    assert parse_header(b"processname:h-dev groupname:h\n") == {
+        b"processname": b"h-dev",
+        b"groupname": b"h",
+    }
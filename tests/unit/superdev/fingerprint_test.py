@@ -0,0 +1,58 @@
+import pytest
+
+from superdev.fingerprint import ToxFingerprint
+
+
+class TestToxFingerprint:
+    def test_it_is_not_current_before_a_build(self, project_dir):
+        assert not ToxFingerprint(str(project_dir), "dev").is_current()
+
+    def test_it_is_current_after_a_build(self, project_dir):
+        ToxFingerprint(str(project_dir), "dev").save()
+
+        assert ToxFingerprint(str(project_dir), "dev").is_current()
+
+    @pytest.mark.parametrize(
+        "filename", ["tox.ini", "requirements.txt", "requirements/dev.txt"]
+    )
+    def test_changing_an_input_invalidates_it(self, project_dir, filename):
+        ToxFingerprint(str(project_dir), "dev").save()
+
+        (project_dir / filename).parent.mkdir(exist_ok=True)
+        (project_dir / filename).write_text("changed")
+
+        assert not ToxFingerprint(str(project_dir), "dev").is_current()
+
+    def test_changing_other_files_does_not(self, project_dir):
+        ToxFingerprint(str(project_dir), "dev").save()
+
+        (project_dir / "README.md").write_text("changed")
+
+        assert ToxFingerprint(str(project_dir), "dev").is_current()
+
+    def test_it_is_not_current_if_the_env_is_missing(self, project_dir):
+        ToxFingerprint(str(project_dir), "dev").save()
+
+        (project_dir / ".tox" / "dev").rmdir()
+
+        assert not ToxFingerprint(str(project_dir), "dev").is_current()
+
+    def test_the_interpreter_is_an_input(self, project_dir, monkeypatch, tmp_path):
+        monkeypatch.setenv("PYENV_ROOT", str(tmp_path / "pyenv"))
+        ToxFingerprint(str(project_dir), "dev").save()
+
+        python = tmp_path / "pyenv" / "versions" / "3.6.9" / "bin" / "python"
+        python.parent.mkdir(parents=True)
+        python.write_text("")
+
+        assert not ToxFingerprint(str(project_dir), "dev").is_current()
+
+    @pytest.fixture
+    def project_dir(self, tmp_path):
+        project_dir = tmp_path / "project"
+        (project_dir / ".git").mkdir(parents=True)
+        (project_dir / ".tox" / "dev").mkdir(parents=True)
+        (project_dir / "tox.ini").write_text("[tox]")
+        (project_dir / ".python-version").write_text("3.6.9\n")
+
+        return project_dir
@@ -0,0 +1,28 @@
+import pytest
+
+from superdev.freshness import FreshnessRecord
+
+
+class TestFreshnessRecord:
+    def test_a_missing_record_is_not_fresh(self, tmp_path):
+        record = FreshnessRecord.load(str(tmp_path))
+
+        assert record.fetched_at is None
+        assert not record.is_fresh(ttl=300)
+
+    def test_it_round_trips(self, tmp_path):
+        FreshnessRecord.load(str(tmp_path)).fetched("abc123", now=1000)
+
+        record = FreshnessRecord.load(str(tmp_path))
+
+        assert record.fetched_at == 1000
+        assert record.upstream_sha == "abc123"
+
+    @pytest.mark.parametrize(
+        "ttl,now,fresh",
+        [(300, 1100, True), (300, 1300, False), (0, 1000, False), (300, 900, False)],
+    )
+    def test_is_fresh(self, tmp_path, ttl, now, fresh):
+        record = FreshnessRecord(str(tmp_path / "record.json"), fetched_at=1000)
+
+        assert record.is_fresh(ttl, now=now) == fresh
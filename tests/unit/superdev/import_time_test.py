@@ -0,0 +1,13 @@
+import pytest
+
+from tests.benchmark.import_benchmark import BUDGETS, measure
+
+
+class TestImportTime:
+    @pytest.mark.parametrize("target", sorted(BUDGETS))
+    def test_it_doesnt_import_slow_modules(self, target):
+        _, forbidden = BUDGETS[target]
+
+        result = measure(target, runs=1)
+
+        assert not [name for name in forbidden if name in result["modules"]]
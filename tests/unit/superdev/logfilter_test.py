@@ -0,0 +1,106 @@
+import pytest
+
+from superdev.logfilter import LogFilter, LogRule
+
+
+class TestLogRule:
+    def test_it_reads_a_config_section(self, tmp_path):
+        rules_file = tmp_path / "logger.conf"
+        rules_file.write_text(
+            "[*-services]\n"
+            "keep = (?i)error\n"
+            "drop =\n    Waiting$\n    Pulling\n"
+            "rate = 5\n"
+            "collapse = yes\n"
+        )
+
+        ((pattern, rule),) = LogFilter.load(str(rules_file)).rules
+
+        assert pattern == "*-services"
+        assert rule.keep.search(b"An ERROR")
+        assert rule.drop.search(b"abc: Waiting")
+        assert rule.drop.search(b"Pulling postgres")
+        assert rule.rate == 5
+        assert rule.burst == 5
+        assert rule.collapse
+
+    @pytest.mark.parametrize(
+        "section", ("drop = [unclosed", "rate = 0", "rate = lots", "collapse = maybe")
+    )
+    def test_it_rejects_bad_settings(self, tmp_path, section):
+        rules_file = tmp_path / "logger.conf"
+        rules_file.write_text(f"[program]\n{section}\n")
+
+        with pytest.raises(ValueError):
+            LogFilter.load(str(rules_file))
+
+    def test_it_rejects_missing_files(self, tmp_path):
+        with pytest.raises(ValueError):
+            LogFilter.load(str(tmp_path / "missing.conf"))
+
+
+class TestLogFilter:
+    def test_programs_without_rules_are_untouched(self):
+        log_filter = LogFilter([("other", LogRule(drop=["."]))])
+        lines = [b"a", b"a", b"b"]
+
+        assert log_filter.apply(b"program", lines) is lines
+
+    def test_the_first_matching_rule_applies(self):
+        first, second = LogRule(), LogRule()
+        log_filter = LogFilter([("h-*", first), ("*", second)])
+
+        assert log_filter.rule_for(b"h-services") is first
+        assert log_filter.rule_for(b"lms-services") is second
+
+    def test_drop_and_keep(self):
+        log_filter = LogFilter(
+            [("*", LogRule(drop=["^noise", "spam$"], keep=["important"]))]
+        )
+
+        lines = [b"noise", b"signal", b"more spam", b"important noise"]
+
+        assert log_filter.apply(b"program", lines) == [b"signal", b"important noise"]
+
+    def test_rate_limiting(self):
+        log_filter = LogFilter([("*", LogRule(rate=2, burst=3))])
+        lines = [b"line %d" % number for number in range(10)]
+
+        assert log_filter.apply(b"program", lines, now=0) == lines[:3]
+        # One second later we've earned two more lines
+        assert log_filter.apply(b"program", [b"more", b"again", b"x"], now=1) == [
+            b"... 7 lines suppressed ...",
+            b"more",
+            b"again",
+        ]
+
+    def test_collapsing(self):
+        log_filter = LogFilter([("*", LogRule(collapse=True))])
+
+        assert log_filter.apply(b"program", [b"a", b"a", b"a", b"b", b"b"]) == [
+            b"a",
+            b"... last line repeated 2 times ...",
+            b"b",
+        ]
+
+    def test_channels_are_separate(self):
+        log_filter = LogFilter([("*", LogRule(collapse=True))])
+
+        log_filter.apply(b"program", [b"a"])
+
+        assert log_filter.apply(b"program", [b"a"], err=True) == [b"a"]
+
+    def test_held_back_lines_are_reported_after_a_while(self):
+        log_filter = LogFilter([("*", LogRule(rate=1, burst=1, collapse=True))])
+        log_filter.apply(b"program", [b"a", b"b", b"c", b"c"], now=10)
+
+        assert log_filter.next_report() == 10 + LogFilter.REPORT_AFTER
+        assert not log_filter.reports(now=10.5)
+        assert log_filter.reports(now=10 + LogFilter.REPORT_AFTER) == [
+            (
+                b"program",
+                False,
+                [b"... last line repeated 1 time ...", b"... 2 lines suppressed ..."],
+            )
+        ]
+        assert log_filter.next_report() is None
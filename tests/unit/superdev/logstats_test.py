@@ -0,0 +1,60 @@
+import pytest
+
+from superdev.logstats import ListenerStats
+
+
+class TestListenerStats:
+    def test_it_counts_events_and_output(self, stats):
+        stats.event(b"PROCESS_LOG_STDOUT", 0.002)
+        stats.event(b"PROCESS_LOG_STDOUT", 0.001)
+        stats.event(b"TICK_5", 0.0001)
+        stats.output(b"h-dev", 100, 3)
+        stats.output(b"h-dev", 50, 1)
+
+        result = stats.as_dict()
+
+        assert result["event_types"] == {"PROCESS_LOG_STDOUT": 2, "TICK_5": 1}
+        assert result["processes"]["h-dev"] == {
+            "events": 2,
+            "bytes": 150,
+            "lines": 4,
+            "lines_per_second": 4.0,
+        }
+        assert result["lines_per_second"] == 4.0
+        assert result["max_event_seconds"] == 0.002
+        assert result["seconds"]["processing"] == pytest.approx(0.003, abs=0.001)
+
+    def test_line_rates_are_since_the_last_save(self, stats, monotonic):
+        stats.output(b"h-dev", 100, 10)
+        stats.as_dict()
+
+        monotonic.return_value = 13
+        stats.output(b"h-dev", 100, 4)
+
+        assert stats.as_dict()["processes"]["h-dev"]["lines_per_second"] == 2.0
+
+    def test_it_saves_and_loads(self, stats, tmp_path):
+        stats.output(b"h-dev", 100, 10)
+
+        stats.save()
+
+        assert ListenerStats.load(stats.filename)["processes"]["h-dev"]["lines"] == 10
+        assert [path.name for path in tmp_path.iterdir()] == ["stats.json"]
+
+    def test_next_save(self, stats):
+        assert stats.next_save() == 10 + stats.save_every
+
+        stats.filename = None
+        assert stats.next_save() is None
+
+    @pytest.fixture
+    def monotonic(self, patch):
+        monotonic = patch("superdev.logstats.monotonic")
+        monotonic.return_value = 10
+        return monotonic
+
+    @pytest.fixture
+    def stats(self, tmp_path, monotonic):  # pylint: disable=unused-argument
+        stats = ListenerStats(str(tmp_path / "stats.json"))
+        monotonic.return_value = 11
+        return stats
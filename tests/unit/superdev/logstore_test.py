@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from superdev.logstore import LogStore
+
+
+class TestLogStore:
+    def test_tail(self, store):
+        for number in range(100):
+            store.append("h-dev", [b"line %d" % number], now=1000 + number)
+        store.flush(force=True)
+
+        lines = store.tail("h-dev", 3)
+
+        assert lines == [
+            (1097.0, False, b"line 97"),
+            (1098.0, False, b"line 98"),
+            (1099.0, False, b"line 99"),
+        ]
+
+    def test_tail_only_reads_the_blocks_it_needs(self, store, patch):
+        for number in range(100):
+            store.append("h-dev", [b"line %d" % number], now=1000 + number)
+        store.flush(force=True)
+        read = patch("superdev.logstore.Block.read", side_effect=lambda block: [])
+
+        store.tail("h-dev", 3)
+
+        assert read.call_count == 1
+
+    def test_between_merges_processes_in_time_order(self, store):
+        store.append("h-dev", [b"one", b"two"], now=1000)
+        store.append("lms-web", [b"three"], err=True, now=1001)
+        store.append("h-dev", [b"four"], now=1002)
+        store.append("h-dev", [b"five"], now=1010)
+        store.flush(force=True)
+
+        assert list(store.between(1000, 1005)) == [
+            (1000.0, "h-dev", False, b"one"),
+            (1000.0, "h-dev", False, b"two"),
+            (1001.0, "lms-web", True, b"three"),
+            (1002.0, "h-dev", False, b"four"),
+        ]
+        assert list(store.between(1001, 1020, processes=["h-dev"])) == [
+            (1002.0, "h-dev", False, b"four"),
+            (1010.0, "h-dev", False, b"five"),
+        ]
+
+    def test_partial_blocks_are_flushed_after_a_while(self, store):
+        store.append("h-dev", [b"line"], now=1000)
+
+        assert store.next_flush() == 1000 + store.flush_after
+
+        store.flush(now=1000.5)
+        assert not store.blocks("h-dev")
+
+        store.flush(now=1000 + store.flush_after)
+        assert len(store.blocks("h-dev")) == 1
+        assert store.next_flush() is None
+
+    def test_segments_rotate_and_are_capped(self, tmp_path):
+        store = LogStore(
+            str(tmp_path), block_size=100, segment_size=200, max_bytes=1000
+        )
+
+        for number in range(2000):
+            store.append("h-dev", [os.urandom(30).hex().encode()], now=1000 + number)
+
+        segments = os.listdir(str(tmp_path / "h-dev"))
+        sizes = [
+            os.path.getsize(str(tmp_path / "h-dev" / name))
+            for name in segments
+            if name.endswith(".log.gz")
+        ]
+        assert len(sizes) > 1
+        assert sum(sizes) <= 1000 + 200
+        # The newest lines are still there
+        assert store.tail("h-dev", 1)[0][0] >= 1000 + 1990
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return LogStore(str(tmp_path), block_size=200)
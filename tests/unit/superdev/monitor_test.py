@@ -0,0 +1,234 @@
+import io
+import os
+import socket
+from collections import namedtuple
+from time import time
+
+import pytest
+
+from superdev.backoff import RestartBackoff
+from superdev.monitor import AMBER, GREEN, RED, DockerContainers, Monitor, PortProbe
+from superdev.resources import Usage
+from superdev.shell import run_sync
+from superdev.unix_http import HTTPError
+
+TerminalSize = namedtuple("TerminalSize", "columns lines")
+
+
+class TestPortProbe:
+    def test_load(self, tmp_path):
+        services = tmp_path / "nmap-services"
+        services.write_text(
+            "# A comment\n\nvia 9080/tcp 0.0 A comment\nh   5000/tcp\t0.0\nx 53/udp 0\n"
+        )
+
+        probes = PortProbe.load(str(services))
+
+        assert [(probe.name, probe.port) for probe in probes] == [
+            ("h", 5000),
+            ("via", 9080),
+        ]
+
+    def test_load_reads_our_config(self):
+        filename = os.path.join(
+            os.path.dirname(__file__), "../../../conf/nmap-services"
+        )
+
+        assert PortProbe.load(filename)
+
+    def test_probe(self):
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+
+        try:
+            assert run_sync(PortProbe("test", port).probe()) == PortProbe.OPEN
+        finally:
+            server.close()
+
+        assert run_sync(PortProbe("test", port).probe()) == PortProbe.CLOSED
+
+
+class TestDockerContainers:
+    def test_it_caches_its_answer(self, patch):
+        request = patch("superdev.monitor.request")
+        calls = []
+
+        async def fake_request(*args):
+            calls.append(args)
+            return b'[{"Names": ["/h_postgres_1"], "Image": "postgres"}]'
+
+        request.side_effect = fake_request
+        docker = DockerContainers(socket_path="docker.sock")
+
+        first = run_sync(docker.containers())
+        second = run_sync(docker.containers())
+
+        assert (
+            first
+            == second
+            == ([{"Names": ["/h_postgres_1"], "Image": "postgres"}], None)
+        )
+        assert len(calls) == 1
+
+    def test_it_reports_errors(self, tmp_path):
+        docker = DockerContainers(socket_path=str(tmp_path / "missing.sock"))
+
+        containers, error = run_sync(docker.containers())
+
+        assert containers is None
+        assert error.startswith("Cannot get containers from docker")
+
+
+class TestMonitor:
+    def test_lines(self, monitor, closed_port):
+        lines = run_sync(monitor.lines())
+
+        assert (f"{closed_port}/tcp".ljust(10) + "closed    client", RED) in lines
+        assert ("h_postgres_1   postgres   Up 2 hours", GREEN) in lines
+        assert ("h:h-dev                          RUNNING   pid 1", GREEN) in lines
+
+    def test_lines_shows_programs_being_held_back(self, monitor, tmp_path):
+        backoff = RestartBackoff()
+        for now in range(RestartBackoff.THRESHOLD):
+            backoff.state_changed("h:h-dev", "BACKOFF", now=time() + now)
+        backoff.state_changed("h:h-dev", "STOPPED")
+        monitor.held_file = str(tmp_path / "backoff.json")
+        backoff.save(monitor.held_file)
+        monitor.supervisor.state = "STOPPED"
+
+        lines = run_sync(monitor.lines())
+
+        assert lines[-1][0].startswith(
+            "h:h-dev                          HELD      failed 3 times"
+        )
+        assert lines[-1][1] == AMBER
+
+    def test_lines_shows_supervisor_errors(self, monitor):
+        async def process_info():
+            raise HTTPError(500, b"Internal Server Error")
+
+        monitor.supervisor.process_info = process_info
+
+        lines = run_sync(monitor.lines())
+
+        assert lines[-1] == ("Supervisor error: HTTP status 500", RED)
+
+    def test_lines_shows_what_each_program_uses(self, monitor):
+        class FakeResources:
+            @staticmethod
+            def update(processes):
+                assert processes[0]["name"] == "h-dev"
+                usage = Usage(processes=3, threads=9, rss=300 * 2**20)
+                usage.cpu_percent = 12.3
+                return {"h:h-dev": usage}, {"h": usage}
+
+            @staticmethod
+            def peak_rss(name):
+                return 400 * 2**20 if name == "h:h-dev" else 0
+
+        monitor.resources = FakeResources
+
+        lines = run_sync(monitor.lines())
+
+        assert lines[-2:] == [
+            ("h:h-dev" + " " * 26 + "    12    300M    400M      3        9", None),
+            ("h:*" + " " * 30 + "    12    300M      0M      3        9", None),
+        ]
+
+    def test_lines_shows_why_resources_are_missing(self, monitor):
+        class FakeResources:
+            @staticmethod
+            def update(processes):
+                raise FileNotFoundError("No /proc")
+
+        monitor.resources = FakeResources
+
+        lines = run_sync(monitor.lines())
+
+        assert lines[-1] == ("Cannot read the processes: No /proc", RED)
+
+    def test_render_only_redraws_changed_lines(self, monitor, output):
+        assert monitor.render([("a", None), ("b", None), ("c", None)]) == 3
+        output.truncate(0)
+        output.seek(0)
+
+        assert monitor.render([("a", None), ("B", None), ("c", None)]) == 1
+        assert output.getvalue() == "\x1b[2;1HB\x1b[K"
+
+        assert not monitor.render([("a", None), ("B", None), ("c", None)])
+
+    def test_render_clears_removed_lines(self, monitor, output):
+        monitor.render([("a", None), ("b", None), ("c", None)])
+        output.truncate(0)
+        output.seek(0)
+
+        assert monitor.render([("a", None)]) == 1
+        assert output.getvalue() == "\x1b[2;1H\x1b[J"
+
+    def test_render_truncates_lines_to_fit(self, monitor, output, terminal_size):
+        terminal_size.return_value = TerminalSize(5, 3)
+
+        monitor.render([("abcdefgh", None)] * 5)
+
+        assert "abcd\x1b[K" in output.getvalue()
+        assert "\x1b[3;1H" not in output.getvalue()
+
+    def test_render_starts_again_when_the_terminal_is_resized(
+        self, monitor, output, terminal_size
+    ):
+        monitor.render([("a", None)])
+        terminal_size.return_value = TerminalSize(100, 50)
+
+        assert monitor.render([("a", None)]) == 1
+        assert "\x1b[2J" in output.getvalue()
+
+    @pytest.fixture
+    def monitor(
+        self, output, terminal_size, closed_port
+    ):  # pylint: disable=unused-argument
+        class FakeSupervisor:
+            socket_path = "supervisor.sock"
+            state = "RUNNING"
+
+            @classmethod
+            async def process_info(cls):
+                return [
+                    {
+                        "group": "h",
+                        "name": "h-dev",
+                        "statename": cls.state,
+                        "description": "pid 1",
+                    }
+                ]
+
+        class FakeDocker:
+            @staticmethod
+            async def containers():
+                container = {
+                    "Names": ["/h_postgres_1"],
+                    "Image": "postgres",
+                    "Status": "Up 2 hours",
+                }
+                return [container], None
+
+        return Monitor(
+            [PortProbe("client", closed_port)], FakeSupervisor, FakeDocker, output
+        )
+
+    @pytest.fixture
+    def closed_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    @pytest.fixture
+    def output(self):
+        return io.StringIO()
+
+    @pytest.fixture
+    def terminal_size(self, patch):
+        get_terminal_size = patch("superdev.monitor.shutil.get_terminal_size")
+        get_terminal_size.return_value = TerminalSize(80, 24)
+        return get_terminal_size
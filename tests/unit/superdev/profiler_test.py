@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from superdev.profiler import ProgramTimeline, StartupProfile, StartupRecord
+
+
+class TestStartupRecord:
+    def test_it_records_times_from_the_start(self):
+        record = StartupRecord(started=100)
+
+        record.state_changed("h-dev", "STARTING", now=101.5)
+        record.port_opened("postgres", 5432, now=103)
+        record.port_opened("postgres", 5432, now=104)
+        record.mark_ready("h-dev", now=105)
+        record.mark_ready("h-dev", now=106)
+
+        assert record.transitions == [[1.5, "h-dev", "STARTING"]]
+        assert record.ports == {"postgres": {"port": 5432, "opened": 3}}
+        assert record.ready == {"h-dev": 5}
+
+    def test_it_round_trips_through_a_directory_of_runs(self, tmp_path):
+        first = StartupRecord(started=100, transitions=[[1, "h-dev", "STARTING"]])
+        second = StartupRecord(started=200, ready={"h-dev": 2})
+
+        first.save(str(tmp_path))
+        second.save(str(tmp_path))
+
+        runs = StartupRecord.runs(str(tmp_path))
+        assert runs == [str(tmp_path / "100.json"), str(tmp_path / "200.json")]
+        loaded = StartupRecord.load(runs[0])
+        assert loaded.started == 100
+        assert loaded.transitions == [[1, "h-dev", "STARTING"]]
+        assert StartupRecord.load(runs[1]).ready == {"h-dev": 2}
+
+    def test_runs_is_empty_without_a_directory(self, tmp_path):
+        assert StartupRecord.runs(str(tmp_path / "missing")) == []
+
+    def test_load_rejects_other_files(self, tmp_path):
+        filename = tmp_path / "100.json"
+        filename.write_text(json.dumps({"started": 100}))
+
+        with pytest.raises(ValueError):
+            StartupRecord.load(str(filename))
+
+    def test_load_ready(self, tmp_path):
+        filename = tmp_path / "ready.json"
+        filename.write_text(json.dumps({"h-dev": 123.5}))
+
+        assert StartupRecord.load_ready(str(filename)) == {"h-dev": 123.5}
+        assert StartupRecord.load_ready(str(tmp_path / "missing")) == {}
+
+
+class TestProgramTimeline:
+    def test_it_finds_time_lost_to_failed_starts(self):
+        program = ProgramTimeline(
+            "h-dev",
+            [
+                (1, "STARTING"),
+                (2, "BACKOFF"),
+                (4, "STARTING"),
+                (5, "BACKOFF"),
+                (8, "STARTING"),
+                (9, "RUNNING"),
+            ],
+            ready=12,
+        )
+
+        assert program.spawned == 1
+        assert program.restarts == 2
+        assert program.succeeded_at == 8
+        assert program.lost == 7
+        assert program.running == 9
+        assert program.ready == 12
+
+    def test_without_probes_it_is_ready_when_running(self):
+        program = ProgramTimeline("h-dev", [(1, "STARTING"), (2, "RUNNING")])
+
+        assert program.lost == 0
+        assert program.ready == 2
+
+    def test_programs_which_never_start(self):
+        program = ProgramTimeline("h-dev", [(1, "STARTING"), (2, "FATAL")])
+
+        assert program.running is None
+        assert program.ready is None
+
+
+class TestStartupProfile:
+    def test_critical_path(self, profile):
+        assert profile.critical_path() == ["h-services", "h-dev"]
+
+    def test_totals(self, profile):
+        assert profile.all_ready == 10
+        assert profile.lost_to_restarts == 3
+
+    def test_format(self, profile):
+        lines = profile.format(width=10)
+
+        assert lines[1].startswith("* h-dev ")
+        assert lines[1].endswith("   ~~~-===|")
+        assert lines[2].startswith("  h-devdata ")
+        assert lines[3].startswith("* h-services ")
+        assert "Critical path (*): h-services -> h-dev" in lines
+        assert "All ready after: 10.0s" in lines
+
+    def test_compare(self, profile, record):
+        record.ready["h-dev"] = 12
+        previous = StartupProfile(record, profile.after)
+
+        lines = profile.compare(previous)
+
+        assert "h-dev" in lines[0]
+        assert lines[0].endswith("(was 12.0s, -2.0s)")
+        assert lines[-1].endswith("(was 12.0s, -2.0s)")
+
+    def test_timeline(self, profile):
+        spans = profile.timeline().spans
+
+        dev = [
+            (span.name, span.start, span.end) for span in spans if span.lane == "h-dev"
+        ]
+        assert dev[0] == ("STARTING", 3, 4)
+        assert dev[-1] == ("ready", 10, 10)
+
+    @pytest.fixture
+    def record(self):
+        return StartupRecord(
+            started=0,
+            transitions=[
+                [0.5, "h-services", "STARTING"],
+                [1.5, "h-services", "RUNNING"],
+                [3, "h-dev", "STARTING"],
+                [4, "h-dev", "BACKOFF"],
+                [6, "h-dev", "STARTING"],
+                [7, "h-dev", "RUNNING"],
+                [4, "h-devdata", "STARTING"],
+                [5, "h-devdata", "RUNNING"],
+            ],
+            ready={"h-services": 2.5, "h-dev": 10},
+        )
+
+    @pytest.fixture
+    def profile(self, record):
+        return StartupProfile(
+            record, {"h-dev": ["h-services"], "h-devdata": ["h-services"]}
+        )
@@ -0,0 +1,157 @@
+from configparser import ConfigParser
+
+import pytest
+
+from superdev.profiles import StackProfile, SupervisorConfig
+from superdev.startup import StartupPlan
+
+REQUIRES = {"h": [], "lms": ["h"], "via": []}
+SERVICES = {
+    "h": ["h-services", "h-dev"],
+    "lms": ["lms-services", "lms-web", "lms-assets"],
+    "via": ["via"],
+}
+AFTER = {"h-dev": ["h-services"], "lms-web": ["lms-services"]}
+
+
+class TestStackProfile:
+    @pytest.mark.parametrize(
+        "profile,projects,programs",
+        (
+            (StackProfile("via", ["via"]), ["via"], ["via"]),
+            (
+                StackProfile("h-api", programs=["h-dev"]),
+                ["h"],
+                ["h-dev", "h-services"],
+            ),
+            (
+                StackProfile("lms-web", programs=["lms-web"]),
+                ["h", "lms"],
+                ["h-dev", "h-services", "lms-services", "lms-web"],
+            ),
+            (
+                StackProfile("all", projects=None),
+                ["h", "lms", "via"],
+                [
+                    "h-dev",
+                    "h-services",
+                    "lms-assets",
+                    "lms-services",
+                    "lms-web",
+                    "via",
+                ],
+            ),
+        ),
+    )
+    def test_resolve(self, profile, projects, programs):
+        assert profile.resolve(REQUIRES, SERVICES, AFTER) == (projects, programs)
+
+    def test_resolve_follows_long_chains(self):
+        requires = {"a": ["b"], "b": ["c"], "c": ["d"], "d": []}
+        services = {"a": ["a-web"], "d": ["d-web"]}
+
+        assert StackProfile("a", ["a"]).resolve(requires, services, {}) == (
+            ["a", "b", "c", "d"],
+            ["a-web", "d-web"],
+        )
+
+    @pytest.mark.parametrize(
+        "profile",
+        (StackProfile("bad", ["missing"]), StackProfile("bad", programs=["missing"])),
+    )
+    def test_resolve_rejects_unknown_names(self, profile):
+        with pytest.raises(ValueError):
+            profile.resolve(REQUIRES, SERVICES, AFTER)
+
+    def test_load(self, tmp_path):
+        profiles_file = tmp_path / "profiles.conf"
+        profiles_file.write_text("[h-api]\nprojects = via\nprograms = h-dev\n")
+
+        profile = StackProfile.load(str(profiles_file), "h-api")
+
+        assert profile.projects == ["via"]
+        assert profile.programs == ["h-dev"]
+
+    def test_load_all_needs_no_file(self, tmp_path):
+        assert StackProfile.load(str(tmp_path / "missing"), "all").projects is None
+
+    def test_load_rejects_unknown_profiles(self, tmp_path):
+        profiles_file = tmp_path / "profiles.conf"
+        profiles_file.write_text("[via]\nprojects = via\n")
+
+        with pytest.raises(ValueError) as error:
+            StackProfile.load(str(profiles_file), "missing")
+
+        assert "all, via" in str(error.value)
+
+    def test_our_profiles_resolve(self):
+        config = SupervisorConfig("conf/supervisord.conf", "conf")
+        parser = ConfigParser()
+        parser.read("conf/profiles.conf")
+
+        for name in parser.sections():
+            _, programs = StackProfile.load("conf/profiles.conf", name).resolve(
+                {project: [] for project in config.services},
+                config.services,
+                {},
+            )
+            assert programs
+
+    @pytest.mark.parametrize("name", ["all", "h", "lms", "via3"])
+    def test_our_profiles_share_the_backing_services(self, name):
+        config = SupervisorConfig("conf/supervisord.conf", "conf")
+
+        projects, programs = StackProfile.load("conf/profiles.conf", name).resolve(
+            {project: [] for project in config.services},
+            config.services,
+            StartupPlan.load("conf/startup.conf").after,
+        )
+
+        assert "services" in projects
+        assert [program for program in programs if "services" in program] == [
+            "services"
+        ]
+
+
+class TestSupervisorConfig:
+    def test_services(self, config):
+        assert config.services == {"h": ["h-dev", "h-services"], "via": ["via"]}
+
+    def test_write(self, config, tmp_path):
+        filename = tmp_path / "out.conf"
+
+        config.write(str(filename), ["h-services"], start_programs="start")
+
+        written = ConfigParser(interpolation=None)
+        written.optionxform = str
+        written.read(str(filename))
+        assert written.sections() == [
+            "supervisord",
+            "program:start",
+            "group:h",
+            "program:h-services",
+        ]
+        assert written["program:start"]["command"] == "start.py --only h-services"
+        assert written["group:h"]["programs"] == "h-services"
+        assert written["program:h-services"]["stopSignal"] == "INT"
+
+    @pytest.fixture
+    def config(self, tmp_path):
+        (tmp_path / "supervisord.conf").write_text(
+            "[supervisord]\nnodaemon=true\n\n"
+            "[program:start]\ncommand=start.py\n\n"
+            "[include]\nfiles = */services.conf\n"
+        )
+        for project, text in (
+            (
+                "h",
+                "[group:h]\nprograms=h-dev,h-services\n\n"
+                "[program:h-dev]\ncommand=make dev\n\n"
+                "[program:h-services]\ncommand=tox\nstopSignal=INT\n",
+            ),
+            ("via", "[program:via]\ncommand=make dev\n"),
+        ):
+            (tmp_path / project).mkdir()
+            (tmp_path / project / "services.conf").write_text(text)
+
+        return SupervisorConfig(str(tmp_path / "supervisord.conf"), str(tmp_path))
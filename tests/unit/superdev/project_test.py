@@ -0,0 +1,201 @@
+import os
+import pathlib
+import shutil
+
+import pytest
+
+from superdev.fingerprint import ToxFingerprint
+from superdev.project import Project, ProjectManager
+from superdev.scheduler import StageScheduler
+from superdev.shell import RepoState, ShellException, Tox, run_sync
+
+
+class TestProjectManager:
+    def test_project_data(self):
+        project_data = ProjectManager.project_data()
+
+        assert project_data["h"]["git_url"] == "git@github.com:hypothesis/h.git"
+        # It's only read once
+        assert ProjectManager.project_data() is project_data
+
+    def test_it_uses_project_data_by_default(self, tmp_path):
+        manager = ProjectManager(str(tmp_path))
+
+        assert sorted(manager.projects) == sorted(ProjectManager.project_data())
+
+    def test_it_can_be_given_project_data(self, tmp_path):
+        manager = ProjectManager(
+            str(tmp_path), project_data={"via": {"git_url": "via.git"}}
+        )
+
+        assert list(manager.projects) == ["via"]
+        assert manager.projects["via"].path == str(tmp_path / "via")
+
+    def test_it_can_be_given_no_projects(self, tmp_path):
+        assert not ProjectManager(str(tmp_path), project_data={}).projects
+
+    @pytest.mark.parametrize(
+        "ahead,behind,expected",
+        ((0, 0, "(master)"), (2, 3, "(master +2/-3)"), (2, None, "(master)")),
+    )
+    def test_print_results_shows_tracking(self, capsys, ahead, behind, expected):
+        state = RepoState("master", clean=True, ahead=ahead, behind=behind)
+
+        ProjectManager._print_results([("h", (True, "Updated"), state)])
+
+        assert f"h         {expected} " in capsys.readouterr().out
+
+
+class TestToxEnvs:
+    def test_changes_made_during_a_build_are_not_missed(self, tmp_path, monkeypatch):
+        project = _make_project(Project(str(tmp_path), "h", "h.git"))
+        path = pathlib.Path(project.path)
+        shutil.rmtree(str(path / ".tox"))
+
+        async def run_async(base_dir, tox_env, options=None):
+            os.makedirs(os.path.join(base_dir, ".tox", tox_env))
+            (path / "requirements.txt").write_text("edited meanwhile")
+
+        monkeypatch.setattr(Tox, "run_async", run_async)
+
+        assert run_sync(project._init_tox_env("dev"))
+        assert not ToxFingerprint(project.path, "dev").is_current()
+
+
+class TestWatching:
+    def test_input_state_changes_with_the_inputs(self, project):
+        state = project.input_state()
+        assert project.input_state() == state
+
+        pathlib.Path(project.path, "requirements.txt").write_text("changed and longer")
+        assert project.input_state() != state
+
+    def test_input_state_changes_with_the_commit(self, project):
+        state = project.input_state()
+
+        pathlib.Path(project.path, ".git/refs/heads/master").write_text("b" * 40)
+
+        assert project.input_state() != state
+
+    def test_it_rebuilds_and_restarts_only_what_changed(self, manager, tox_builds):
+        supervisor = FakeSupervisor({"h-dev": "RUNNING", "h-devdata": "EXITED"})
+        states = {
+            name: project.input_state() for name, project in manager.projects.items()
+        }
+        pathlib.Path(manager.projects["h"].path, "tox.ini").write_text("[tox]\nchanged")
+
+        changed = run_sync(
+            manager._refresh_changed(
+                states,
+                StageScheduler(manager.stage_limits),
+                supervisor,
+                {"h": ["h-dev", "h-devdata"]},
+            )
+        )
+
+        assert changed == {"h": ["dev"]}
+        assert tox_builds == ["h"]
+        assert supervisor.calls == [
+            ("supervisor.stopProcess", "h:h-dev", True),
+            ("supervisor.startProcess", "h:h-dev", False),
+        ]
+
+    def test_it_does_not_rebuild_for_other_changes(self, manager, tox_builds):
+        states = {
+            name: project.input_state() for name, project in manager.projects.items()
+        }
+        pathlib.Path(manager.projects["h"].path, ".git/refs/heads/master").write_text(
+            "b" * 40
+        )
+
+        changed = run_sync(
+            manager._refresh_changed(
+                states, StageScheduler(manager.stage_limits), None, {}
+            )
+        )
+
+        assert changed == {"h": []}
+        assert not tox_builds
+
+    def test_it_tries_failed_rebuilds_again(self, manager, monkeypatch):
+        builds = []
+
+        async def run_async(base_dir, tox_env, options=None):
+            builds.append(os.path.basename(base_dir))
+            if len(builds) == 1:
+                raise ShellException("Could not reach pip")
+
+        monkeypatch.setattr(Tox, "run_async", run_async)
+        states = {
+            name: project.input_state() for name, project in manager.projects.items()
+        }
+        pathlib.Path(manager.projects["h"].path, "tox.ini").write_text("[tox]\nchanged")
+        scheduler = StageScheduler(manager.stage_limits)
+
+        for _ in range(3):
+            run_sync(manager._refresh_changed(states, scheduler, None, {}))
+
+        assert builds == ["h", "h"]
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        manager = ProjectManager(
+            str(tmp_path),
+            project_data={
+                name: {"git_url": f"{name}.git", "tox_init": ["dev"]}
+                for name in ("h", "via")
+            },
+        )
+        for project in manager.projects.values():
+            _make_project(project)
+
+        return manager
+
+    @pytest.fixture
+    def project(self, tmp_path):
+        return _make_project(Project(str(tmp_path), "h", "h.git", tox_init=["dev"]))
+
+    @pytest.fixture
+    def tox_builds(self, monkeypatch):
+        builds = []
+
+        async def run_async(base_dir, tox_env, options=None):
+            builds.append(os.path.basename(base_dir))
+            os.makedirs(os.path.join(base_dir, ".tox", tox_env), exist_ok=True)
+
+        monkeypatch.setattr(Tox, "run_async", run_async)
+        return builds
+
+
+class FakeSupervisor:
+    def __init__(self, states):
+        self.states = states
+        self.calls = []
+
+    async def process_info(self):
+        return [
+            {"name": name, "group": "h", "statename": state}
+            for name, state in self.states.items()
+        ]
+
+    async def call(self, method, *params):
+        self.calls.append((method, *params))
+        return True
+
+    @staticmethod
+    def full_name(info):
+        return f"{info['group']}:{info['name']}"
+
+
+def _make_project(project):
+    """Make a checked out, fully prepared project on disk."""
+    path = pathlib.Path(project.path)
+    (path / ".git" / "refs" / "heads").mkdir(parents=True)
+    (path / ".git" / "HEAD").write_text("ref: refs/heads/master\n")
+    (path / ".git" / "refs" / "heads" / "master").write_text("a" * 40)
+    (path / "tox.ini").write_text("[tox]\n")
+    (path / "requirements.txt").write_text("pytest\n")
+    (path / ".tox" / "dev").mkdir(parents=True)
+    ToxFingerprint(project.path, "dev").save()
+
+    return project
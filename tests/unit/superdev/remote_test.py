@@ -0,0 +1,49 @@
+import socket
+
+import pytest
+
+from superdev.remote import is_reachable, parse_location, reachable_remotes
+from superdev.shell import run_sync
+
+
+class TestParseLocation:
+    @pytest.mark.parametrize(
+        "git_url,location",
+        [
+            ("git@github.com:hypothesis/h.git", ("github.com", 22)),
+            ("ssh://git@example.com:2222/h.git", ("example.com", 2222)),
+            ("https://github.com/hypothesis/h.git", ("github.com", 443)),
+            ("git://example.com/h.git", ("example.com", 9418)),
+            ("file:///srv/h.git", (None, "/srv/h.git")),
+            ("/srv/h.git", (None, "/srv/h.git")),
+        ],
+    )
+    def test_it(self, git_url, location):
+        assert parse_location(git_url) == location
+
+
+class TestIsReachable:
+    def test_local_remotes(self, git_remote, tmp_path):
+        assert run_sync(is_reachable(git_remote))
+        assert not run_sync(is_reachable(str(tmp_path / "missing.git")))
+
+    def test_network_remotes(self):
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+
+        try:
+            assert run_sync(is_reachable(f"ssh://127.0.0.1:{port}/h.git"))
+        finally:
+            server.close()
+
+        assert not run_sync(is_reachable(f"ssh://127.0.0.1:{port}/h.git"))
+
+    def test_reachable_remotes(self, git_remote, tmp_path):
+        missing = str(tmp_path / "missing.git")
+
+        assert run_sync(reachable_remotes([git_remote, missing])) == {
+            git_remote: True,
+            missing: False,
+        }
@@ -0,0 +1,152 @@
+import json
+import os
+
+import pytest
+
+from superdev.resources import ProcessTable, ResourceSampler, Usage
+from superdev.shell import run_sync
+
+
+class TestProcessTable:
+    def test_tree(self, proc_dir):
+        table = ProcessTable(str(proc_dir))
+
+        assert sorted(table.tree(10)) == [10, 11, 12]
+        assert table.tree(99) == []
+
+    def test_usage(self, proc_dir):
+        usage = ProcessTable(str(proc_dir)).usage(10, pss=True)
+
+        assert usage.processes == 3
+        assert usage.threads == 6
+        assert usage.rss == 30 * ProcessTable.PAGE_SIZE
+        assert usage.pss == 3 * 1024
+        assert usage.cpu_time == pytest.approx(
+            (4 + 40 + 400) / ProcessTable.CLOCK_TICKS
+        )
+
+    def test_usage_without_pss(self, proc_dir):
+        assert ProcessTable(str(proc_dir)).usage(10).pss is None
+
+    def test_it_reads_our_own_process(self):
+        usage = ProcessTable().usage(os.getpid())
+
+        assert usage.processes >= 1
+        assert usage.rss
+
+
+class TestResourceSampler:
+    def test_update(self, sampler):
+        programs, groups = sampler.update(PROCESSES, now=100)
+
+        assert sorted(programs) == ["h:h-dev", "via"]
+        assert programs["h:h-dev"].processes == 3
+        assert groups["h"].processes == 3
+        assert programs["h:h-dev"].cpu_percent is None
+
+    def test_cpu_percent_is_from_the_last_sample(self, sampler, proc_dir):
+        sampler.update(PROCESSES, now=100)
+        _write_stat(proc_dir, 20, 1, ticks=1 + ProcessTable.CLOCK_TICKS)
+
+        programs, groups = sampler.update(PROCESSES, now=102)
+
+        # Four seconds of CPU in two seconds is two cores
+        assert programs["via"].cpu_percent == pytest.approx(200)
+        assert groups["via"].cpu_percent == pytest.approx(200)
+        assert programs["h:h-dev"].cpu_percent == 0
+
+    def test_restarted_programs_start_afresh(self, sampler):
+        sampler.update(PROCESSES, now=100)
+        restarted = [dict(PROCESSES[0], pid=11), PROCESSES[1]]
+
+        programs, _ = sampler.update(restarted, now=102)
+
+        assert programs["h:h-dev"].processes == 2
+        assert programs["h:h-dev"].cpu_percent is None
+
+    def test_history(self, sampler, proc_dir):
+        sampler.update(PROCESSES, now=100)
+        _write_stat(proc_dir, 20, 1, rss=1000)
+        sampler.update(PROCESSES, now=101)
+        _write_stat(proc_dir, 20, 1, rss=1)
+
+        sampler.update(PROCESSES, now=102)
+
+        assert sampler.peak_rss("via") == 1000 * ProcessTable.PAGE_SIZE
+        assert sampler.mean_cpu_percent("via") == 0
+        assert sampler.mean_cpu_percent("missing") is None
+
+    def test_sample_asks_supervisor_for_the_pids(self, sampler):
+        programs, _ = run_sync(sampler.sample())
+
+        assert sorted(programs) == ["h:h-dev", "via"]
+
+    def test_write(self, sampler, tmp_path):
+        sampler.update(PROCESSES, now=100)
+        filename = tmp_path / "resources.json"
+
+        sampler.write(str(filename))
+
+        snapshot = json.loads(filename.read_text())
+        assert sorted(snapshot["programs"]) == ["h:h-dev", "via"]
+        assert snapshot["groups"]["h"]["processes"] == 3
+        assert snapshot["groups"]["h"]["peak_rss"] == 30 * ProcessTable.PAGE_SIZE
+        assert snapshot["programs"]["via"]["mean_cpu_percent"] is None
+
+    @pytest.fixture
+    def sampler(self, proc_dir):
+        class FakeSupervisor:
+            @staticmethod
+            async def process_info():
+                return PROCESSES
+
+        return ResourceSampler(FakeSupervisor, proc_dir=str(proc_dir))
+
+
+class TestUsage:
+    def test_add(self):
+        total = Usage(pss=None).add(Usage(1, 2, 3, 4, 5.0)).add(Usage(1, 1, 1, None))
+
+        assert total.as_dict() == {
+            "processes": 2,
+            "threads": 3,
+            "rss": 4,
+            "pss": 4,
+            "cpu_time": 5.0,
+            "cpu_percent": None,
+        }
+
+
+PROCESSES = [
+    {"group": "h", "name": "h-dev", "pid": 10},
+    {"group": "h", "name": "h-devdata", "pid": 0},
+    {"group": "via", "name": "via", "pid": 20},
+]
+
+
+@pytest.fixture
+def proc_dir(tmp_path):
+    proc_dir = tmp_path / "proc"
+    proc_dir.mkdir()
+    (proc_dir / "self").mkdir()
+
+    # h-dev (10) runs 11, which runs 12. via (20) is on its own
+    for pid, ppid, ticks in ((10, 1, 1), (11, 10, 10), (12, 11, 100), (20, 1, 1)):
+        _write_stat(proc_dir, pid, ppid, ticks=ticks)
+        (proc_dir / str(pid) / "smaps_rollup").write_text(
+            "00400000-ffffffff ---p 00000000 00:00 0   [rollup]\n"
+            "Rss:                  40 kB\n"
+            "Pss:                   1 kB\n"
+        )
+
+    return proc_dir
+
+
+def _write_stat(proc_dir, pid, ppid, ticks=1, rss=10):
+    # Enough of `man 5 proc` for us: the name (with awkward characters),
+    # ppid, utime, stime, cutime, cstime, num_threads and rss
+    fields = ["S", ppid] + [0] * 9 + [ticks] * 4 + [0] * 2 + [2, 0, 0, 0, rss]
+    (proc_dir / str(pid)).mkdir(exist_ok=True)
+    (proc_dir / str(pid) / "stat").write_text(
+        f"{pid} (make) dev) " + " ".join(str(field) for field in fields) + " 0 0\n"
+    )
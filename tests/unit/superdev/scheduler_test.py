@@ -0,0 +1,34 @@
+import asyncio
+
+from superdev.scheduler import StageScheduler
+from superdev.shell import run_sync
+
+
+class TestStageScheduler:
+    def test_it_limits_concurrency_per_stage(self):
+        scheduler = StageScheduler({"slow": 2, "fast": 5})
+        running = {"slow": 0, "fast": 0}
+        peak = {"slow": 0, "fast": 0}
+
+        async def task(stage):
+            running[stage] += 1
+            peak[stage] = max(peak[stage], running[stage])
+            await asyncio.sleep(0.01)
+            running[stage] -= 1
+
+        async def run_all():
+            await asyncio.gather(
+                *(scheduler.run(stage, task, stage) for stage in ["slow", "fast"] * 10)
+            )
+
+        run_sync(run_all())
+
+        assert peak == {"slow": 2, "fast": 5}
+
+    def test_it_returns_results(self):
+        scheduler = StageScheduler({})
+
+        async def task(value):
+            return value * 2
+
+        assert run_sync(scheduler.run("any", task, 4)) == 8
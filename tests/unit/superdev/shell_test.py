@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+import pytest
+
+from superdev.shell import Git, RepoState, Shell, ShellException, run_sync
+
+
+class TestShell:
+    def test_it_runs_in_the_given_directory(self, tmp_path):
+        output = Shell.run_in_dir(str(tmp_path), ["pwd"])
+
+        assert output.decode("utf-8").strip() == os.path.realpath(str(tmp_path))
+
+    def test_it_does_not_change_our_directory(self, tmp_path):
+        cwd = os.getcwd()
+
+        Shell.run_in_dir(str(tmp_path), ["pwd"])
+
+        assert os.getcwd() == cwd
+
+    def test_it_passes_arguments_without_a_shell(self, tmp_path):
+        output = Shell.run_in_dir(str(tmp_path), ["echo", "$HOME; ls"])
+
+        assert output == b"$HOME; ls\n"
+
+    def test_it_runs_commands_concurrently(self, tmp_path):
+        async def run_many():
+            return await asyncio.gather(
+                *(Shell.run_async(str(tmp_path), ["echo", str(i)]) for i in range(20))
+            )
+
+        outputs = run_sync(run_many())
+
+        assert outputs == [f"{i}\n".encode("utf-8") for i in range(20)]
+
+    @pytest.mark.parametrize("command", [["false"], ["not-a-real-command-xyz"]])
+    def test_it_raises_for_failures(self, tmp_path, command):
+        with pytest.raises(ShellException):
+            Shell.run_in_dir(str(tmp_path), command)
+
+
+class TestGit:
+    def test_it_reads_state(self, tmp_path):
+        Shell.run_in_dir(str(tmp_path), ["git", "init", "-q", "-b", "main"])
+
+        assert Git.is_clean(str(tmp_path))
+
+        (tmp_path / "file.txt").write_text("dirty")
+
+        assert not Git.is_clean(str(tmp_path))
+
+
+class TestRepoState:
+    def test_from_porcelain(self):
+        state = RepoState.from_porcelain(
+            "# branch.oid 1234\n"
+            "# branch.head feature\n"
+            "# branch.upstream origin/feature\n"
+            "# branch.ab +2 -3\n"
+            "? untracked.txt\n"
+        )
+
+        assert state.branch == "feature"
+        assert state.upstream == "origin/feature"
+        assert (state.ahead, state.behind) == (2, 3)
+        assert not state.clean
+
+    def test_from_porcelain_with_a_clean_detached_head(self):
+        state = RepoState.from_porcelain(
+            "# branch.oid 1234\n# branch.head (detached)\n"
+        )
+
+        assert state.branch == RepoState.DETACHED
+        assert state.clean
+        assert (state.ahead, state.behind) == (0, 0)
+
+    def test_probe(self, git_remote, tmp_path):
+        Git.clone(str(tmp_path), git_remote)
+        checkout = str(tmp_path / "remote")
+        Shell.run_in_dir(checkout, ["git", "reset", "-q", "--hard", "HEAD~1"])
+
+        state = RepoState.probe(checkout)
+
+        assert state.branch == "master"
+        assert state.clean
+        assert state.behind == 1
+        assert RepoState.read_branch(checkout) == "master"
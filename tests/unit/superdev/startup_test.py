@@ -0,0 +1,209 @@
+import asyncio
+import json
+import socket
+import xmlrpc.client
+
+import pytest
+
+from superdev.shell import run_sync
+from superdev.startup import (
+    HTTPProbe,
+    LogProbe,
+    Orchestrator,
+    StartupPlan,
+    TCPProbe,
+    parse_probe,
+)
+
+
+class FakeSupervisor:
+    """Programs start when asked, and are RUNNING on the next look."""
+
+    def __init__(self, running=(), stopped=()):
+        self.states = {name: "RUNNING" for name in running}
+        self.states.update({name: "STOPPED" for name in stopped})
+        self.started = []
+        self.output = {}
+
+    async def process_info(self):
+        return [
+            {
+                "name": name,
+                "group": name.split("-")[0],
+                "statename": state,
+                "exitstatus": 0,
+            }
+            for name, state in self.states.items()
+        ]
+
+    async def call(self, method, *params):
+        if method == "supervisor.startProcess":
+            name = params[0].split(":")[-1]
+            if self.states.get(name) == "RUNNING":
+                raise xmlrpc.client.Fault(Orchestrator.ALREADY_STARTED, "ALREADY")
+
+            self.started.append(name)
+            self.states[name] = "RUNNING"
+            return True
+
+        if method == "supervisor.tailProcessStdoutLog":
+            name, offset, _ = params
+            data = self.output.get(name.split(":")[-1], "")
+            return [data[offset:], len(data), False]
+
+        raise xmlrpc.client.Fault(10, "BAD_NAME")
+
+
+class TestParseProbe:
+    @pytest.mark.parametrize(
+        "spec,probe_class,description",
+        [
+            ("tcp:5432", TCPProbe, "tcp:127.0.0.1:5432"),
+            ("tcp:example.com:80", TCPProbe, "tcp:example.com:80"),
+            ("http://localhost:9200/", HTTPProbe, "http://localhost:9200/"),
+            ("log:Listening at: .*", LogProbe, "log:Listening at: .*"),
+        ],
+    )
+    def test_it(self, spec, probe_class, description):
+        probe = parse_probe(spec)
+
+        assert isinstance(probe, probe_class)
+        assert repr(probe) == description
+
+    @pytest.mark.parametrize("spec", ("tcp:lots", "log:[unclosed", "telepathy:5"))
+    def test_it_rejects_bad_probes(self, spec):
+        with pytest.raises(ValueError):
+            parse_probe(spec)
+
+
+class TestHTTPProbe:
+    @pytest.mark.parametrize("status,ready", ((200, True), (404, True), (503, False)))
+    def test_it(self, status, ready):
+        async def handle(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.0 %d Whatever\r\n\r\n" % status)
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                probe = HTTPProbe(f"http://127.0.0.1:{port}/status?full=1")
+                return await probe.check(Orchestrator(None, None), "program")
+            finally:
+                server.close()
+
+        assert run_sync(main()) == ready
+
+    def test_it_fails_if_nothing_is_listening(self, closed_port):
+        probe = HTTPProbe(f"http://127.0.0.1:{closed_port}/")
+
+        assert not run_sync(probe.check(Orchestrator(None, None), "program"))
+
+
+class TestStartupPlan:
+    def test_load(self, tmp_path):
+        startup_file = tmp_path / "startup.conf"
+        startup_file.write_text(
+            "[h-services]\nready =\n    tcp:5432\n    log:ready\n\n"
+            "[h-dev]\nafter = h-services other\n"
+        )
+
+        plan = StartupPlan.load(str(startup_file))
+
+        assert plan.programs == ["h-dev", "h-services", "other"]
+        assert plan.after["h-dev"] == ["h-services", "other"]
+        assert [repr(probe) for probe in plan.ready["h-services"]] == [
+            "tcp:127.0.0.1:5432",
+            "log:ready",
+        ]
+        assert plan.ready["other"] == []
+
+    def test_load_reads_our_config(self):
+        assert StartupPlan.load("conf/startup.conf").programs
+
+    def test_it_rejects_loops(self):
+        with pytest.raises(ValueError) as error:
+            StartupPlan({"a": ["b"], "b": ["c"], "c": ["a"]}, {})
+
+        assert "a -> b -> c -> a" in str(error.value)
+
+    def test_only(self):
+        plan = StartupPlan({"h-dev": ["h-services"], "h-devdata": ["h-services"]}, {})
+
+        assert plan.only(["h-dev", "h-services", "via"]).programs == [
+            "h-dev",
+            "h-services",
+        ]
+
+    def test_only_rejects_missing_dependencies(self):
+        plan = StartupPlan({"h-dev": ["h-services"]}, {})
+
+        with pytest.raises(ValueError):
+            plan.only(["h-dev"])
+
+
+class TestOrchestrator:
+    def test_it_starts_programs_once_what_they_need_is_ready(self):
+        supervisor = FakeSupervisor(["h-services"], ["h-dev", "h-devdata"])
+        supervisor.output["h-services"] = "Booting\nAll services up\n"
+        plan = StartupPlan(
+            {"h-dev": ["h-services"], "h-devdata": ["h-dev"]},
+            {"h-services": [LogProbe("services up$")]},
+        )
+        orchestrator = Orchestrator(plan, supervisor, interval=0.01)
+
+        assert run_sync(orchestrator.run(timeout=5))
+
+        assert supervisor.started == ["h-dev", "h-devdata"]
+        assert (
+            orchestrator.ready_at["h-services"]
+            <= orchestrator.ready_at["h-dev"]
+            <= orchestrator.ready_at["h-devdata"]
+        )
+
+    def test_it_waits_for_probes(self, closed_port):
+        supervisor = FakeSupervisor(["h-services"], ["h-dev"])
+        plan = StartupPlan(
+            {"h-dev": ["h-services"]},
+            {"h-services": [TCPProbe("127.0.0.1", closed_port)]},
+        )
+        orchestrator = Orchestrator(plan, supervisor, interval=0.01)
+
+        assert not run_sync(orchestrator.run(timeout=0.2))
+
+        assert not supervisor.started
+        assert "h-services" not in orchestrator.ready_at
+
+    def test_it_copes_with_programs_which_are_already_running(self):
+        supervisor = FakeSupervisor(["h-services", "h-dev"])
+        plan = StartupPlan({"h-dev": ["h-services"]}, {})
+
+        assert run_sync(Orchestrator(plan, supervisor, interval=0.01).run(timeout=5))
+
+    def test_it_records_when_programs_are_ready(self, tmp_path):
+        ready_file = tmp_path / "ready.json"
+        supervisor = FakeSupervisor(["h-services"], ["h-dev"])
+        plan = StartupPlan({"h-dev": ["h-services"]}, {})
+        orchestrator = Orchestrator(
+            plan, supervisor, interval=0.01, ready_file=str(ready_file)
+        )
+
+        assert run_sync(orchestrator.run(timeout=5))
+
+        ready = json.loads(ready_file.read_text())
+        assert ready["h-services"] <= ready["h-dev"]
+
+    def test_it_raises_for_unknown_programs(self):
+        plan = StartupPlan({"h-dev": ["h-services"]}, {})
+        orchestrator = Orchestrator(plan, FakeSupervisor(["h-services"]), interval=0.01)
+
+        with pytest.raises(ValueError):
+            run_sync(orchestrator.run(timeout=5))
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,65 @@
+import asyncio
+import xmlrpc.client
+
+import pytest
+
+from superdev.shell import run_sync
+from superdev.supervisor import Supervisor
+
+
+class TestSupervisor:
+    def test_call(self, serve):
+        calls = []
+
+        def respond(method, params):
+            calls.append((method, params))
+            return xmlrpc.client.dumps(("RUNNING",), methodresponse=True)
+
+        assert serve(respond, "supervisor.getState", 1) == "RUNNING"
+        assert calls == [("supervisor.getState", (1,))]
+
+    def test_call_raises_faults(self, serve):
+        fault = xmlrpc.client.Fault(10, "BAD_NAME: nope")
+
+        with pytest.raises(xmlrpc.client.Fault):
+            serve(lambda *_: xmlrpc.client.dumps(fault), "supervisor.startProcess")
+
+    def test_call_raises_for_bad_responses(self, serve):
+        with pytest.raises(OSError):
+            serve(lambda *_: "not xml", "supervisor.getState")
+
+    @pytest.mark.parametrize(
+        "info,name",
+        [
+            ({"group": "h", "name": "h-dev"}, "h:h-dev"),
+            ({"group": "via", "name": "via"}, "via"),
+        ],
+    )
+    def test_full_name(self, info, name):
+        assert Supervisor.full_name(info) == name
+
+    @pytest.fixture
+    def serve(self, tmp_path):
+        """Call supervisor with a fake server answering using `respond`."""
+        socket_path = str(tmp_path / "supervisor.sock")
+
+        def serve(respond, method, *params):
+            async def handle(reader, writer):
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+                params, method = xmlrpc.client.loads(await reader.readexactly(length))
+                body = respond(method, params).encode("utf-8")
+
+                writer.write(b"HTTP/1.0 200 OK\r\n\r\n" + body)
+                writer.close()
+
+            async def main():
+                server = await asyncio.start_unix_server(handle, socket_path)
+                try:
+                    return await Supervisor(socket_path).call(method, *params)
+                finally:
+                    server.close()
+
+            return run_sync(main())
+
+        return serve
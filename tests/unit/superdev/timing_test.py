@@ -0,0 +1,57 @@
+import pytest
+
+from superdev.shell import Shell, run_sync
+from superdev.timing import Timeline
+
+
+class TestTimeline:
+    def test_it_records_subprocesses_in_the_open_lane(self, timeline, tmp_path):
+        async def stage():
+            with timeline.span("build", "h"):
+                await Shell.run_async(str(tmp_path), ["echo", "hello"])
+
+        with timeline.listening():
+            run_sync(stage())
+
+        command, span = timeline.spans
+        assert (span.name, span.lane, span.category) == ("build", "h", "stage")
+        assert command.lane == "h"
+        assert command.category == timeline.SUBPROCESS
+        assert command.args == {
+            "command": "echo hello",
+            "cwd": str(tmp_path),
+            "exit_code": 0,
+            "output_bytes": 6,
+        }
+
+    def test_it_stops_listening(self, timeline, tmp_path):
+        with timeline.listening():
+            pass
+
+        Shell.run_in_dir(str(tmp_path), ["true"])
+
+        assert not timeline.spans
+
+    def test_slowest(self, timeline):
+        for name, duration in [("fast", 1), ("slow", 3), ("medium", 2)]:
+            with timeline.span(name, "h") as span:
+                pass
+            span.end = span.start + duration
+
+        assert [span.name for span in timeline.slowest(2)] == ["slow", "medium"]
+
+    def test_trace_events(self, timeline):
+        with timeline.span("build", "h"):
+            pass
+
+        events = timeline.trace_events()["traceEvents"]
+
+        assert [(event["ph"], event["name"], event["tid"]) for event in events] == [
+            ("X", "build", 1),
+            ("M", "thread_name", 1),
+        ]
+        assert events[1]["args"] == {"name": "h"}
+
+    @pytest.fixture
+    def timeline(self):
+        return Timeline()
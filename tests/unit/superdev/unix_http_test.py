@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from superdev.shell import run_sync
+from superdev.unix_http import HTTPError, parse_response, request
+
+
+class TestRequest:
+    def test_it(self, tmp_path):
+        socket_path = str(tmp_path / "http.sock")
+        received = []
+
+        async def handle(reader, writer):
+            received.append(await reader.readuntil(b"\r\n\r\n"))
+            received.append(await reader.readexactly(5))
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_unix_server(handle, socket_path)
+            try:
+                return await request(socket_path, "POST", "/RPC2", b"hello")
+            finally:
+                server.close()
+
+        assert run_sync(main()) == b"ok"
+        assert received[0].startswith(b"POST /RPC2 HTTP/1.0\r\n")
+        assert b"Content-Length: 5\r\n" in received[0]
+        assert received[1] == b"hello"
+
+    def test_it_raises_for_missing_sockets(self, tmp_path):
+        with pytest.raises(OSError):
+            run_sync(request(str(tmp_path / "missing.sock"), "GET", "/"))
+
+    def test_it_times_out(self, tmp_path):
+        socket_path = str(tmp_path / "http.sock")
+
+        async def handle(reader, writer):  # pylint: disable=unused-argument
+            await asyncio.sleep(1)
+
+        async def main():
+            server = await asyncio.start_unix_server(handle, socket_path)
+            try:
+                return await request(socket_path, "GET", "/", timeout=0.05)
+            finally:
+                server.close()
+
+        with pytest.raises(OSError):
+            run_sync(main())
+
+
+class TestParseResponse:
+    def test_it(self):
+        assert parse_response(b"HTTP/1.1 200 OK\r\nA: b\r\n\r\nbody") == b"body"
+
+    def test_chunked_responses(self):
+        response = (
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"4\r\nWiki\r\n6\r\npedia \r\n0\r\n\r\n"
+        )
+
+        assert parse_response(response) == b"Wikipedia "
+
+    def test_error_statuses(self):
+        with pytest.raises(HTTPError) as error:
+            parse_response(b"HTTP/1.1 404 Not Found\r\n\r\nmissing")
+
+        assert error.value.status == 404
+        assert error.value.body == b"missing"
+        assert isinstance(error.value, OSError)
+
+    @pytest.mark.parametrize("response", (b"", b"garbage", b"HTTP/1.1 200 OK\r\n"))
+    def test_invalid_responses(self, response):
+        with pytest.raises(OSError):
+            parse_response(response)